@@ -61,8 +61,39 @@ if USE_WHITENOISE:
     except Exception:
         USE_WHITENOISE = False
 
+SCHEMA_PROBE_TIMING = as_bool(os.getenv("SCHEMA_PROBE_TIMING", str(DEBUG)), default=DEBUG)
+if SCHEMA_PROBE_TIMING:
+    MIDDLEWARE.insert(0, "src.shared.middleware.SchemaProbeTimingMiddleware")
+
 ROOT_URLCONF = "core.urls"
 
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "rentals"),
+    }
+}
+# the local backends cull at 300 entries by default, far fewer than the catalog
+# pages, fragments, counts and version keys one worker keeps
+if CACHES["default"]["BACKEND"].rsplit(".", 1)[-1] in ("LocMemCache", "FileBasedCache", "DatabaseCache"):
+    CACHES["default"]["OPTIONS"] = {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))}
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_CACHE_VIEW_DEBOUNCE = int(os.getenv("CATALOG_CACHE_VIEW_DEBOUNCE", "60"))
+# how long past its TTL a cached page may still be served while another worker rebuilds it
+CACHE_STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", "60"))
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "10000"))
+# "estimate" only changes the count shown for large results, pages are always bounded by the exact count
+PAGINATION_COUNT_MODE = os.getenv("PAGINATION_COUNT_MODE", "exact")
+
+ANALYTICS_INGEST_MODE = os.getenv("ANALYTICS_INGEST_MODE", "thread")
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "10000"))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "2"))
+ANALYTICS_SPOOL_DIR = Path(os.getenv("ANALYTICS_SPOOL_DIR", str(BASE_DIR / "var" / "spool")))
+SEARCH_LOG_SAMPLE_RATE = float(os.getenv("SEARCH_LOG_SAMPLE_RATE", "1.0"))
+SEARCH_LOG_DEDUP_WINDOW = int(os.getenv("SEARCH_LOG_DEDUP_WINDOW", "300"))
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -156,10 +187,24 @@ if USE_WHITENOISE and not DEBUG:
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+THUMBNAIL_WIDTHS = tuple(int(w) for w in os.getenv("THUMBNAIL_WIDTHS", "320,640,1280").split(",") if w.strip())
+THUMBNAIL_ON_UPLOAD = as_bool(os.getenv("THUMBNAIL_ON_UPLOAD", "true"), default=True)
+THUMBNAIL_ASYNC = as_bool(os.getenv("THUMBNAIL_ASYNC", "true"), default=True)
+THUMBNAIL_QUEUE_WORKERS = int(os.getenv("THUMBNAIL_QUEUE_WORKERS", "2"))
+PROPERTY_IMAGE_DEDUP = as_bool(os.getenv("PROPERTY_IMAGE_DEDUP", "true"), default=True)
+PROPERTY_REVIEWS_PAGE_SIZE = int(os.getenv("PROPERTY_REVIEWS_PAGE_SIZE", "10"))
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY", "")
+PEXELS_API_URL = os.getenv("PEXELS_API_URL", "https://api.pexels.com/v1/search")
+
+DOWNLOAD_DIR = Path(os.getenv("DOWNLOAD_DIR", str(BASE_DIR / "var" / "downloads")))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_HOST_INTERVAL = float(os.getenv("DOWNLOAD_HOST_INTERVAL", "0.2"))
+
+PROPERTY_SEARCH_BACKEND = os.getenv("PROPERTY_SEARCH_BACKEND", "")
+PROPERTY_SEARCH_INDEX_TTL = int(os.getenv("PROPERTY_SEARCH_INDEX_TTL", "300"))
 
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000")
@@ -171,6 +216,11 @@ EMAIL_USE_TLS = as_bool(os.getenv("EMAIL_USE_TLS", "true"))
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER or "no-reply@example.com"
+EMAIL_OUTBOX_WORKERS = int(os.getenv("EMAIL_OUTBOX_WORKERS", "4"))
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", "50"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+EMAIL_OUTBOX_RETRY_BASE = int(os.getenv("EMAIL_OUTBOX_RETRY_BASE", "60"))
+EMAIL_OUTBOX_LEASE = int(os.getenv("EMAIL_OUTBOX_LEASE", "300"))
 
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/account/"
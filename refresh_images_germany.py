@@ -1,20 +1,22 @@
 # refresh_images_germany.py
-import os, random, time
+import os, random
 from datetime import datetime
 from pathlib import Path
 
-import requests
 import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 django.setup()
 
 from django.conf import settings
 from src.properties.models import Property, PropertyImage
+from src.shared.downloader import Downloader, download_dir
 
 API_KEY = os.getenv("PEXELS_API_KEY") or ""
 if not API_KEY:
     raise SystemExit("PEXELS_API_KEY не задан в .env")
 
+DOWNLOADER = Downloader(timeout=30, accept="image/", manifest=download_dir("refresh_images_germany.jsonl"))
+
 ALLOWED = [
     "wohnung","apartment","haus","wohnhaus","reihenhaus","mehrfamilienhaus",
     "innenraum","interior","wohnzimmer","schlafzimmer","küche","kueche","badezimmer","bad",
@@ -57,31 +59,32 @@ def ok_alt(alt: str, strict: bool = True) -> bool:
     return any(a in s for a in ALLOWED)
 
 def fetch_set(headers, queries, need, orientation="landscape", strict=True):
-    saved = []
     seen_ids = set()
     today = datetime.now()
     base_dir = Path(settings.MEDIA_ROOT) / "properties" / today.strftime("%Y") / today.strftime("%m") / today.strftime("%d")
     base_dir.mkdir(parents=True, exist_ok=True)
 
+    # сначала собираем подходящие фото, потом качаем параллельно
+    jobs = []
     for q in queries:
         for page in range(1, 5):
-            if len(saved) >= need:
+            if len(jobs) >= need:
                 break
-            r = requests.get(
-                "https://api.pexels.com/v1/search",
-                headers=headers,
-                params={
-                    "query": q,
-                    "per_page": 80,
-                    "page": page,
-                    "orientation": orientation,
-                    "locale": "de-DE",
-                },
-                timeout=30,
-            )
-            if r.status_code != 200:
+            try:
+                data = DOWNLOADER.get_json(
+                    settings.PEXELS_API_URL,
+                    headers=headers,
+                    params={
+                        "query": q,
+                        "per_page": 80,
+                        "page": page,
+                        "orientation": orientation,
+                        "locale": "de-DE",
+                    },
+                )
+            except Exception:
                 break
-            photos = (r.json() or {}).get("photos") or []
+            photos = (data or {}).get("photos") or []
             if not photos:
                 break
             for ph in photos:
@@ -98,19 +101,14 @@ def fetch_set(headers, queries, need, orientation="landscape", strict=True):
                 src = (ph.get("src") or {}).get("large2x") or (ph.get("src") or {}).get("large")
                 if not src:
                     continue
-                try:
-                    img = requests.get(src, timeout=30)
-                    if img.status_code != 200:
-                        continue
-                    fn = f"pexels_{pid}_{random.randint(1000,9999)}.jpg"
-                    path = base_dir / fn
-                    path.write_bytes(img.content)
-                    saved.append(path.relative_to(settings.MEDIA_ROOT).as_posix())
-                except Exception:
-                    continue
-            time.sleep(0.2)
-        if len(saved) >= need:
+                jobs.append((src, base_dir / f"pexels_{pid}.jpg"))
+        if len(jobs) >= need:
             break
+
+    saved = []
+    for result in DOWNLOADER.fetch_many(jobs[:need]):
+        if result.ok:
+            saved.append(result.path.relative_to(settings.MEDIA_ROOT).as_posix())
     return saved
 
 def main():
@@ -167,6 +165,7 @@ def main():
             if taken >= want:
                 break
 
+    DOWNLOADER.close()
     print("Объектов:", len(props), "| Привязано фото:", attached, "| Всего скачано:", len(pool))
 
 if __name__ == "__main__":
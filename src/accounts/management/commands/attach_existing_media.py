@@ -5,6 +5,7 @@ from pathlib import Path
 from itertools import cycle
 import random
 from src.properties.models import Property, PropertyImage
+from src.properties import thumbnails
 
 class Command(BaseCommand):
     help = "Attach existing files from MEDIA_ROOT/properties to PropertyImage records"
@@ -15,6 +16,7 @@ class Command(BaseCommand):
         parser.add_argument("--prefix", type=str, default="")
         parser.add_argument("--shuffle", action="store_true")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         per = max(1, int(opts.get("per") or 1))
         replace = bool(opts.get("replace"))
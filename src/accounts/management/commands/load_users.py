@@ -1,65 +1,184 @@
 import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from src.accounts.models import User
 from src.shared.enums import UserRole
 
+ROLE_ALIASES = {"tenant": UserRole.TENANT, "landlord": UserRole.HOST, "host": UserRole.HOST}
+UPDATE_FIELDS = ["first_name", "last_name", "role", "password"]
+DRY_RUN_LINES = 20
+
+
+def parse_role(value):
+    return ROLE_ALIASES.get((value or "").strip().lower())
+
+
+def read_rows(path):
+    try:
+        with open(path, encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            required = {"email", "password"}
+            if not required.issubset(reader.fieldnames or []):
+                missing = required - set(reader.fieldnames or [])
+                raise CommandError(f"Отсутствуют колонки: {', '.join(missing)}")
+            yield from reader
+    except FileNotFoundError:
+        raise CommandError(f"Файл не найден: {path}")
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
 class Command(BaseCommand):
     help = "Импорт пользователей из CSV. Колонки: email,first_name,last_name,password,role(tenant|landlord)"
 
     def add_arguments(self, parser):
         parser.add_argument("csv_path", type=str, help="Путь к CSV файлу")
+        parser.add_argument("--bulk", action="store_true",
+                            help="Пакетный режим: один запрос на пачку, хэширование паролей на всех ядрах")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, что изменится (пакетный режим)")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов для хэширования (по умолчанию все ядра)")
+        parser.add_argument("--chunk-size", type=int, default=1000)
 
     def handle(self, *args, **options):
+        if options["bulk"] or options["dry_run"]:
+            self.handle_bulk(options)
+            return
+
         path = options["csv_path"]
         created = updated = skipped = 0
 
+        for row in read_rows(path):
+            email = (row.get("email") or "").strip().lower()
+            password = (row.get("password") or "").strip()
+            if not email or not password:
+                skipped += 1
+                continue
+
+            role = parse_role(row.get("role")) or UserRole.TENANT
+
+            user, was_created = User.objects.get_or_create(
+                email=email,
+                defaults={
+                    "username": email,  # username технический
+                    "first_name": (row.get("first_name") or "").strip(),
+                    "last_name": (row.get("last_name") or "").strip(),
+                    "role": role,
+                }
+            )
+            if was_created:
+                user.set_password(password)
+                user.save()
+                created += 1
+            else:
+                changed = False
+                fn = (row.get("first_name") or "").strip()
+                ln = (row.get("last_name") or "").strip()
+                if fn and user.first_name != fn:
+                    user.first_name = fn; changed = True
+                if ln and user.last_name != ln:
+                    user.last_name = ln; changed = True
+                if row.get("password"):
+                    user.set_password(password); changed = True
+                if parse_role(row.get("role")) and user.role != role:
+                    user.role = role; changed = True
+                if changed:
+                    user.save(); updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Создано: {created}, Обновлено: {updated}, Пропущено: {skipped}"))
+
+    def handle_bulk(self, options):
+        dry = options["dry_run"]
+        chunk_size = max(1, options["chunk_size"])
+
+        records, skipped = {}, 0
+        for row in read_rows(options["csv_path"]):
+            email = (row.get("email") or "").strip().lower()
+            password = (row.get("password") or "").strip()
+            if not email or not password:
+                skipped += 1
+                continue
+            # последняя строка с тем же email побеждает, как и в построчном режиме
+            records.pop(email, None)
+            records[email] = {
+                "first_name": (row.get("first_name") or "").strip(),
+                "last_name": (row.get("last_name") or "").strip(),
+                "role": parse_role(row.get("role")),
+                "password": password,
+            }
+        emails = list(records)
+
+        pool = None
+        if dry:
+            hashes = iter(())
+        else:
+            pool = ProcessPoolExecutor(max_workers=options["workers"] or os.cpu_count(), initializer=_init_worker)
+            # хэши считаются в фоне, пока пишутся предыдущие пачки
+            hashes = pool.map(make_password, (records[e]["password"] for e in emails), chunksize=64)
+
+        created = updated = conflicts = shown = 0
+        changes = {"first_name": 0, "last_name": 0, "role": 0}
         try:
-            with open(path, encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                required = {"email", "password"}
-                if not required.issubset(reader.fieldnames or []):
-                    missing = required - set(reader.fieldnames or [])
-                    raise CommandError(f"Отсутствуют колонки: {', '.join(missing)}")
-
-                for row in reader:
-                    email = (row.get("email") or "").strip().lower()
-                    password = (row.get("password") or "").strip()
-                    if not email or not password:
-                        skipped += 1
+            for start in range(0, len(emails), chunk_size):
+                chunk = emails[start:start + chunk_size]
+                existing = {
+                    u.email.lower(): u
+                    for u in User.objects.filter(email__in=chunk).only("id", "email", *UPDATE_FIELDS[:3])
+                }
+                taken = set(
+                    User.objects.filter(username__in=[e for e in chunk if e not in existing])
+                    .values_list("username", flat=True)
+                )
+                to_create, to_update = [], []
+                for email in chunk:
+                    rec = records[email]
+                    hashed = None if dry else next(hashes)
+                    user = existing.get(email)
+                    if user is None:
+                        if email in taken:
+                            conflicts += 1
+                            self.stderr.write(f"[conflict] username {email} занят другим пользователем")
+                            continue
+                        to_create.append(User(
+                            email=email, username=email, first_name=rec["first_name"], last_name=rec["last_name"],
+                            role=rec["role"] or UserRole.TENANT, password=hashed,
+                        ))
                         continue
+                    for field in changes:
+                        value = rec[field]
+                        if value and getattr(user, field) != value:
+                            changes[field] += 1
+                            if dry and shown < DRY_RUN_LINES:
+                                self.stdout.write(f"~ {email}: {field} {getattr(user, field)!r} -> {value!r}")
+                                shown += 1
+                            setattr(user, field, value)
+                    user.password = hashed
+                    to_update.append(user)
 
-                    role = (row.get("role") or "tenant").strip().lower()
-                    role = role if role in (UserRole.TENANT, UserRole.LANDLORD) else UserRole.TENANT
-
-                    user, was_created = User.objects.get_or_create(
-                        email=email,
-                        defaults={
-                            "username": email,  # username технический
-                            "first_name": (row.get("first_name") or "").strip(),
-                            "last_name": (row.get("last_name") or "").strip(),
-                            "role": role,
-                        }
-                    )
-                    if was_created:
-                        user.set_password(password)
-                        user.save()
-                        created += 1
-                    else:
-                        changed = False
-                        fn = (row.get("first_name") or "").strip()
-                        ln = (row.get("last_name") or "").strip()
-                        if fn and user.first_name != fn:
-                            user.first_name = fn; changed = True
-                        if ln and user.last_name != ln:
-                            user.last_name = ln; changed = True
-                        if row.get("password"):
-                            user.set_password(password); changed = True
-                        if row.get("role") and role in (UserRole.TENANT, UserRole.LANDLORD) and user.role != role:
-                            user.role = role; changed = True
-                        if changed:
-                            user.save(); updated += 1
-
-        except FileNotFoundError:
-            raise CommandError(f"Файл не найден: {path}")
+                if dry:
+                    for user in to_create[:max(0, DRY_RUN_LINES - shown)]:
+                        self.stdout.write(f"+ {user.email} ({user.role})")
+                        shown += 1
+                else:
+                    with transaction.atomic():
+                        User.objects.bulk_create(to_create, batch_size=chunk_size)
+                        User.objects.bulk_update(to_update, UPDATE_FIELDS, batch_size=chunk_size)
+                created += len(to_create)
+                updated += len(to_update)
+                self.stdout.write(f"... {min(start + chunk_size, len(emails))}/{len(emails)}")
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
 
-        self.stdout.write(self.style.SUCCESS(f"Создано: {created}, Обновлено: {updated}, Пропущено: {skipped}"))
+        prefix = "[DRY-RUN] Будет создано" if dry else "Создано"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}: {created}, обновлено: {updated} (пароль у всех, имя: {changes['first_name']}, "
+            f"фамилия: {changes['last_name']}, роль: {changes['role']}), "
+            f"пропущено: {skipped}, конфликтов: {conflicts}"
+        ))
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from src.shared.enums import UserRole
+from .models import User
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class LoadUsersTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.anna = User.objects.create_user(
+            email="anna@example.com", username="anna@example.com", password="old", first_name="Ann",
+        )
+        User.objects.create_user(email="other@example.com", username="carl@example.com", password="x")
+
+    def csv(self, *rows):
+        path = os.path.join(self.dir, "users.csv")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("email,first_name,last_name,password,role\n")
+            fh.writelines(",".join(row) + "\n" for row in rows)
+        return path
+
+    def load(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command("load_users", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_bulk_mode(self):
+        path = self.csv(
+            ("Anna@example.com", "Anna", "", "new", "landlord"),
+            ("ben@example.com", "B", "", "first", "tenant"),
+            ("ben@example.com", "Ben", "Braun", "second", "host"),
+            ("nopass@example.com", "", "", "", ""),
+            ("carl@example.com", "Carl", "", "pw", ""),
+        )
+        out, err = self.load(path, "--bulk", "--workers", "1", "--chunk-size", "1")
+        self.assertIn("Создано: 1, обновлено: 1", out)
+        self.assertIn("пропущено: 1, конфликтов: 1", out)
+        self.assertIn("carl@example.com", err)
+
+        self.anna.refresh_from_db()
+        self.assertEqual((self.anna.first_name, self.anna.role), ("Anna", UserRole.HOST))
+        self.assertTrue(self.anna.check_password("new"))
+        ben = User.objects.get(email="ben@example.com")
+        self.assertEqual((ben.username, ben.first_name, ben.last_name, ben.role), (
+            "ben@example.com", "Ben", "Braun", UserRole.HOST,
+        ))
+        self.assertTrue(ben.check_password("second"))
+        self.assertFalse(User.objects.filter(email="carl@example.com").exists())
+
+    def test_dry_run_changes_nothing(self):
+        path = self.csv(("anna@example.com", "Anna", "", "new", ""), ("ben@example.com", "Ben", "", "pw", ""))
+        out, _ = self.load(path, "--dry-run")
+        self.assertIn("~ anna@example.com: first_name 'Ann' -> 'Anna'", out)
+        self.assertIn("+ ben@example.com (TENANT)", out)
+        self.assertIn("[DRY-RUN] Будет создано: 1, обновлено: 1", out)
+        self.anna.refresh_from_db()
+        self.assertEqual(self.anna.first_name, "Ann")
+        self.assertTrue(self.anna.check_password("old"))
+        self.assertFalse(User.objects.filter(email="ben@example.com").exists())
+
+    def test_dry_run_output_is_capped(self):
+        rows = [(f"user{i}@example.com", "", "", "pw", "") for i in range(25)]
+        out, _ = self.load(self.csv(("anna@example.com", "Anna", "Adler", "new", "host"), *rows), "--dry-run")
+        lines = [line for line in out.splitlines() if line.startswith(("~ ", "+ "))]
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(sum(line.startswith("~ ") for line in lines), 3)
+        self.assertIn("[DRY-RUN] Будет создано: 25, обновлено: 1", out)
+
+    def test_row_mode_maps_landlord_to_host(self):
+        self.load(self.csv(("dora@example.com", "Dora", "", "pw", "landlord")))
+        self.assertEqual(User.objects.get(email="dora@example.com").role, UserRole.HOST)
@@ -3,14 +3,14 @@ from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status, serializers
 
+from src.shared.mail import queue_email, render_email
+
 User = get_user_model()
 token_generator = PasswordResetTokenGenerator()
 
@@ -34,11 +34,9 @@ def _send_activation_email(user: User) -> None:
     link = _activation_link(user)
     subject = "Подтвердите e-mail"
     context = {"user": user, "activation_link": link}
-    html = render_to_string("emails/activation.html", context)
+    html = render_email("activation.html", context)
     text = f"Для активации аккаунта перейдите по ссылке:\n{link}"
-    email = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [user.email])
-    email.attach_alternative(html, "text/html")
-    email.send()
+    queue_email(subject, text, [user.email], html=html)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -124,11 +122,9 @@ class PasswordResetRequestView(APIView):
         link = _password_reset_link(user)
         subject = "Сброс пароля"
         context = {"user": user, "reset_link": link}
-        html = render_to_string("emails/reset.html", context)
+        html = render_email("reset.html", context)
         text = f"Для сброса пароля перейдите по ссылке:\n{link}"
-        email_msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [email])
-        email_msg.attach_alternative(html, "text/html")
-        email_msg.send()
+        queue_email(subject, text, [email], html=html)
         return Response({"detail": "Если email существует, письмо отправлено."})
 
 class PasswordResetConfirmView(APIView):
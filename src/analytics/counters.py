@@ -0,0 +1,126 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PropertyViewDaily, ViewEvent
+
+
+def _day_bounds(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def _bump(property_id, day, views, sessions):
+    updated = PropertyViewDaily.objects.filter(property_id=property_id, day=day).update(
+        views=F("views") + views,
+        unique_sessions=F("unique_sessions") + sessions,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            PropertyViewDaily.objects.create(property_id=property_id, day=day, views=views, unique_sessions=sessions)
+    except IntegrityError:
+        _bump(property_id, day, views, sessions)
+
+
+def record(rows):
+    """Fold freshly inserted ViewEvent rows into the daily buckets.
+
+    A session counts as new for (property, day) when every event it has on
+    that day is part of this batch.
+    """
+    buckets = defaultdict(lambda: [0, defaultdict(int)])
+    for row in rows:
+        created = row.get("created_at") or timezone.now()
+        key = (row["property_id"], timezone.localdate(created))
+        buckets[key][0] += 1
+        if row.get("session_key"):
+            buckets[key][1][row["session_key"]] += 1
+
+    totals = defaultdict(int)
+    for (property_id, day), (views, sessions) in buckets.items():
+        new_sessions = 0
+        if sessions:
+            start, end = _day_bounds(day)
+            seen = (
+                ViewEvent.objects.filter(
+                    property_id=property_id,
+                    session_key__in=list(sessions),
+                    created_at__gte=start,
+                    created_at__lt=end,
+                )
+                .values("session_key")
+                .annotate(n=Count("id"))
+            )
+            new_sessions = sum(1 for r in seen if r["n"] <= sessions[r["session_key"]])
+        _bump(property_id, day, views, new_sessions)
+        totals[property_id] += views
+
+    from src.properties.models import Property
+    for property_id, views in totals.items():
+        Property.objects.filter(pk=property_id).update(views_count=F("views_count") + views)
+
+
+def window_counts(property_ids, days):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    qs = PropertyViewDaily.objects.filter(day__gte=since)
+    if property_ids is not None:
+        qs = qs.filter(property_id__in=list(property_ids))
+    rows = (
+        qs.values("property_id")
+        .annotate(views=Sum("views"), sessions=Sum("unique_sessions"))
+    )
+    return {r["property_id"]: (r["views"] or 0, r["sessions"] or 0) for r in rows}
+
+
+def backfill(since=None, batch_size=1000):
+    events = ViewEvent.objects.all()
+    buckets = PropertyViewDaily.objects.all()
+    if since:
+        start, _ = _day_bounds(since)
+        events = events.filter(created_at__gte=start)
+        buckets = buckets.filter(day__gte=since)
+    rows = (
+        events.annotate(day=TruncDate("created_at"))
+        .values("property_id", "day")
+        .annotate(
+            views=Count("id"),
+            sessions=Count("session_key", distinct=True, filter=~Q(session_key="")),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        buckets.delete()
+        batch, created = [], 0
+        for r in rows.iterator():
+            batch.append(PropertyViewDaily(
+                property_id=r["property_id"], day=r["day"], views=r["views"], unique_sessions=r["sessions"],
+            ))
+            if len(batch) >= batch_size:
+                PropertyViewDaily.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        PropertyViewDaily.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def sync_property_totals(batch_size=500):
+    from src.properties.models import Property
+    totals = dict(
+        PropertyViewDaily.objects.values("property_id").annotate(v=Sum("views")).values_list("property_id", "v")
+    )
+    changed = []
+    for prop in Property.objects.only("id", "views_count").iterator():
+        value = totals.get(prop.pk) or 0
+        if prop.views_count != value:
+            prop.views_count = value
+            changed.append(prop)
+    Property.objects.bulk_update(changed, ["views_count"], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,278 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .signals import events_flushed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _encode(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _lock(fh):
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+
+def _open_spool(path):
+    # Reopen if a drainer renamed the file between our open() and the lock.
+    while True:
+        fh = open(path, "a", encoding="utf-8")
+        _lock(fh)
+        try:
+            if os.fstat(fh.fileno()).st_ino == os.stat(path).st_ino:
+                return fh
+        except FileNotFoundError:
+            pass
+        fh.close()
+
+
+def _abandoned(path):
+    try:
+        pid = int(path.name.rsplit("-", 1)[1])
+        os.kill(pid, 0)
+    except (ValueError, ProcessLookupError):
+        return True
+    except OSError:
+        return False
+    return pid == os.getpid()
+
+
+class BufferedWriter:
+    """Queues rows in memory and writes them in bulk_create batches.
+
+    ANALYTICS_INGEST_MODE: "thread" (background flusher), "spool" (append to a
+    JSON-lines file drained by ``flush_analytics``) or "sync". Overflow and
+    rows still queued at exit are spooled, so nothing is lost on shutdown.
+    """
+
+    def __init__(self, model_label, name):
+        self.model_label = model_label
+        self.name = name
+        self.dropped = 0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._spool_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._atexit = False
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def mode(self):
+        return _setting("ANALYTICS_INGEST_MODE", "thread")
+
+    @property
+    def batch_size(self):
+        return _setting("ANALYTICS_BATCH_SIZE", 500)
+
+    @property
+    def spool_dir(self):
+        return Path(_setting("ANALYTICS_SPOOL_DIR", Path(settings.BASE_DIR) / "var" / "spool"))
+
+    def record(self, **fields):
+        fields.setdefault("created_at", timezone.now())
+        mode = self.mode
+        if mode == "sync":
+            self._write([fields])
+            return
+        if mode == "spool":
+            self._spool([fields])
+            return
+        self._ensure_worker()
+        with self._cond:
+            full = len(self._queue) >= _setting("ANALYTICS_BUFFER_SIZE", 10000)
+            if not full:
+                self._queue.append(fields)
+                if len(self._queue) >= self.batch_size:
+                    self._cond.notify()
+        if full:
+            self._spool([fields])
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid != pid:
+                # forked child: the parent still owns (and will flush) what it queued
+                self._queue.clear()
+                self._pid = pid
+                self._stopping = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+                self._thread.start()
+            if not self._atexit:
+                atexit.register(self.shutdown)
+                self._atexit = True
+
+    def _run(self):
+        interval = _setting("ANALYTICS_FLUSH_INTERVAL", 2.0)
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._queue) < self.batch_size:
+                    self._cond.wait(interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def _take(self, n):
+        with self._cond:
+            n = min(n, len(self._queue))
+            return [self._queue.popleft() for _ in range(n)]
+
+    def flush(self):
+        written = 0
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return written
+            try:
+                # the insert and its signal commit together, so a failure here
+                # means nothing of the batch was kept and spooling it is safe
+                self._write(batch)
+                written += len(batch)
+            except Exception:
+                logger.exception("Flushing %s %s rows failed, spooling", len(batch), self.name)
+                self._spool(batch)
+                return written
+
+    def _write(self, rows):
+        close_old_connections()
+        model = self.model
+        with transaction.atomic():
+            model.objects.bulk_create([model(**row) for row in rows], batch_size=self.batch_size)
+            events_flushed.send(sender=model, rows=rows)
+
+    def _spool(self, rows):
+        path = self.spool_dir / f"{self.name}-{os.getpid()}.jsonl"
+        try:
+            with self._spool_lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with _open_spool(path) as fh:
+                    for row in rows:
+                        fh.write(json.dumps(row, default=_encode, ensure_ascii=False) + "\n")
+        except OSError:
+            logger.exception("Spooling %s %s rows failed, dropping", len(rows), self.name)
+            self.dropped += len(rows)
+
+    def shutdown(self, timeout=5.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        leftovers = self._take(len(self._queue))
+        if leftovers:
+            try:
+                self._write(leftovers)
+            except Exception:
+                self._spool(leftovers)
+
+    def _decode(self, line):
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"expected an object, got {type(row).__name__}")
+        for field in self.model._meta.concrete_fields:
+            if isinstance(field, models.DateTimeField) and isinstance(row.get(field.attname), str):
+                row[field.attname] = parse_datetime(row[field.attname])
+        return row
+
+    def drain_spool(self):
+        total = 0
+        if not self.spool_dir.exists():
+            return total
+        paths = list(self.spool_dir.glob(f"{self.name}-*.jsonl"))
+        paths += [p for p in self.spool_dir.glob(f"{self.name}-*.draining-*") if _abandoned(p)]
+        for path in sorted(paths):
+            claimed = path.with_name(f"{path.name.split('.draining-')[0]}.draining-{os.getpid()}")
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue
+            with open(claimed, "r+b") as fh:
+                _lock(fh)
+                total += self._drain_file(fh)
+            claimed.unlink()
+        return total
+
+    def _drain_file(self, fh):
+        """Write the rows of one claimed spool file batch by batch.
+
+        Once a batch is committed its lines are blanked in place, so a drain
+        that dies part-way resumes after the last committed batch instead of
+        inserting it again. Lines that cannot be decoded go to the quarantine
+        file rather than failing the whole file on every retry.
+        """
+        written = 0
+        batch, bad = [], []
+        start = pos = 0
+        for line in fh:
+            pos += len(line)
+            if not line.strip():
+                continue
+            try:
+                batch.append(self._decode(line))
+            except ValueError:
+                bad.append(line)
+                continue
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                written += len(batch)
+                self._quarantine(bad)
+                fh.seek(start)
+                fh.write(b" " * (pos - start - 1))
+                fh.flush()
+                fh.seek(pos)
+                batch, bad, start = [], [], pos
+        if batch:
+            self._write(batch)
+            written += len(batch)
+        self._quarantine(bad)
+        return written
+
+    def _quarantine(self, lines):
+        if not lines:
+            return
+        path = self.spool_dir / f"{self.name}.quarantine"
+        with open(path, "ab") as fh:
+            for line in lines:
+                fh.write(line.rstrip(b"\r\n") + b"\n")
+        logger.warning("Moved %s undecodable %s spool lines to %s", len(lines), self.name, path)
+
+
+view_events = BufferedWriter("analytics.ViewEvent", "views")
+search_queries = BufferedWriter("analytics.SearchQuery", "searches")
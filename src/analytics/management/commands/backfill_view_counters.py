@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from src.analytics import counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily property view buckets from ViewEvent history and resync Property.views_count"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=str, default="", help="YYYY-MM-DD; only rebuild buckets from this day on")
+        parser.add_argument("--batch", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        since = None
+        if opts["since"]:
+            try:
+                since = datetime.strptime(opts["since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+        created = counters.backfill(since=since, batch_size=opts["batch"])
+        synced = counters.sync_property_totals()
+        self.stdout.write(f"Daily buckets written: {created}")
+        self.stdout.write(f"Properties with corrected views_count: {synced}")
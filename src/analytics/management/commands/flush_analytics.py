@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from src.analytics import ingest
+
+
+class Command(BaseCommand):
+    help = "Write spooled analytics events to the database in bulk batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Keep draining the spool every --interval seconds")
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **opts):
+        writers = [ingest.view_events, ingest.search_queries]
+        while True:
+            for writer in writers:
+                n = writer.drain_spool()
+                if n or not opts["watch"]:
+                    self.stdout.write(f"{writer.name}: flushed {n}")
+            if not opts["watch"]:
+                return
+            time.sleep(opts["interval"])
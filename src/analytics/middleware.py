@@ -1,6 +1,14 @@
+import hashlib
+import random
+
 from django.utils.deprecation import MiddlewareMixin
 from django.apps import apps
-from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
+
+from src.shared import schema
+
+from .ingest import search_queries
 
 
 def _get_model(name: str):
@@ -11,11 +19,7 @@ def _get_model(name: str):
 
 
 def _has_field(model, name: str) -> bool:
-    try:
-        model._meta.get_field(name)
-        return True
-    except Exception:
-        return False
+    return schema.has_field(model, name)
 
 
 def _client_ip(request):
@@ -32,36 +36,50 @@ class EnsureSessionMiddleware(MiddlewareMixin):
 
 
 class SearchQueryLoggingMiddleware(MiddlewareMixin):
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.model = _get_model("SearchQuery")
+        self.query_field = None
+        self.fields = set()
+        if self.model:
+            if _has_field(self.model, "query"):
+                self.query_field = "query"
+            elif _has_field(self.model, "q"):
+                self.query_field = "q"
+            self.fields = {f for f in ("session_key", "ip", "path", "user") if _has_field(self.model, f)}
+
+    def _should_log(self, request, q):
+        rate = getattr(settings, "SEARCH_LOG_SAMPLE_RATE", 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return False
+        window = getattr(settings, "SEARCH_LOG_DEDUP_WINDOW", 300)
+        if window <= 0:
+            return True
+        who = request.session.session_key or _client_ip(request)
+        digest = hashlib.md5(f"{who}|{q.strip().lower()}".encode("utf-8")).hexdigest()
+        return cache.add(f"searchlog:{digest}", 1, window)
+
     def process_response(self, request, response):
-        SearchQuery = _get_model("SearchQuery")
-        if not SearchQuery:
+        if not self.query_field:
             return response
 
         q = request.GET.get("q")
-        if not q:
+        if not q or not self._should_log(request, q):
             return response
 
-        kwargs = {}
-        if _has_field(SearchQuery, "query"):
-            kwargs["query"] = q[:255]
-        elif _has_field(SearchQuery, "q"):
-            kwargs["q"] = q[:255]
-
-        if _has_field(SearchQuery, "session_key"):
+        kwargs = {self.query_field: q[:255]}
+        if "session_key" in self.fields:
             kwargs["session_key"] = request.session.session_key or ""
-        if _has_field(SearchQuery, "ip"):
-            kwargs["ip"] = _client_ip(request)
-        if _has_field(SearchQuery, "path"):
+        if "ip" in self.fields:
+            kwargs["ip"] = _client_ip(request) or None
+        if "path" in self.fields:
             kwargs["path"] = request.path[:255]
-        if _has_field(SearchQuery, "user") and getattr(request, "user", None) and request.user.is_authenticated:
-            kwargs["user"] = request.user
-        if _has_field(SearchQuery, "created_at"):
-            kwargs["created_at"] = timezone.now()
-
-        if kwargs:
-            try:
-                SearchQuery.objects.create(**kwargs)
-            except Exception:
-                pass
+        if "user" in self.fields and getattr(request, "user", None) and request.user.is_authenticated:
+            kwargs["user_id"] = request.user.pk
+
+        try:
+            search_queries.record(**kwargs)
+        except Exception:
+            pass
 
         return response
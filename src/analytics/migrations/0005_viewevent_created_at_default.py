@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_merge_20250821_XXXX'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='viewevent',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_viewevent_created_at_default'),
+        ('properties', '0009_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_sessions', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='viewevent',
+            index=models.Index(fields=['property', 'session_key', 'created_at'], name='analytics_v_propert_7b4ba9_idx'),
+        ),
+        migrations.AddField(
+            model_name='propertyviewdaily',
+            name='property',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='properties.property'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyviewdaily',
+            index=models.Index(fields=['day'], name='analytics_p_day_02d0cf_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='propertyviewdaily',
+            constraint=models.UniqueConstraint(fields=('property', 'day'), name='unique_property_view_day'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class SearchQuery(models.Model):
@@ -14,7 +15,7 @@ class SearchQuery(models.Model):
     ip = models.GenericIPAddressField(null=True, blank=True)
     query = models.CharField(max_length=255)
     path = models.CharField(max_length=255, blank=True, default="")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
@@ -48,13 +49,14 @@ class ViewEvent(models.Model):
     url = models.URLField(blank=True, default="")
     user_agent = models.CharField(max_length=500, blank=True, default="")
     referer = models.CharField(max_length=1000, blank=True, default="")
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         indexes = [
             models.Index(fields=["created_at"]),
             models.Index(fields=["session_key"]),
             models.Index(fields=["ip"]),
+            models.Index(fields=["property", "session_key", "created_at"]),
         ]
         ordering = ["-created_at"]
 
@@ -62,6 +64,29 @@ class ViewEvent(models.Model):
         return f"View #{self.pk} of {self.property_id}"
 
 
+class PropertyViewDaily(models.Model):
+    property = models.ForeignKey(
+        "properties.Property",
+        on_delete=models.CASCADE,
+        related_name="view_days",
+    )
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_sessions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["property", "day"], name="unique_property_view_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+        ]
+        ordering = ["-day"]
+
+    def __str__(self):
+        return f"{self.property_id} @ {self.day}: {self.views}"
+
+
 class InterestEvent(models.Model):
     property = models.ForeignKey(
         "properties.Property",
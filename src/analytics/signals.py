@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from . import counters
+from .models import ViewEvent
+
+# Sent after a BufferedWriter bulk-inserts rows; ``rows`` are the field dicts.
+events_flushed = Signal()
+
+
+@receiver(events_flushed, sender=ViewEvent)
+def count_flushed_views(sender, rows, **kwargs):
+    counters.record(rows)
+
+
+@receiver(post_save, sender=ViewEvent)
+def count_view(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.record([{
+            "property_id": instance.property_id,
+            "session_key": instance.session_key,
+            "created_at": instance.created_at,
+        }])
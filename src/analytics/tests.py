@@ -0,0 +1,171 @@
+import json
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from src.properties.models import Property, PropertyListing
+from .ingest import BufferedWriter
+from .signals import events_flushed
+from .middleware import SearchQueryLoggingMiddleware
+from .models import ViewEvent
+
+
+class BufferedWriterTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool, ignore_errors=True)
+        override = override_settings(
+            ANALYTICS_SPOOL_DIR=self.spool, ANALYTICS_BATCH_SIZE=2, ANALYTICS_BUFFER_SIZE=3,
+            ANALYTICS_FLUSH_INTERVAL=60, ANALYTICS_INGEST_MODE="thread",
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        self.prop = Property.objects.create(
+            owner=owner, title="Wohnung", description="", city="Berlin", price=100, rooms=2,
+            property_type="APARTMENT",
+        )
+        self.writer = BufferedWriter("analytics.ViewEvent", "views")
+
+    def views(self):
+        row = PropertyListing.objects.get(property=self.prop)
+        return ViewEvent.objects.count(), row.views_total
+
+    def spooled(self):
+        return sorted(p.name for p in self.writer.spool_dir.iterdir())
+
+    def test_queued_rows_are_written_in_batches(self):
+        with mock.patch.object(self.writer, "_ensure_worker"):
+            for i in range(3):
+                self.writer.record(property_id=self.prop.pk, session_key=f"s{i}")
+        self.assertEqual((self.writer.pending(), self.views()), (3, (0, 0)))
+        with mock.patch.object(ViewEvent.objects, "bulk_create", wraps=ViewEvent.objects.bulk_create) as bulk:
+            self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual(bulk.call_count, 2)
+        self.assertEqual(self.views(), (3, 3))
+
+    def test_background_thread_flushes_on_shutdown(self):
+        self.writer.record(property_id=self.prop.pk, session_key="s1")
+        self.writer.shutdown()
+        self.assertFalse(self.writer._thread.is_alive())
+        self.assertEqual(self.views(), (1, 1))
+
+    def test_overflow_is_spooled_and_drained(self):
+        created = timezone.now() - timezone.timedelta(hours=1)
+        with mock.patch.object(self.writer, "_ensure_worker"):
+            for i in range(5):
+                self.writer.record(property_id=self.prop.pk, session_key=f"s{i}", created_at=created)
+        self.assertEqual(self.writer.pending(), 3)
+        self.assertEqual(len(self.spooled()), 1)
+        self.assertEqual(self.writer.drain_spool(), 2)
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(self.views(), (2, 2))
+        self.assertEqual(set(ViewEvent.objects.values_list("created_at", flat=True)), {created})
+
+    def test_failed_flush_spools_the_batch(self):
+        with mock.patch.object(self.writer, "_ensure_worker"):
+            self.writer.record(property_id=self.prop.pk, session_key="s1")
+        with mock.patch.object(ViewEvent.objects, "bulk_create", side_effect=RuntimeError("down")), \
+                self.assertLogs("src.analytics.ingest", "ERROR"):
+            self.assertEqual(self.writer.flush(), 0)
+        [name] = self.spooled()
+        with open(self.writer.spool_dir / name, encoding="utf-8") as fh:
+            self.assertEqual(json.loads(fh.readline())["session_key"], "s1")
+        self.assertEqual(self.writer.drain_spool(), 1)
+        self.assertEqual(self.views(), (1, 1))
+
+    def test_failing_signal_rolls_the_batch_back(self):
+        with mock.patch.object(self.writer, "_ensure_worker"):
+            self.writer.record(property_id=self.prop.pk, session_key="s1")
+        with mock.patch.object(events_flushed, "send", side_effect=RuntimeError("down")), \
+                self.assertLogs("src.analytics.ingest", "ERROR"):
+            self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.views(), (0, 0))
+        self.assertEqual(self.writer.drain_spool(), 1)
+        self.assertEqual(self.views(), (1, 1))
+
+    @override_settings(ANALYTICS_INGEST_MODE="spool")
+    def test_spool_mode_writes_nothing_until_drained(self):
+        self.writer.record(property_id=self.prop.pk, session_key="s1")
+        self.assertEqual(self.views(), (0, 0))
+        self.assertEqual(self.writer.drain_spool(), 1)
+        self.assertEqual(self.views(), (1, 1))
+
+    @override_settings(ANALYTICS_INGEST_MODE="spool")
+    def test_interrupted_drain_resumes_after_the_committed_batches(self):
+        for i in range(5):
+            self.writer.record(property_id=self.prop.pk, session_key=f"s{i}")
+        real_write = self.writer._write
+        calls = []
+
+        def fail_second(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError("down")
+            real_write(rows)
+
+        with mock.patch.object(self.writer, "_write", side_effect=fail_second), self.assertRaises(RuntimeError):
+            self.writer.drain_spool()
+        self.assertEqual(self.views(), (2, 2))
+        self.assertEqual(self.writer.drain_spool(), 3)
+        self.assertEqual(self.views(), (5, 5))
+        self.assertEqual(ViewEvent.objects.values("session_key").distinct().count(), 5)
+
+    @override_settings(ANALYTICS_INGEST_MODE="spool")
+    def test_undecodable_lines_are_quarantined(self):
+        self.writer.record(property_id=self.prop.pk, session_key="s1")
+        [name] = self.spooled()
+        with open(self.writer.spool_dir / name, "a", encoding="utf-8") as fh:
+            fh.write('{"property_id": \n[1, 2]\n')
+        with self.assertLogs("src.analytics.ingest", "WARNING"):
+            self.assertEqual(self.writer.drain_spool(), 1)
+        self.assertEqual(self.spooled(), ["views.quarantine"])
+        with open(self.writer.spool_dir / "views.quarantine", encoding="utf-8") as fh:
+            self.assertEqual(fh.read(), '{"property_id": \n[1, 2]\n')
+
+
+@mock.patch("src.analytics.middleware.search_queries")
+class SearchQueryLoggingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.middleware = SearchQueryLoggingMiddleware(lambda request: HttpResponse())
+
+    def search(self, q, session="s1"):
+        request = RequestFactory().get("/", {"q": q} if q is not None else {})
+        request.session = SimpleNamespace(session_key=session)
+        request.user = AnonymousUser()
+        self.middleware(request)
+
+    def logged(self, writer):
+        return [c.kwargs["query"] for c in writer.record.call_args_list]
+
+    def test_repeats_within_the_window_are_logged_once(self, writer):
+        self.search("Berlin")
+        self.search(" berlin ")
+        self.search("Berlin", session="s2")
+        self.search("Hamburg")
+        self.search(None)
+        self.assertEqual(self.logged(writer), ["Berlin", "Berlin", "Hamburg"])
+        self.assertEqual(writer.record.call_args.kwargs["session_key"], "s1")
+
+    @override_settings(SEARCH_LOG_DEDUP_WINDOW=0)
+    def test_dedup_can_be_disabled(self, writer):
+        self.search("Berlin")
+        self.search("Berlin")
+        self.assertEqual(self.logged(writer), ["Berlin", "Berlin"])
+
+    @override_settings(SEARCH_LOG_SAMPLE_RATE=0.5)
+    def test_sampling(self, writer):
+        with mock.patch("src.analytics.middleware.random.random", side_effect=[0.7, 0.2]):
+            self.search("Berlin")
+            self.search("Hamburg")
+        self.assertEqual(self.logged(writer), ["Hamburg"])
@@ -5,6 +5,8 @@ from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from src.shared import schema
+
 
 def _get_model(name: str):
     try:
@@ -14,11 +16,7 @@ def _get_model(name: str):
 
 
 def _has_field(model, name: str) -> bool:
-    try:
-        model._meta.get_field(name)
-        return True
-    except Exception:
-        return False
+    return schema.has_field(model, name)
 
 
 def _ensure_session(request):
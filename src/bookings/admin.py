@@ -1,16 +1,13 @@
 from django.contrib import admin, messages
 from django.urls import path, reverse
 from django.shortcuts import redirect, get_object_or_404
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.template import TemplateDoesNotExist
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from django.core.exceptions import ValidationError
 
 from .models import Booking
 from src.shared.enums import BookingStatus
+from src.shared.mail import queue_email, render_email
 
 
 @admin.register(Booking)
@@ -82,14 +79,8 @@ class BookingAdmin(admin.ModelAdmin):
             f"Даты: {booking.start_date} — {booking.end_date}\n"
             f"Клиент: {booking.tenant.get_username()} ({booking.tenant.email})"
         )
-        try:
-            html = render_to_string('emails/new_booking.html', ctx)
-        except TemplateDoesNotExist:
-            html = None
-        msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [to_email])
-        if html:
-            msg.attach_alternative(html, 'text/html')
-        msg.send(fail_silently=True)
+        html = render_email('new_booking.html', ctx)
+        queue_email(subject, text, [to_email], html=html)
         return True
 
     def _cancel_booking(self, request, booking: Booking, actor: str):
@@ -101,11 +92,8 @@ class BookingAdmin(admin.ModelAdmin):
         booking.save(update_fields=['status','cancelled_at','cancelled_by','status_updated_at'])
         ctx = {'booking': booking, 'actor': actor}
         subject = f'Отмена бронирования #{booking.id}'
-        try:
-            html = render_to_string('emails/cancelled_booking.html', ctx)
-        except TemplateDoesNotExist:
-            html = None
-        text = render_to_string('emails/cancelled_booking.txt', ctx) if not html else f"Бронь #{booking.id} отменена."
+        html = render_email('cancelled_booking.html', ctx)
+        text = f"Бронь #{booking.id} отменена." if html else (render_email('cancelled_booking.txt', ctx) or f"Бронь #{booking.id} отменена.")
         recipients = []
         if getattr(booking.tenant, "email", ""):
             recipients.append(booking.tenant.email)
@@ -113,20 +101,15 @@ class BookingAdmin(admin.ModelAdmin):
         if getattr(owner, "email", ""):
             recipients.append(owner.email)
         recipients = list(dict.fromkeys(recipients))
-        if recipients:
-            msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, recipients)
-            if html:
-                msg.attach_alternative(html, "text/html")
-            msg.send(fail_silently=True)
+        queue_email(subject, text, recipients, html=html)
         return True
 
     def email_preview(self, obj):
         if not obj or not obj.pk:
             return ""
         ctx = {'property': obj.property,'tenant': obj.tenant,'start_date': obj.start_date,'end_date': obj.end_date}
-        try:
-            html = render_to_string('emails/new_booking.html', ctx)
-        except TemplateDoesNotExist:
+        html = render_email('new_booking.html', ctx)
+        if html is None:
             html = (
                 f"<h2>Новая бронь</h2>"
                 f"<p><strong>Объект:</strong> {obj.property}</p>"
@@ -4,3 +4,6 @@ class BookingsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.bookings"
     label = "bookings"
+
+    def ready(self):
+        from . import signals  # noqa: F401
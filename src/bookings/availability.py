@@ -0,0 +1,179 @@
+import base64
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from src.properties.models import Property
+from src.shared.cache import bump_version, get_versions
+from src.shared.enums import BookingStatus
+
+BLOCKING_STATUSES = (
+    BookingStatus.PENDING,
+    BookingStatus.CONFIRMED,
+    BookingStatus.ACTIVE,
+    BookingStatus.APPROVED,
+    BookingStatus.BOOKED,
+    BookingStatus.IN_PROGRESS,
+)
+CALENDAR_MAX_DAYS = 549
+CALENDAR_ENCODINGS = ("bitset", "rle", "json")
+
+
+def _ttl():
+    return getattr(settings, "AVAILABILITY_CACHE_TTL", 3600)
+
+
+def _scope(property_id):
+    return f"availability:{property_id}"
+
+
+class Occupancy:
+    """Blocking bookings of one property as half-open [start, end) day ordinals,
+    sorted by start, with a running max of the end so overlap lookups are a
+    pair of bisections."""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.starts = [r[0] for r in rows]
+        self.ends = [r[1] for r in rows]
+        self.ids = [r[2] for r in rows]
+        self.reach = []
+        top = 0
+        for end in self.ends:
+            top = max(top, end)
+            self.reach.append(top)
+
+    def conflicts(self, start, end, exclude=None):
+        s, e = start.toordinal(), end.toordinal()
+        hi = bisect_left(self.starts, e)
+        lo = bisect_right(self.reach, s, 0, hi)
+        for i in range(lo, hi):
+            if self.ends[i] > s and self.ids[i] != exclude:
+                yield self.ids[i]
+
+    def is_free(self, start, end, exclude=None):
+        return next(self.conflicts(start, end, exclude), None) is None
+
+    def busy_ranges(self, start, end):
+        s, e = start.toordinal(), end.toordinal()
+        ranges = []
+        i = bisect_right(self.reach, s)
+        while i < len(self.starts) and self.starts[i] < e:
+            lo, hi = max(self.starts[i], s), min(self.ends[i], e)
+            if hi > lo:
+                if ranges and lo <= ranges[-1][1]:
+                    ranges[-1][1] = max(ranges[-1][1], hi)
+                else:
+                    ranges.append([lo, hi])
+            i += 1
+        return ranges
+
+    def free_windows(self, start, end, min_nights=1):
+        s, e = start.toordinal(), end.toordinal()
+        cursor = s
+        windows = []
+        i = bisect_right(self.reach, s)
+        while i < len(self.starts) and self.starts[i] < e:
+            if self.starts[i] - cursor >= min_nights:
+                windows.append((date.fromordinal(cursor), date.fromordinal(self.starts[i])))
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if e - cursor >= min_nights:
+            windows.append((date.fromordinal(cursor), date.fromordinal(e)))
+        return windows
+
+
+def blocking_bookings(property_id):
+    from .models import Booking
+    return Booking.objects.filter(property_id=property_id, status__in=BLOCKING_STATUSES)
+
+
+def occupancies(property_ids):
+    ids = list(dict.fromkeys(property_ids))
+    versions = get_versions([_scope(pid) for pid in ids])
+    keys = {pid: f"{_scope(pid)}:{versions[_scope(pid)]}" for pid in ids}
+    found = cache.get_many(list(keys.values()))
+    rows = {pid: found[key] for pid, key in keys.items() if key in found}
+    missing = [pid for pid in ids if pid not in rows]
+    if missing:
+        from .models import Booking
+        loaded = {pid: [] for pid in missing}
+        qs = Booking.objects.filter(property_id__in=missing, status__in=BLOCKING_STATUSES)
+        for pid, s, e, pk in qs.values_list("property_id", "start_date", "end_date", "pk"):
+            loaded[pid].append((s.toordinal(), e.toordinal(), pk))
+        cache.set_many({keys[pid]: r for pid, r in loaded.items()}, _ttl())
+        rows.update(loaded)
+    return {pid: Occupancy(rows[pid]) for pid in ids}
+
+
+def occupancy(property_id):
+    return occupancies([property_id])[property_id]
+
+
+def is_free(property_id, start, end, exclude=None):
+    return occupancy(property_id).is_free(start, end, exclude)
+
+
+def free_windows(property_id, start, end, min_nights=1):
+    return occupancy(property_id).free_windows(start, end, min_nights)
+
+
+def encode_calendar(occ, start, end, encoding="bitset"):
+    """Occupied nights of [start, end).
+
+    bitset: base64 of one bit per night, night i at bit (i % 8) of byte i // 8.
+    rle: alternating run lengths in nights, starting with a free run.
+    json: list of occupied [check_in, check_out) date pairs.
+    """
+    s = start.toordinal()
+    ranges = occ.busy_ranges(start, end)
+    out = {"from": start.isoformat(), "to": end.isoformat(), "nights": end.toordinal() - s, "encoding": encoding}
+    if encoding == "json":
+        out["data"] = [[date.fromordinal(lo).isoformat(), date.fromordinal(hi).isoformat()] for lo, hi in ranges]
+    elif encoding == "rle":
+        runs, cursor = [], s
+        for lo, hi in ranges:
+            runs += [lo - cursor, hi - lo]
+            cursor = hi
+        if end.toordinal() > cursor:
+            runs.append(end.toordinal() - cursor)
+        out["data"] = runs
+    else:
+        bits = bytearray((out["nights"] + 7) // 8)
+        for lo, hi in ranges:
+            for n in range(lo - s, hi - s):
+                bits[n >> 3] |= 1 << (n & 7)
+        out["data"] = base64.b64encode(bytes(bits)).decode("ascii")
+    return out
+
+
+def has_conflict(property_id, start, end, exclude=None):
+    qs = blocking_bookings(property_id).filter(start_date__lt=end, end_date__gt=start)
+    if exclude is not None:
+        qs = qs.exclude(pk=exclude)
+    return qs.exists()
+
+
+def available(queryset, start, end):
+    """Restrict a Property queryset to those free for [start, end) with a single
+    NOT EXISTS anti-join on the (property, status, start_date, end_date) index."""
+    busy = blocking_bookings(OuterRef("pk")).filter(start_date__lt=end, end_date__gt=start)
+    return queryset.filter(~Exists(busy))
+
+
+@contextmanager
+def lock_property(property_id):
+    with transaction.atomic():
+        Property.objects.select_for_update().filter(pk=property_id).values_list("pk", flat=True).first()
+        yield
+
+
+def invalidate(property_id):
+    bump_version(_scope(property_id))
+    # a reader may have cached the pre-commit state under the new version
+    transaction.on_commit(lambda: bump_version(_scope(property_id)))
@@ -1,46 +1,92 @@
+from datetime import timedelta
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 
-from src.bookings.models import Booking
+from src.bookings import availability
+from src.bookings.models import AuditCursor, Booking
+from src.properties import cache as catalog_cache
 from src.shared.enums import BookingStatus
+from src.shared.mail import queue_email, render_batch
+
+CURSOR = "audit_bookings"
+CHUNK = 1000
+
 
 class Command(BaseCommand):
-    def handle(self, *args, **options):
+    help = "Move bookings to COMPLETED / OVERDUE / ACTIVE / CONFIRMED according to today's date"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Ignore the watermark and check every booking")
+
+    def handle(self, *args, **opts):
+        started = timezone.now()
         today = timezone.localdate()
-        qs = Booking.objects.select_related('property__owner','tenant')
-        for b in qs:
-            updated = False
-            if b.checkout_confirmed_at:
-                if b.status != BookingStatus.COMPLETED:
-                    b.status = BookingStatus.COMPLETED
-                    updated = True
-            else:
-                if b.end_date < today and b.status not in (BookingStatus.CANCELLED, BookingStatus.COMPLETED):
-                    if b.status != BookingStatus.OVERDUE:
-                        b.status = BookingStatus.OVERDUE
-                        updated = True
-                        ctx = {'booking': b}
-                        subj = f'Бронь просрочена: #{b.id}'
-                        html = render_to_string('emails/overdue_booking.html', ctx)
-                        text = render_to_string('emails/overdue_booking.txt', ctx)
-                        if b.tenant.email:
-                            m1 = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, [b.tenant.email])
-                            m1.attach_alternative(html, "text/html")
-                            m1.send()
-                        if hasattr(b.property, 'owner') and b.property.owner and b.property.owner.email:
-                            m2 = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, [b.property.owner.email])
-                            m2.attach_alternative(html, "text/html")
-                            m2.send()
-                elif b.start_date <= today <= b.end_date:
-                    if b.status not in (BookingStatus.ACTIVE, BookingStatus.CANCELLED, BookingStatus.COMPLETED):
-                        b.status = BookingStatus.ACTIVE
-                        updated = True
-                elif today < b.start_date:
-                    if b.status not in (BookingStatus.CONFIRMED, BookingStatus.CANCELLED, BookingStatus.COMPLETED):
-                        b.status = BookingStatus.CONFIRMED
-                        updated = True
-            if updated:
-                b.save(update_fields=['status','status_updated_at'])
+        with transaction.atomic():
+            cursor, _ = AuditCursor.objects.select_for_update().get_or_create(name=CURSOR)
+            since = None if opts["full"] else cursor.last_run_at
+            base = Booking.objects.filter(self._scope(since, today))
+            open_checkout = base.filter(checkout_confirmed_at__isnull=True)
+            final = (BookingStatus.CANCELED, BookingStatus.COMPLETED)
+
+            transitions = [
+                ("completed", BookingStatus.COMPLETED,
+                 base.filter(checkout_confirmed_at__isnull=False).exclude(status=BookingStatus.COMPLETED)),
+                ("overdue", BookingStatus.OVERDUE,
+                 open_checkout.filter(end_date__lt=today).exclude(status__in=final + (BookingStatus.OVERDUE,))),
+                ("active", BookingStatus.ACTIVE,
+                 open_checkout.filter(start_date__lte=today, end_date__gte=today)
+                 .exclude(status__in=final + (BookingStatus.ACTIVE,))),
+                ("confirmed", BookingStatus.CONFIRMED,
+                 open_checkout.filter(start_date__gt=today).exclude(status__in=final + (BookingStatus.CONFIRMED,))),
+            ]
+            counts, overdue_ids, freed = {}, [], False
+            for label, status, qs in transitions:
+                rows = list(qs.values_list("pk", "property_id"))
+                pks = [pk for pk, _ in rows]
+                for i in range(0, len(pks), CHUNK):
+                    qs.filter(pk__in=pks[i:i + CHUNK]).update(status=status, status_updated_at=started)
+                if status not in availability.BLOCKING_STATUSES:
+                    for property_id in {pid for _, pid in rows}:
+                        availability.invalidate(property_id)
+                    freed = freed or bool(rows)
+                if label == "overdue":
+                    overdue_ids = pks
+                counts[label] = len(pks)
+
+            if freed:
+                # update() sends no post_save, so the catalog's availability
+                # pages are dropped here, once for the whole run
+                transaction.on_commit(catalog_cache.invalidate_availability)
+            cursor.last_run_at = started
+            cursor.save(update_fields=["last_run_at"])
+            self._notify_overdue(overdue_ids)
+
+        scope = "all bookings" if since is None else f"changes since {since:%Y-%m-%d %H:%M}"
+        self.stdout.write(", ".join(f"{k}: {v}" for k, v in counts.items()) + f" ({scope})")
+
+    def _scope(self, since, today):
+        if since is None:
+            return Q()
+        last_day = timezone.localdate(since)
+        return (
+            Q(status_updated_at__gte=since)
+            | Q(start_date__gte=last_day, start_date__lte=today)
+            | Q(end_date__gte=last_day - timedelta(days=1), end_date__lt=today)
+        )
+
+    def _notify_overdue(self, booking_ids):
+        for i in range(0, len(booking_ids), CHUNK):
+            bookings = list(
+                Booking.objects.filter(pk__in=booking_ids[i:i + CHUNK]).select_related('property__owner', 'tenant')
+            )
+            contexts = [{'booking': b} for b in bookings]
+            htmls = render_batch('overdue_booking.html', contexts)
+            texts = render_batch('overdue_booking.txt', contexts)
+            for b, html, text in zip(bookings, htmls, texts):
+                subj = f'Бронь просрочена: #{b.id}'
+                queue_email(subj, text or '', [b.tenant.email], html=html)
+                if hasattr(b.property, 'owner') and b.property.owner:
+                    queue_email(subj, text or '', [b.property.owner.email], html=html)
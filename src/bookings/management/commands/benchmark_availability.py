@@ -0,0 +1,95 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from src.bookings import availability
+from src.bookings.models import Booking
+from src.properties.models import Property
+from src.shared.enums import BookingStatus, PropertyType
+
+CITIES = ("Berlin", "München", "Hamburg", "Köln", "Frankfurt")
+
+
+class Command(BaseCommand):
+    help = "Benchmark date-range availability search on synthetic data (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--properties", type=int, default=10000)
+        parser.add_argument("--bookings", type=int, default=100000)
+        parser.add_argument("--city", default="Berlin")
+        parser.add_argument("--check-in", default="2026-12-20")
+        parser.add_argument("--nights", type=int, default=7)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            self._run(opts)
+            transaction.set_rollback(True)
+
+    def _timed(self, label, fn):
+        started = time.perf_counter()
+        result = fn()
+        self.stdout.write(f"{label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+        return result
+
+    def _run(self, opts):
+        rnd = random.Random(opts["seed"])
+        User = get_user_model()
+        owner = User.objects.create_user(
+            email="availability-bench@example.invalid", username="availability-bench", password=None,
+        )
+        statuses = list(availability.BLOCKING_STATUSES) + [BookingStatus.CANCELED, BookingStatus.COMPLETED]
+        base = date.fromisoformat(opts["check_in"]) - timedelta(days=180)
+
+        def seed():
+            Property.objects.bulk_create(
+                [
+                    Property(
+                        owner=owner, title=f"Bench {i}", description="", city=rnd.choice(CITIES),
+                        price=50 + i % 300, rooms=1 + i % 5, property_type=PropertyType.APARTMENT,
+                    )
+                    for i in range(opts["properties"])
+                ],
+                batch_size=1000,
+            )
+            ids = list(Property.objects.filter(owner=owner).values_list("pk", flat=True))
+            batch = []
+            for _ in range(opts["bookings"]):
+                start = base + timedelta(days=rnd.randrange(365))
+                batch.append(Booking(
+                    property_id=rnd.choice(ids), tenant=owner, start_date=start,
+                    end_date=start + timedelta(days=rnd.randint(1, 14)), status=rnd.choice(statuses),
+                ))
+                if len(batch) >= 5000:
+                    Booking.objects.bulk_create(batch)
+                    batch = []
+            Booking.objects.bulk_create(batch)
+
+        self._timed(f"seed {opts['properties']} properties / {opts['bookings']} bookings", seed)
+        start = date.fromisoformat(opts["check_in"])
+        end = start + timedelta(days=opts["nights"])
+        city_qs = Property.objects.filter(owner=owner, city__iexact=opts["city"])
+
+        free = self._timed(
+            f"anti-join: free in {opts['city']} {start} -> {end}",
+            lambda: list(availability.available(city_qs, start, end).values_list("pk", flat=True)),
+        )
+        naive = self._timed(
+            "per-property checks",
+            lambda: [
+                pk for pk in city_qs.values_list("pk", flat=True)
+                if not availability.has_conflict(pk, start, end)
+            ],
+        )
+        self.stdout.write(f"{len(free)} of {city_qs.count()} free, results match: {sorted(free) == sorted(naive)}")
+
+        sql, params = availability.available(city_qs, start, end).values("pk").query.sql_with_params()
+        with connection.cursor() as cursor:
+            prefix = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+            cursor.execute(prefix + sql, params)
+            for row in cursor.fetchall():
+                self.stdout.write("  " + " | ".join(str(c) for c in row))
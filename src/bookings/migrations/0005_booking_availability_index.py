@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_alter_booking_cancelled_by_alter_booking_status'),
+        ('properties', '0009_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', 'status', 'start_date', 'end_date'], name='bookings_bo_propert_101464_idx'),
+        ),
+    ]
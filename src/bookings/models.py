@@ -3,7 +3,6 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from src.properties.models import Property
 from src.shared.enums import BookingStatus
@@ -25,6 +24,9 @@ class Booking(models.Model):
         indexes = [
             models.Index(fields=['status']),
             models.Index(fields=['start_date', 'end_date']),
+            models.Index(fields=['property', 'status', 'start_date', 'end_date']),
+            models.Index(fields=['end_date']),
+            models.Index(fields=['status_updated_at']),
         ]
 
     def __str__(self):
@@ -40,22 +42,8 @@ class Booking(models.Model):
         if self.end_date and self.end_date < today:
             errors.setdefault('end_date', _('You cannot book in the past.'))
         if self.property_id and self.start_date and self.end_date:
-            blocking_statuses = [
-                getattr(BookingStatus, 'PENDING', BookingStatus.PENDING),
-                getattr(BookingStatus, 'CONFIRMED', BookingStatus.PENDING),
-                getattr(BookingStatus, 'ACTIVE', BookingStatus.PENDING),
-                getattr(BookingStatus, 'APPROVED', BookingStatus.PENDING),
-                getattr(BookingStatus, 'BOOKED', BookingStatus.PENDING),
-                getattr(BookingStatus, 'IN_PROGRESS', BookingStatus.PENDING),
-            ]
-            conflict = (
-                Booking.objects
-                .filter(property_id=self.property_id, status__in=blocking_statuses)
-                .exclude(pk=self.pk)
-                .filter(Q(start_date__lt=self.end_date) & Q(end_date__gt=self.start_date))
-                .exists()
-            )
-            if conflict:
+            from . import availability
+            if availability.has_conflict(self.property_id, self.start_date, self.end_date, exclude=self.pk):
                 errors['start_date'] = _('These dates are already booked.')
         if errors:
             raise ValidationError(errors)
@@ -63,9 +51,12 @@ class Booking(models.Model):
     def save(self, *args, **kwargs):
         update_fields = kwargs.get('update_fields')
         should_validate = not update_fields or any(f in update_fields for f in ('property', 'start_date', 'end_date'))
-        if should_validate:
+        if not should_validate:
+            return super().save(*args, **kwargs)
+        from . import availability
+        with availability.lock_property(self.property_id):
             self.full_clean()
-        return super().save(*args, **kwargs)
+            return super().save(*args, **kwargs)
 
     def is_overdue_checkout(self):
         today = timezone.localdate()
@@ -122,3 +113,11 @@ class Booking(models.Model):
         except Exception:
             pass
         self.save(update_fields=["checkout_confirmed_at", "status", "status_updated_at"])
+
+
+class AuditCursor(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_run_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_run_at}"
@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from django.utils import timezone
-from django.db.models import Q
+from django.core.exceptions import ValidationError as DjangoValidationError
 
+from . import availability
 from .models import Booking
-from src.shared.enums import BookingStatus
 
 
 class BookingReadSerializer(serializers.ModelSerializer):
@@ -56,23 +56,7 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         if end < today:
             raise serializers.ValidationError({"end_date": "Нельзя бронировать задним числом."})
 
-        # Только статусы, реально блокирующие календарь
-        blocking_statuses = [
-            getattr(BookingStatus, 'PENDING', BookingStatus.PENDING),
-            getattr(BookingStatus, 'CONFIRMED', BookingStatus.PENDING),
-            getattr(BookingStatus, 'ACTIVE', BookingStatus.PENDING),
-            getattr(BookingStatus, 'APPROVED', BookingStatus.PENDING),
-            getattr(BookingStatus, 'BOOKED', BookingStatus.PENDING),
-            getattr(BookingStatus, 'IN_PROGRESS', BookingStatus.PENDING),
-        ]
-
-        overlap = (
-            Booking.objects
-            .filter(property=prop, status__in=blocking_statuses)
-            .filter(Q(start_date__lt=end) & Q(end_date__gt=start))
-            .exists()
-        )
-        if overlap:
+        if not availability.is_free(prop.pk, start, end):
             raise serializers.ValidationError("На эти даты уже есть активная/ожидающая бронь.")
 
         return attrs
@@ -83,7 +67,10 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         if not request or not request.user or not request.user.is_authenticated:
             raise serializers.ValidationError("Требуется авторизация для создания брони.")
         validated_data["tenant"] = request.user
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError:
+            raise serializers.ValidationError("На эти даты уже есть активная/ожидающая бронь.")
 
 
 class BookingStatusSerializer(serializers.ModelSerializer):
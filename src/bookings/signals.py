@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from src.properties import cache as catalog_cache
+
+from . import availability
+from .models import Booking
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability(sender, instance, **kwargs):
+    availability.invalidate(instance.property_id)
+    catalog_cache.invalidate_availability()
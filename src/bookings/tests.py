@@ -0,0 +1,194 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from src.properties.models import Property
+from src.shared.cache import bump_version, get_version
+from src.shared.enums import BookingStatus
+from src.shared.models import OutboundEmail
+from . import availability
+from .models import Booking
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.tenant = User.objects.create_user(email="tenant@example.com", username="tenant", password="x")
+        cls.prop = Property.objects.create(
+            owner=owner, title="Wohnung", description="", city="Berlin", price=100, rooms=2,
+            property_type="APARTMENT",
+        )
+        cls.other = Property.objects.create(
+            owner=owner, title="Studio", description="", city="Berlin", price=80, rooms=1,
+            property_type="APARTMENT",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=10)
+        self.booking = self.book(0, 5)
+
+    def book(self, start, end, prop=None, status=BookingStatus.CONFIRMED):
+        return Booking.objects.create(
+            property=prop or self.prop, tenant=self.tenant, status=status,
+            start_date=self.day + timedelta(days=start), end_date=self.day + timedelta(days=end),
+        )
+
+    def test_overlapping_booking_is_rejected(self):
+        for start, end in ((2, 3), (-2, 1), (4, 8), (-1, 6)):
+            with self.subTest(start=start, end=end), self.assertRaises(ValidationError):
+                self.book(start, end)
+
+    def test_touching_ranges_do_not_overlap(self):
+        self.book(5, 7)
+        self.book(-3, 0)
+        self.assertEqual(Booking.objects.filter(property=self.prop).count(), 3)
+
+    def test_cancelled_bookings_do_not_block(self):
+        self.booking.status = BookingStatus.CANCELLED
+        self.booking.save(update_fields=["status"])
+        self.book(1, 4)
+
+    def test_editing_a_booking_ignores_itself(self):
+        self.booking.end_date += timedelta(days=1)
+        self.booking.save()
+
+    def test_cached_occupancy_matches_the_database(self):
+        self.assertFalse(availability.is_free(self.prop.pk, self.day + timedelta(days=1), self.day + timedelta(days=2)))
+        self.book(6, 8)
+        self.assertFalse(availability.is_free(self.prop.pk, self.day + timedelta(days=6), self.day + timedelta(days=7)))
+        self.assertTrue(availability.is_free(self.prop.pk, self.day + timedelta(days=5), self.day + timedelta(days=6)))
+
+    def test_free_windows(self):
+        self.book(8, 10)
+        windows = availability.free_windows(self.prop.pk, self.day - timedelta(days=2), self.day + timedelta(days=12), 2)
+        self.assertEqual(windows, [
+            (self.day - timedelta(days=2), self.day),
+            (self.day + timedelta(days=5), self.day + timedelta(days=8)),
+            (self.day + timedelta(days=10), self.day + timedelta(days=12)),
+        ])
+
+    def test_available_filter(self):
+        free = availability.available(Property.objects.all(), self.day + timedelta(days=3), self.day + timedelta(days=4))
+        self.assertEqual(list(free.values_list("pk", flat=True)), [self.other.pk])
+
+    def api_ids(self, params):
+        data = self.client.get("/api/properties/", params).json()
+        return [row["id"] for row in (data["results"] if isinstance(data, dict) else data)]
+
+    def test_api_and_catalog_filter_by_stay(self):
+        stay = {"check_in": self.day + timedelta(days=3), "check_out": self.day + timedelta(days=4)}
+        self.assertEqual(self.api_ids(stay), [self.other.pk])
+        self.assertEqual(self.api_ids({"check_in": self.day + timedelta(days=5)}), [self.other.pk, self.prop.pk])
+        self.assertEqual(self.client.get("/", stay).context["properties"], [self.other])
+        # a new booking drops the cached catalog pages for date ranges
+        self.book(2, 6, prop=self.other)
+        self.assertEqual(self.client.get("/", stay).context["properties"], [])
+
+    def test_calendar_encodings(self):
+        self.book(6, 7)
+        occ = availability.occupancy(self.prop.pk)
+        start, end = self.day - timedelta(days=2), self.day + timedelta(days=8)
+        self.assertEqual(availability.encode_calendar(occ, start, end, "rle")["data"], [2, 5, 1, 1, 1])
+        self.assertEqual(availability.encode_calendar(occ, start, end, "json")["data"], [
+            [self.day.isoformat(), (self.day + timedelta(days=5)).isoformat()],
+            [(self.day + timedelta(days=6)).isoformat(), (self.day + timedelta(days=7)).isoformat()],
+        ])
+        bitset = availability.encode_calendar(occ, start, end)
+        self.assertEqual((bitset["nights"], bitset["data"]), (10, "fAE="))
+
+    def test_calendar_endpoints(self):
+        params = {"from": self.day, "to": self.day + timedelta(days=7), "encoding": "rle"}
+        response = self.client.get(f"/api/properties/{self.prop.pk}/calendar/", params)
+        self.assertEqual(response.json()["data"], [0, 5, 2])
+        batch = {**params, "ids": f"{self.prop.pk},{self.other.pk},999999"}
+        self.assertEqual(self.client.get("/api/properties/calendar/", batch).json()["properties"], {
+            str(self.prop.pk): [0, 5, 2], str(self.other.pk): [7],
+        })
+        self.booking.status = BookingStatus.CANCELLED
+        self.booking.save(update_fields=["status"])
+        self.assertEqual(self.client.get("/api/properties/calendar/", batch).json()["properties"][str(self.prop.pk)], [7])
+        self.assertEqual(self.client.get("/api/properties/calendar/", {**batch, "encoding": "csv"}).status_code, 400)
+
+
+class AuditBookingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.tenant = User.objects.create_user(email="tenant@example.com", username="tenant", password="x")
+        cls.prop = Property.objects.create(
+            owner=owner, title="Wohnung", description="", city="Berlin", price=100, rooms=2,
+            property_type="APARTMENT",
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+
+    def make(self, start, end, status, **kwargs):
+        return Booking.objects.bulk_create([Booking(
+            property=self.prop, tenant=self.tenant, status=status,
+            start_date=self.today + timedelta(days=start), end_date=self.today + timedelta(days=end), **kwargs,
+        )])[0]
+
+    def audit(self, *args):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("audit_bookings", *args, stdout=out)
+        return out.getvalue()
+
+    def status(self, booking):
+        return Booking.objects.values_list("status", flat=True).get(pk=booking.pk)
+
+    def test_transitions(self):
+        overdue = self.make(-10, -5, BookingStatus.CONFIRMED)
+        active = self.make(-1, 2, BookingStatus.PENDING)
+        confirmed = self.make(20, 25, BookingStatus.PENDING)
+        completed = self.make(-20, -15, BookingStatus.ACTIVE, checkout_confirmed_at=timezone.now())
+        cancelled = self.make(-30, -25, BookingStatus.CANCELED)
+        self.assertFalse(availability.is_free(self.prop.pk, overdue.start_date, overdue.end_date))
+
+        output = self.audit("--full")
+        self.assertIn("completed: 1, overdue: 1, active: 1, confirmed: 1", output)
+        self.assertEqual(
+            [self.status(b) for b in (overdue, active, confirmed, completed, cancelled)],
+            [BookingStatus.OVERDUE, BookingStatus.ACTIVE, BookingStatus.CONFIRMED, BookingStatus.COMPLETED,
+             BookingStatus.CANCELED],
+        )
+        # OVERDUE no longer blocks the dates
+        self.assertTrue(availability.is_free(self.prop.pk, overdue.start_date, overdue.end_date))
+        self.assertEqual(
+            sorted(to[0] for to in OutboundEmail.objects.values_list("to", flat=True)),
+            ["owner@example.com", "tenant@example.com"],
+        )
+
+    def test_later_runs_only_look_at_changes(self):
+        self.make(-10, -5, BookingStatus.CONFIRMED)
+        self.audit()
+        self.assertIn("completed: 0, overdue: 0, active: 0, confirmed: 0", self.audit())
+        fresh = self.make(20, 25, BookingStatus.PENDING)
+        self.assertIn("confirmed: 1", self.audit())
+        self.assertEqual(self.status(fresh), BookingStatus.CONFIRMED)
+
+    def test_freed_dates_invalidate_the_catalog_once(self):
+        self.make(-10, -5, BookingStatus.CONFIRMED)
+        self.make(-12, -11, BookingStatus.CONFIRMED)
+        self.make(20, 25, BookingStatus.PENDING)
+        before = get_version("catalog:availability")
+        with mock.patch("src.properties.cache.bump_version", wraps=bump_version) as bump:
+            self.audit("--full")
+        bump.assert_called_once_with("catalog:availability")
+        self.assertGreater(get_version("catalog:availability"), before)
+        with mock.patch("src.properties.cache.bump_version") as bump:
+            self.audit()
+        bump.assert_not_called()
@@ -3,16 +3,13 @@ import logging
 from django.utils import timezone
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
-from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.template import TemplateDoesNotExist
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.views import View
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.utils.translation import gettext as _
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -22,9 +19,12 @@ try:
     from rest_framework_simplejwt.authentication import JWTAuthentication
 except Exception:
     JWTAuthentication = None
+from . import availability
 from .models import Booking
 from src.properties.models import Property
 from src.shared.enums import BookingStatus
+from src.shared.mail import queue_email, render_email
+from src.shared import schema
 
 logger = logging.getLogger(__name__)
 
@@ -75,19 +75,7 @@ def book_now(request, pk: int):
     if start_date < today:
         messages.error(request, _("You cannot book in the past."))
         return redirect(f"{reverse('property_detail', args=[prop.pk])}?start={start_date}&end={end_date}#book")
-    overlapping_statuses = [s for s in {
-        _status_value("PENDING"),
-        _status_value("CONFIRMED"),
-        _status_value("ACTIVE"),
-        _status_value("APPROVED"),
-        _status_value("BOOKED"),
-        _status_value("IN_PROGRESS"),
-    } if s]
-    qs = Booking.objects.filter(property=prop)
-    if overlapping_statuses:
-        qs = qs.filter(status__in=overlapping_statuses)
-    qs = qs.filter(start_date__lt=end_date, end_date__gt=start_date)
-    if qs.exists():
+    if not availability.is_free(prop.pk, start_date, end_date):
         messages.error(request, _("These dates are already booked."))
         return redirect(f"{reverse('property_detail', args=[prop.pk])}?start={start_date}&end={end_date}#book")
     if start_date <= today <= end_date:
@@ -101,24 +89,20 @@ def book_now(request, pk: int):
         end_date=end_date,
         status=initial_status
     )
-    field_names = {f.name for f in Booking._meta.get_fields()}
-    for fname in ("guests", "persons", "people", "occupants"):
-        if fname in field_names:
-            create_kwargs[fname] = guests
-            break
-    Booking.objects.create(**create_kwargs)
+    guests_field = schema.first_field(Booking, "guests", "persons", "people", "occupants")
+    if guests_field:
+        create_kwargs[guests_field] = guests
+    try:
+        Booking.objects.create(**create_kwargs)
+    except ValidationError:
+        messages.error(request, _("These dates are already booked."))
+        return redirect(f"{reverse('property_detail', args=[prop.pk])}?start={start_date}&end={end_date}#book")
     if getattr(prop, "owner", None) and prop.owner and prop.owner.email:
         ctx = {"property": prop, "tenant": request.user, "start_date": start_date, "end_date": end_date, "guests": guests}
         subj = f"New booking: {prop.title}"
-        try:
-            html = render_to_string("emails/new_booking.html", ctx)
-        except TemplateDoesNotExist:
-            html = None
+        html = render_email('new_booking.html', ctx)
         text = f"New booking for “{prop.title}”.\nDates: {start_date} — {end_date}\nGuests: {guests}\nClient: {request.user.get_username()} ({request.user.email})"
-        msg = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, [prop.owner.email])
-        if html:
-            msg.attach_alternative(html, "text/html")
-        msg.send(fail_silently=True)
+        queue_email(subj, text, [prop.owner.email], html=html)
     messages.success(request, _("Booking created."))
     return redirect(f"{reverse('property_detail', args=[prop.pk])}#book")
 
@@ -146,16 +130,12 @@ class MarkOverdueView(APIView):
         b.save(update_fields=['status', 'status_updated_at'])
         ctx = {'booking': b}
         subj = f'Overdue booking #{b.id}'
-        html = render_to_string('emails/overdue_booking.html', ctx)
-        text = render_to_string('emails/overdue_booking.txt', ctx)
+        html = render_email('overdue_booking.html', ctx)
+        text = render_email('overdue_booking.txt', ctx) or ''
         if getattr(b.tenant, "email", ""):
-            m1 = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, [b.tenant.email])
-            m1.attach_alternative(html, "text/html")
-            m1.send()
+            queue_email(subj, text, [b.tenant.email], html=html)
         if getattr(b.property, "owner", None) and getattr(b.property.owner, "email", ""):
-            m2 = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, [b.property.owner.email])
-            m2.attach_alternative(html, "text/html")
-            m2.send()
+            queue_email(subj, text, [b.property.owner.email], html=html)
         return Response({'id': b.id, 'status': b.status})
 
 class CancelBookingView(APIView):
@@ -182,10 +162,7 @@ class CancelBookingView(APIView):
         b.save(update_fields=['status', 'cancelled_at', 'cancelled_by', 'status_updated_at'])
         ctx = {'booking': b, 'actor': actor}
         subj = f"Booking cancelled #{b.id}"
-        try:
-            html = render_to_string('emails/cancelled_booking.html', ctx)
-        except TemplateDoesNotExist:
-            html = None
+        html = render_email('cancelled_booking.html', ctx)
         text = f"Booking #{b.id} cancelled."
         recipients = []
         if getattr(b.tenant, "email", ""):
@@ -193,11 +170,7 @@ class CancelBookingView(APIView):
         if hasattr(b.property, "owner") and getattr(b.property.owner, "email", ""):
             recipients.append(b.property.owner.email)
         recipients = list(dict.fromkeys(recipients))
-        if recipients:
-            msg = EmailMultiAlternatives(subj, text, settings.DEFAULT_FROM_EMAIL, recipients)
-            if html:
-                msg.attach_alternative(html, "text/html")
-            msg.send(fail_silently=True)
+        queue_email(subj, text, recipients, html=html)
         return Response({'id': b.id, 'status': b.status, 'cancelled_at': b.cancelled_at, 'cancelled_by': b.cancelled_by})
 
 @login_required
@@ -245,19 +218,7 @@ class EditBookingView(LoginRequiredMixin, View):
         today = timezone.localdate()
         if new_start < today:
             return render(request, self.template_name, {'booking': b, 'error': _("You cannot move booking to the past")})
-        overlapping_statuses = [s for s in {
-            _status_value("PENDING"),
-            _status_value("CONFIRMED"),
-            _status_value("ACTIVE"),
-            _status_value("APPROVED"),
-            _status_value("BOOKED"),
-            _status_value("IN_PROGRESS"),
-        } if s]
-        qs = Booking.objects.filter(property=b.property).exclude(pk=b.pk)
-        if overlapping_statuses:
-            qs = qs.filter(status__in=overlapping_statuses)
-        qs = qs.filter(start_date__lt=new_end, end_date__gt=new_start)
-        if qs.exists():
+        if not availability.is_free(b.property_id, new_start, new_end, exclude=b.pk):
             return render(request, self.template_name, {'booking': b, 'error': _("Dates are unavailable")})
         b.start_date = new_start
         b.end_date = new_end
@@ -265,11 +226,11 @@ class EditBookingView(LoginRequiredMixin, View):
             b.status = _choose_status("ACTIVE", "CONFIRMED", fallback=b.status)
         else:
             b.status = _choose_status("CONFIRMED", fallback=b.status)
-        b.save(update_fields=['start_date', 'end_date', 'status', 'status_updated_at'])
         try:
-            html = render_to_string('emails/updated_booking.html', {'booking': b})
-        except TemplateDoesNotExist:
-            html = None
+            b.save(update_fields=['start_date', 'end_date', 'status', 'status_updated_at'])
+        except ValidationError:
+            return render(request, self.template_name, {'booking': b, 'error': _("Dates are unavailable")})
+        html = render_email('updated_booking.html', {'booking': b})
         text = f"Booking #{b.id} dates updated: {b.start_date} — {b.end_date}"
         recipients = []
         if getattr(b.tenant, "email", ""):
@@ -277,10 +238,6 @@ class EditBookingView(LoginRequiredMixin, View):
         if hasattr(b.property, "owner") and getattr(b.property.owner, "email", ""):
             recipients.append(b.property.owner.email)
         recipients = list(dict.fromkeys(recipients))
-        if recipients:
-            msg = EmailMultiAlternatives(f'Booking updated #{b.id}', text, settings.DEFAULT_FROM_EMAIL, recipients)
-            if html:
-                msg.attach_alternative(html, "text/html")
-            msg.send(fail_silently=True)
+        queue_email(f'Booking updated #{b.id}', text, recipients, html=html)
         messages.success(request, _("Booking updated."))
         return redirect(reverse('my_bookings'))
@@ -1,6 +1,9 @@
-﻿from django.apps import AppConfig
+from django.apps import AppConfig
 
 class PropertiesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.properties"
-    label = "properties"
\ No newline at end of file
+    label = "properties"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,111 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+
+from src.shared.cache import bump_version, get_version, get_versions, single_flight
+
+ADMIN_CONTACT_KEY = "catalog:admin_contact"
+
+
+def _ttl():
+    return getattr(settings, "CATALOG_CACHE_TTL", 300)
+
+
+def city_scope(city):
+    digest = hashlib.md5((city or "").strip().lower().encode("utf-8")).hexdigest()[:12]
+    return f"catalog:city:{digest}"
+
+
+def property_scope(property_id):
+    return f"catalog:prop:{property_id}"
+
+
+def list_scopes(city, sort, stay=False):
+    scopes = [city_scope(city) if city else "catalog:all"]
+    if sort in ("views", "views7"):
+        scopes.append("catalog:views")
+    if stay:
+        scopes.append("catalog:availability")
+    return scopes
+
+
+def invalidate_property(property_id, cities=(), membership=True):
+    bump_version(property_scope(property_id))
+    if membership:
+        bump_version("catalog:all")
+        for city in {c.strip().lower() for c in cities if c}:
+            bump_version(city_scope(city))
+
+
+def invalidate_media(property_id):
+    bump_version(property_scope(property_id))
+    bump_version("catalog:media")
+
+
+def invalidate_views(property_id):
+    debounce = getattr(settings, "CATALOG_CACHE_VIEW_DEBOUNCE", 60)
+    if cache.add(f"catalog:viewdebounce:{property_id}", 1, debounce):
+        bump_version(property_scope(property_id))
+        bump_version("catalog:views")
+
+
+def invalidate_rolling_views(property_ids):
+    for property_id in property_ids:
+        bump_version(property_scope(property_id))
+    bump_version("catalog:views")
+
+
+def invalidate_availability():
+    bump_version("catalog:availability")
+
+
+def _freeze_page(page_obj):
+    page_obj.object_list = list(page_obj.object_list)
+    paginator = page_obj.paginator
+    # count/num_pages are cached_property: evaluate them before dropping the queryset
+    paginator.count
+    paginator.num_pages
+    paginator.object_list = ()
+    return page_obj
+
+
+def cached_page(params, compute):
+    city, sort = params.get("city", ""), params.get("sort", "")
+    scopes = list_scopes(city, sort, stay=bool(params.get("check_in")))
+    signature = [
+        params.get(k, "")
+        for k in ("q", "city", "ptype", "sort", "postal", "address", "page", "check_in", "check_out")
+    ]
+    signature[1] = signature[1].lower()
+    signature[2] = signature[2].lower()
+    signature.append(translation.get_language() or "")
+    base = "catalog:page:" + hashlib.md5(json.dumps(signature).encode("utf-8")).hexdigest()
+    versions = get_versions(scopes)
+    key = base + ":" + ".".join(str(versions[s]) for s in scopes)
+
+    def build():
+        page_obj = _freeze_page(compute())
+        members = [property_scope(p.pk) for p in page_obj.object_list]
+        return {"page": page_obj, "members": get_versions(members)}
+
+    def is_valid(entry):
+        members = entry["members"]
+        return not members or get_versions(list(members)) == members
+
+    return single_flight(key, build, _ttl(), is_valid=is_valid, stale_key=base)["page"]
+
+
+def cached_cities(compute):
+    key = f"catalog:cities:{get_version('catalog:all')}"
+    return single_flight(key, compute, _ttl())
+
+
+def cached_admin_contact(compute):
+    return single_flight(ADMIN_CONTACT_KEY, compute, 3600)
+
+
+def invalidate_admin_contact():
+    cache.delete(ADMIN_CONTACT_KEY)
@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 import django_filters as filters
+from rest_framework.filters import OrderingFilter, SearchFilter
 from .models import Property
+from .search import apply_search
+from src.bookings.availability import available
 
 class PropertyFilter(filters.FilterSet):
     min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
@@ -12,7 +17,26 @@ class PropertyFilter(filters.FilterSet):
     max_rooms = filters.NumberFilter(field_name='rooms', lookup_expr='lte')
     property_type = filters.CharFilter(field_name='property_type', lookup_expr='iexact')
     is_active = filters.BooleanFilter()
+    check_in = filters.DateFilter(method='filter_stay')
+    check_out = filters.DateFilter(method='filter_stay')
 
     class Meta:
         model = Property
         fields = []
+
+    def filter_stay(self, queryset, name, value):
+        if name != 'check_in':
+            return queryset
+        check_out = self.form.cleaned_data.get('check_out') or value + timedelta(days=1)
+        if check_out <= value:
+            return queryset
+        return available(queryset, value, check_out)
+
+
+class PropertySearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        query = (request.query_params.get(self.search_param) or "").strip()
+        if not query:
+            return queryset
+        ordered = not request.query_params.get(OrderingFilter.ordering_param)
+        return apply_search(queryset, query, order=ordered)
@@ -0,0 +1,281 @@
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from decimal import InvalidOperation
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import DatabaseError, connection, transaction
+
+from src.shared.cache import bump_version
+from src.shared.downloader import Downloader, download_dir
+from src.shared.enums import PropertyType
+from . import cache as catalog_cache
+from . import search, thumbnails
+from .models import Property, PropertyImage, PropertyListing
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMNS = {
+    "title": "title",
+    "description": "description",
+    "city": "city",
+    "district": "district",
+    "address_line": "address_line",
+    "address": "address_line",
+    "postal_code": "postal_code",
+}
+TYPED_COLUMNS = ("price", "rooms")
+REQUIRED = ("title", "city", "price", "rooms")
+TRUE_VALUES = ("1", "true", "yes", "y")
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportReport:
+    def __init__(self, error_path=None, fieldnames=None):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.images = 0
+        self.image_errors = 0
+        self.errors = []
+        self._fh = None
+        self._writer = None
+        if error_path:
+            self._fh = open(error_path, "w", encoding="utf-8", newline="")
+            self._writer = csv.DictWriter(
+                self._fh, fieldnames=["line", "error"] + list(fieldnames or []), extrasaction="ignore"
+            )
+            self._writer.writeheader()
+
+    def error(self, line, message, row=None):
+        self.failed += 1
+        if len(self.errors) < 20:
+            self.errors.append((line, message))
+        if self._writer:
+            self._writer.writerow({**(row or {}), "line": line, "error": message})
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+def parse_row(row):
+    data = {"description": ""}
+    for column, field in TEXT_COLUMNS.items():
+        value = (row.get(column) or "").strip()
+        if value:
+            data[field] = value[:Property._meta.get_field(field).max_length or None]
+    for name in TYPED_COLUMNS:
+        value = (row.get(name) or "").strip()
+        if not value:
+            continue
+        try:
+            data[name] = Property._meta.get_field(name).to_python(value.replace(",", "."))
+        except (ValidationError, InvalidOperation):
+            raise RowError(f"invalid {name}: {value!r}")
+        if data[name] < 0:
+            raise RowError(f"invalid {name}: {value!r}")
+    missing = [name for name in REQUIRED if name not in data]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+    property_type = (row.get("property_type") or "").strip().upper()
+    if property_type and property_type not in PropertyType.values:
+        raise RowError(f"invalid property_type: {property_type!r}")
+    data["property_type"] = property_type
+    if "is_active" in row:
+        data["is_active"] = (row.get("is_active") or "true").strip().lower() in TRUE_VALUES
+    return data
+
+
+def resolve_owners(usernames, known):
+    """Fill ``known`` (username -> user id) for ``usernames`` with one lookup,
+    creating the missing users in a single bulk insert."""
+    User = get_user_model()
+    wanted = {u for u in usernames if u and u not in known}
+    if not wanted:
+        return known
+    emails = {f"{u}@example.com": u for u in wanted}
+    for pk, username in User.objects.filter(username__in=wanted).values_list("pk", "username"):
+        known[username] = pk
+    for pk, email in User.objects.filter(email__in=list(emails)).values_list("pk", "email"):
+        known.setdefault(emails[email], pk)
+    missing = sorted(wanted - set(known))
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=u, email=f"{u}@example.com", password=password) for u in missing],
+            ignore_conflicts=True,
+        )
+        known.update(User.objects.filter(username__in=missing).values_list("username", "pk"))
+    return known
+
+
+def default_owner(password):
+    User = get_user_model()
+    owner = User.objects.filter(is_superuser=True).first() or User.objects.order_by("pk").first()
+    if owner is None:
+        owner = User.objects.create_user(email="demo@example.com", username="demo_owner", password=password)
+    return owner.pk
+
+
+def _insert(objs):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Property.objects.bulk_create(objs)
+    # MySQL does not hand back ids from a multi-row INSERT. Tag the chunk with
+    # a token only it carries and read the ids back by it; auto-increment
+    # values follow VALUES order within the statement.
+    token = uuid.uuid4().hex
+    for obj in objs:
+        obj.import_batch = token
+    Property.objects.bulk_create(objs)
+    pks = list(Property.objects.filter(import_batch=token).order_by("pk").values_list("pk", flat=True))
+    if len(pks) != len(objs):
+        raise DatabaseError(f"Import batch {token}: inserted {len(objs)} rows, found {len(pks)}")
+    for obj, pk in zip(objs, pks):
+        obj.pk = pk
+    return objs
+
+
+def _create_chunk(items, report):
+    """Insert one chunk; if the bulk insert is rejected, retry row by row so a
+    single bad row only costs itself."""
+    objs = [Property(**data) for _, data, _ in items]
+    try:
+        with transaction.atomic():
+            _insert(objs)
+        return list(zip(items, objs))
+    except DatabaseError:
+        logger.info("Bulk insert of %s rows failed, retrying row by row", len(objs), exc_info=True)
+    created = []
+    for item, obj in zip(items, objs):
+        obj.pk = None
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=True)
+            created.append((item, obj))
+        except DatabaseError as exc:
+            report.error(item[0], f"{type(exc).__name__}: {exc}", item[2])
+    return created
+
+
+def _after_create(created):
+    # what the per-row post_save handlers would have done
+    PropertyListing.objects.bulk_create(
+        [PropertyListing(property_id=obj.pk) for _, obj in created if obj.pk], ignore_conflicts=True
+    )
+    search.get_backend().index_many([obj for _, obj in created if obj.pk])
+    bump_version("catalog:all")
+    for city in {obj.city.strip().lower() for _, obj in created}:
+        bump_version(catalog_cache.city_scope(city))
+
+
+def import_rows(rows, report, chunk_size=1000, default_password=None, image_spool=None):
+    """Create properties from (line, row) pairs in chunks. Image URLs are
+    written to ``image_spool`` as "<property id>\\t<url>" lines for later."""
+    owners = {}
+    fallback_owner = None
+    chunk = []
+
+    def flush():
+        nonlocal fallback_owner
+        resolve_owners([(row.get("owner_username") or "").strip() for _, _, row in chunk], owners)
+        for _, data, row in chunk:
+            username = (row.get("owner_username") or "").strip()
+            if username:
+                data["owner_id"] = owners[username]
+            else:
+                if fallback_owner is None:
+                    fallback_owner = default_owner(default_password)
+                data["owner_id"] = fallback_owner
+        with transaction.atomic():
+            created = _create_chunk(chunk, report)
+            if created:
+                _after_create(created)
+        report.created += len(created)
+        if image_spool is not None:
+            for (_, _, row), obj in created:
+                url = (row.get("image_url") or "").strip()
+                if url and obj.pk:
+                    image_spool.write(f"{obj.pk}\t{url}\n")
+        chunk.clear()
+
+    for line, row in rows:
+        report.rows += 1
+        try:
+            chunk.append((line, parse_row(row), row))
+        except RowError as exc:
+            report.error(line, str(exc), row)
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+
+def _image_path(url):
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    if ext not in (".jpg", ".jpeg", ".png", ".webp", ".gif"):
+        ext = ".jpg"
+    return download_dir("import", hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+
+def attach_images(image_spool, report, workers=None, batch=500):
+    """Download spooled image URLs in parallel and attach them, one batch of
+    spool lines at a time."""
+    image_spool.seek(0)
+    with Downloader(workers=workers, timeout=15, accept="image/",
+                    manifest=download_dir("import", "manifest.jsonl")) as downloader:
+        while True:
+            jobs = []
+            for line in image_spool:
+                pk, url = line.rstrip("\n").split("\t", 1)
+                jobs.append((int(pk), url))
+                if len(jobs) >= batch:
+                    break
+            if not jobs:
+                return
+            files = {}
+            for result in downloader.fetch_many({url: _image_path(url) for _, url in jobs}.items()):
+                if result.ok:
+                    files[result.url] = result.path
+                else:
+                    report.image_errors += 1
+                    logger.warning("Image %s not downloaded: %s", result.url, result.error)
+            for pk, url in jobs:
+                path = files.get(url)
+                if path is None:
+                    continue
+                image = PropertyImage(property_id=pk)
+                name = os.path.basename(urlsplit(url).path) or path.name
+                with open(path, "rb") as fh:
+                    image.image.save(name, File(fh), save=True)
+                report.images += 1
+
+
+def run_import(path, encoding="utf-8", delimiter=",", chunk_size=1000, default_password=None,
+               images=True, workers=None, error_path=None):
+    with open(path, "r", encoding=encoding, newline="") as fh:
+        reader = csv.DictReader(fh, delimiter=delimiter)
+        report = ImportReport(error_path, reader.fieldnames)
+        # line numbers count the header as line 1
+        rows = ((reader.line_num, row) for row in reader)
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            try:
+                import_rows(rows, report, chunk_size, default_password, spool if images else None)
+                if images:
+                    with thumbnails.deferred():
+                        attach_images(spool, report, workers)
+            finally:
+                report.close()
+    return report
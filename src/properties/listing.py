@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Min, Sum
+from django.utils import timezone
+
+from .models import Property, PropertyImage, PropertyListing
+
+ROLLING_DAYS = 7
+
+
+def listing_annotations():
+    return {
+        "rating_avg": F("listing__rating_avg"),
+        "reviews_total": F("listing__reviews_total"),
+        "views_total": F("listing__views_total"),
+        "views_7d": F("listing__views_7d"),
+    }
+
+
+def ensure_listing(property_id):
+    listing, _ = PropertyListing.objects.get_or_create(property_id=property_id)
+    return listing
+
+
+def refresh_reviews(property_id):
+    from src.reviews.models import Review
+    agg = Review.objects.filter(property_id=property_id).aggregate(avg=Avg("rating"), total=Count("id"))
+    PropertyListing.objects.filter(property_id=property_id).update(
+        rating_avg=agg["avg"],
+        reviews_total=agg["total"] or 0,
+        refreshed_at=timezone.now(),
+    )
+
+
+def refresh_cover(property_id):
+    first = PropertyImage.objects.filter(property_id=property_id).order_by("id").values_list("pk", flat=True).first()
+    Property.objects.filter(pk=property_id).exclude(cover_image_id=first).update(cover_image_id=first)
+
+
+def backfill_covers(batch_size=500):
+    covers = dict(
+        PropertyImage.objects.values("property_id").annotate(first=Min("id")).values_list("property_id", "first")
+    )
+    changed = []
+    for prop in Property.objects.only("id", "cover_image_id").iterator():
+        first = covers.get(prop.pk)
+        if prop.cover_image_id != first:
+            prop.cover_image_id = first
+            changed.append(prop)
+    Property.objects.bulk_update(changed, ["cover_image"], batch_size=batch_size)
+    return len(changed)
+
+
+def record_views(counts):
+    for property_id, n in counts.items():
+        if n:
+            PropertyListing.objects.filter(property_id=property_id).update(
+                views_total=F("views_total") + n,
+                views_7d=F("views_7d") + n,
+            )
+
+
+def refresh_rolling_views(days=ROLLING_DAYS):
+    """Reset views_7d from the daily view buckets; returns the changed property ids."""
+    from src.analytics.counters import window_counts
+    recent = {pk: views for pk, (views, _) in window_counts(None, days).items()}
+    changed = list(
+        PropertyListing.objects.filter(views_7d__gt=0).exclude(property_id__in=list(recent))
+        .values_list("property_id", flat=True)
+    )
+    PropertyListing.objects.filter(property_id__in=changed).update(views_7d=0)
+    for property_id, c in recent.items():
+        if PropertyListing.objects.filter(property_id=property_id).exclude(views_7d=c).update(views_7d=c):
+            changed.append(property_id)
+    return changed
+
+
+def roll_views(days=ROLLING_DAYS):
+    """Run refresh_rolling_views once per local day.
+
+    record_views only ever adds to views_7d; this drops the days that left
+    the window. Called on the view flush path once new counts are recorded.
+    """
+    if not cache.add(f"listing:rolled:{timezone.localdate().isoformat()}", 1, 2 * 86400):
+        return []
+    return refresh_rolling_views(days)
+
+
+def rebuild(property_ids=None, batch_size=500):
+    """Recompute listing rows; view counts come from the PropertyViewDaily
+    buckets, the same source and day window the flush path uses."""
+    from src.reviews.models import Review
+    from src.analytics.counters import window_counts
+    from src.analytics.models import PropertyViewDaily
+
+    props = Property.objects.all()
+    reviews = Review.objects.all()
+    days = PropertyViewDaily.objects.all()
+    if property_ids is not None:
+        property_ids = list(property_ids)
+        props = props.filter(pk__in=property_ids)
+        reviews = reviews.filter(property_id__in=property_ids)
+        days = days.filter(property_id__in=property_ids)
+
+    rating = {
+        r["property_id"]: r
+        for r in reviews.values("property_id").annotate(avg=Avg("rating"), total=Count("id"))
+    }
+    views_total = dict(days.values("property_id").annotate(c=Sum("views")).values_list("property_id", "c"))
+    views_7d = {pk: views for pk, (views, _) in window_counts(property_ids, ROLLING_DAYS).items()}
+    existing = set(
+        PropertyListing.objects.filter(property_id__in=props.values("pk")).values_list("property_id", flat=True)
+    )
+    to_create, to_update = [], []
+    for pk in props.values_list("pk", flat=True).iterator():
+        r = rating.get(pk) or {}
+        row = PropertyListing(
+            property_id=pk,
+            rating_avg=r.get("avg"),
+            reviews_total=r.get("total") or 0,
+            views_total=views_total.get(pk, 0),
+            views_7d=views_7d.get(pk, 0),
+            refreshed_at=timezone.now(),
+        )
+        (to_update if pk in existing else to_create).append(row)
+
+    PropertyListing.objects.bulk_create(to_create, batch_size=batch_size)
+    PropertyListing.objects.bulk_update(
+        to_update,
+        ["rating_avg", "reviews_total", "views_total", "views_7d", "refreshed_at"],
+        batch_size=batch_size,
+    )
+    return len(to_create), len(to_update)
@@ -7,6 +7,7 @@ from django.conf import settings
 from pathlib import Path
 import random
 import uuid
+from src.properties import thumbnails
 
 
 try:
@@ -93,6 +94,7 @@ class Command(BaseCommand):
         parser.add_argument("--min", dest="min_id", type=int, default=None, help="Минимальный PK (включительно).")
         parser.add_argument("--max", dest="max_id", type=int, default=None, help="Максимальный PK (включительно).")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         per = max(1, int(opts["per"]))
         img_dir = opts.get("dir")
@@ -4,6 +4,7 @@ from django.db import transaction
 from django.core.files import File
 from pathlib import Path
 import random, uuid
+from src.properties import thumbnails
 
 CATS = ["exterior", "living", "bedroom", "kitchen", "bathroom"]
 
@@ -38,6 +39,7 @@ class Command(BaseCommand):
         parser.add_argument("--city-in", type=str, default=None, help="Список городов через запятую (фильтр Property.city).")
         parser.add_argument("--ids", type=str, default=None, help="Только эти PK (через запятую).")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         base = Path(opts["dir"])
         per = max(1, int(opts["per"]))
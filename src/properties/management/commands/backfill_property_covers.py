@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.properties import listing
+
+
+class Command(BaseCommand):
+    help = "Point Property.cover_image at the first image of every property"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            changed = listing.backfill_covers(batch_size=opts["batch"])
+        self.stdout.write(f"Covers updated: {changed}")
@@ -0,0 +1,101 @@
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.properties import cache as catalog_cache
+from src.properties.models import MediaBlob, PropertyImage
+from src.properties.storage import (
+    BLOB_PREFIX, ContentAddressedStorage, blob_name, file_digest, recount_blobs, register_blob,
+)
+
+
+def _hash(name):
+    try:
+        with default_storage.open(name, "rb") as fh:
+            digest, size = file_digest(fh)
+        return name, digest, size, None
+    except Exception as exc:
+        return name, None, 0, f"{type(exc).__name__}: {exc}"
+
+
+def _link(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class Command(BaseCommand):
+    help = "Hash property images, store identical files once under properties/blobs/ and point rows at them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--batch", type=int, default=500)
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--keep-files", action="store_true", help="Leave the original files in place")
+
+    def handle(self, *args, **opts):
+        storage = ContentAddressedStorage()
+        names = list(
+            PropertyImage.objects.exclude(image="").exclude(image__startswith=BLOB_PREFIX)
+            .order_by("image").values_list("image", flat=True).distinct()
+        )
+        self.stdout.write(f"Hashing {len(names)} files with {opts['workers']} workers")
+
+        groups, sizes, failed = defaultdict(list), {}, 0
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            for name, digest, size, error in pool.map(_hash, names):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"[skip] {name}: {error}")
+                    continue
+                groups[digest].append(name)
+                sizes[digest] = size
+
+        duplicates = sum(len(g) - 1 for g in groups.values())
+        reclaimed = sum(sizes[d] * (len(g) - 1) for d, g in groups.items())
+        self.stdout.write(
+            f"{len(groups)} distinct of {len(names) - failed} files, {duplicates} duplicates, "
+            f"{reclaimed / 1048576:.1f} MiB reclaimable, {failed} unreadable"
+        )
+        if opts["dry_run"]:
+            return
+
+        known = dict(MediaBlob.objects.filter(sha256__in=list(groups)).values_list("sha256", "name"))
+        rows, property_ids = 0, set()
+        for digest, group in groups.items():
+            target = known.get(digest)
+            if not target or not storage.exists(target):
+                target = blob_name(digest, os.path.splitext(group[0])[1].lower())
+                if not storage.exists(target):
+                    _link(default_storage.path(group[0]), storage.path(target))
+            register_blob(digest, target, sizes[digest])
+
+            for i in range(0, len(group), opts["batch"]):
+                chunk = group[i:i + opts["batch"]]
+                qs = PropertyImage.objects.filter(image__in=chunk)
+                with transaction.atomic():
+                    property_ids.update(qs.values_list("property_id", flat=True))
+                    rows += qs.filter(thumb_source__in=chunk).update(image=target, thumb_source=target)
+                    rows += qs.update(image=target)
+            if not opts["keep_files"]:
+                for name in group:
+                    if not PropertyImage.objects.filter(image=name).exists():
+                        default_storage.delete(name)
+
+        changed, untracked = recount_blobs(opts["batch"])
+        for pid in property_ids:
+            catalog_cache.invalidate_media(pid)
+        self.stdout.write(
+            f"Rewrote {rows} rows onto {len(groups)} blobs, refcounts updated for {changed} blobs"
+        )
+        for name in untracked[:10]:
+            self.stderr.write(f"[untracked blob] {name}")
@@ -9,6 +9,7 @@ from django.conf import settings
 from django.utils.crypto import get_random_string
 
 from src.properties.models import Property, PropertyImage
+from src.properties import thumbnails
 
 SIZE_W, SIZE_H = 1280, 853
 
@@ -34,6 +35,7 @@ class Command(BaseCommand):
         parser.add_argument("--clear-existing", action="store_true")
         parser.add_argument("--limit", type=int, default=None)
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         per_prop = int(opts["per_property"])
         clear = bool(opts["clear_existing"])
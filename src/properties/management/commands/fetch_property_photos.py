@@ -1,10 +1,9 @@
 import os
 import io
+import hashlib
 import random
-import shutil
 from datetime import datetime
 
-import requests
 from PIL import Image
 
 from django.core.management.base import BaseCommand
@@ -12,9 +11,10 @@ from django.conf import settings
 from django.utils.crypto import get_random_string
 
 from src.properties.models import Property, PropertyImage
+from src.shared.downloader import Downloader, download_dir
+from src.properties import thumbnails
 
 
-PEXELS_ENDPOINT = "https://api.pexels.com/v1/search"
 TARGET_SIZE = (1280, 853)  # 3:2
 
 
@@ -40,19 +40,19 @@ def center_crop_resize(img: Image.Image, size=(1280, 853)) -> Image.Image:
     return img.resize(size, Image.LANCZOS)
 
 
-def pexels_search(api_key: str, query: str, per_page: int = 30, page: int = 1):
+def pexels_search(downloader: Downloader, api_key: str, query: str, per_page: int = 30, page: int = 1):
     headers = {"Authorization": api_key}
     params = {"query": query, "per_page": per_page, "page": page, "locale": "en-US"}
-    r = requests.get(PEXELS_ENDPOINT, headers=headers, params=params, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return downloader.get_json(settings.PEXELS_API_URL, headers=headers, params=params)
 
 
-def download_and_prepare(url: str) -> bytes:
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    img = Image.open(io.BytesIO(r.content)).convert("RGB")
-    img = center_crop_resize(img, TARGET_SIZE)
+def cache_path(url: str):
+    return download_dir("pexels", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+
+def prepare(path) -> bytes:
+    with Image.open(path) as src:
+        img = center_crop_resize(src.convert("RGB"), TARGET_SIZE)
     bio = io.BytesIO()
     img.save(bio, format="JPEG", quality=88)
     return bio.getvalue()
@@ -99,7 +99,9 @@ class Command(BaseCommand):
         parser.add_argument("--clear-existing", action="store_true")
         parser.add_argument("--limit", type=int, default=None)
         parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--workers", type=int, default=None, help="Параллельных загрузок (DOWNLOAD_WORKERS)")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         api_key = os.getenv("PEXELS_API_KEY")
         if not api_key:
@@ -123,58 +125,76 @@ class Command(BaseCommand):
         media_dir = os.path.join(settings.MEDIA_ROOT, media_subdir.replace("/", os.sep))
         ensure_dir(media_dir)
 
-        total = 0
+        downloader = Downloader(workers=opts["workers"], timeout=30, accept="image/",
+                                manifest=download_dir("pexels", "manifest.jsonl"))
 
+        # 1) подбираем кандидатов (с запасом на неудачные загрузки)
+        plan = []
         for p in props:
             if not clear and PropertyImage.objects.filter(property=p).exists():
                 continue
-
-            attached = 0
-            tried = set()
-            queries = choose_queries(p)
-
-            for q in queries:
-                if attached >= per_prop:
+            candidates, seen = [], set()
+            for q in choose_queries(p):
+                if len(candidates) >= per_prop + 2:
                     break
-                if q in tried:
-                    continue
-                tried.add(q)
-
                 try:
-                    data = pexels_search(api_key, q, per_page=30, page=1)
+                    data = pexels_search(downloader, api_key, q, per_page=30, page=1)
                 except Exception as e:
                     self.stderr.write(f"[ERR] search '{q}': {e}")
                     continue
-
                 photos = data.get("photos", [])
                 random.shuffle(photos)
-
                 for ph in photos:
-                    if attached >= per_prop:
+                    if len(candidates) >= per_prop + 2:
                         break
                     src = ph.get("src", {})
                     url = src.get("large") or src.get("large2x") or src.get("original")
-                    if not url:
-                        continue
-
-                    try:
-                        content = download_and_prepare(url)
-                    except Exception as e:
-                        self.stderr.write(f"[ERR] download: {e}")
-                        continue
-
-                    filename = f"pex_{p.id}_{get_random_string(6)}.jpg"
-                    rel_path = f"{media_subdir}/{filename}"
-                    abs_path = os.path.join(settings.MEDIA_ROOT, rel_path.replace("/", os.sep))
-
-                    if not dry:
-                        with open(abs_path, "wb") as f:
-                            f.write(content)
-                        PropertyImage.objects.create(property=p, image=rel_path, alt=p.title or q)
-
-                    attached += 1
-                    total += 1
-                    self.stdout.write(f"[OK] {rel_path} <- {q} -> Property {p.id}")
+                    if url and url not in seen:
+                        seen.add(url)
+                        candidates.append((url, q))
+            plan.append((p, candidates))
+
+        if dry:
+            for p, candidates in plan:
+                self.stdout.write(f"[DRY] Property {p.id}: кандидатов {len(candidates)}")
+            downloader.close()
+            return
+
+        # 2) параллельно скачиваем всё в кэш
+        urls = {url for _, candidates in plan for url, _ in candidates}
+        fetched = set()
+        with downloader:
+            for result in downloader.fetch_many((url, cache_path(url)) for url in urls):
+                if result.ok:
+                    fetched.add(result.url)
+                else:
+                    self.stderr.write(f"[ERR] download {result.url}: {result.error}")
+
+        # 3) обрабатываем и привязываем
+        total = 0
+        for p, candidates in plan:
+            attached = 0
+            for url, q in candidates:
+                if attached >= per_prop:
+                    break
+                if url not in fetched:
+                    continue
+                try:
+                    content = prepare(cache_path(url))
+                except Exception as e:
+                    self.stderr.write(f"[ERR] prepare {url}: {e}")
+                    continue
+
+                filename = f"pex_{p.id}_{get_random_string(6)}.jpg"
+                rel_path = f"{media_subdir}/{filename}"
+                abs_path = os.path.join(settings.MEDIA_ROOT, rel_path.replace("/", os.sep))
+                with open(abs_path, "wb") as f:
+                    f.write(content)
+                PropertyImage.objects.create(property=p, image=rel_path, alt=p.title or q)
+
+                attached += 1
+                total += 1
+                self.stdout.write(f"[OK] {rel_path} <- {q} -> Property {p.id}")
 
             if attached < per_prop:
                 self.stderr.write(f"[WARN] Property {p.id}: прикреплено {attached}/{per_prop}")
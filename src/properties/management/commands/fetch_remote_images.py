@@ -1,15 +1,9 @@
 from django.core.management.base import BaseCommand
 from pathlib import Path
 import re
-import sys
-import time
 import hashlib
 
-# используем requests для удобства
-try:
-    import requests
-except Exception as e:
-    requests = None
+from src.shared.downloader import DOWNLOADED, Downloader, requests
 
 MIME_TO_EXT = {
     "image/jpeg": ".jpg",
@@ -48,7 +42,13 @@ class Command(BaseCommand):
                             help="Префикс имени файлов (по умолчанию remote_).")
         parser.add_argument("--timeout", type=float, default=15.0, help="Таймаут запроса, сек (по умолчанию 15).")
         parser.add_argument("--retries", type=int, default=2, help="Повторы при неудаче (по умолчанию 2).")
-        parser.add_argument("--sleep", type=float, default=0.2, help="Пауза между запросами, сек (по умолчанию 0.2).")
+        parser.add_argument("--sleep", type=float, default=0.2,
+                            help="Минимальная пауза между запросами к одному хосту, сек (по умолчанию 0.2).")
+        parser.add_argument("--workers", type=int, default=None, help="Параллельных загрузок (DOWNLOAD_WORKERS).")
+        parser.add_argument("--manifest", type=str, default=None,
+                            help="Файл манифеста для докачки (по умолчанию <out-dir>/.manifest.jsonl).")
+        parser.add_argument("--revalidate", action="store_true",
+                            help="Перепроверять уже скачанные файлы по ETag/Last-Modified.")
         parser.add_argument("--user-agent", type=str, default="Mozilla/5.0 (compatible; SeedBot/1.0)",
                             help="Заголовок User-Agent.")
         parser.add_argument("--referer", type=str, default=None, help="Заголовок Referer, если нужен.")
@@ -98,62 +98,45 @@ class Command(BaseCommand):
         if opts.get("host_header"):
             headers["Host"] = opts["host_header"]
 
-        timeout = float(opts.get("timeout") or 15.0)
-        retries = int(opts.get("retries") or 2)
-        sleep_s = float(opts.get("sleep") or 0.2)
-        verify = not bool(opts.get("insecure"))
+        downloader = Downloader(
+            workers=opts.get("workers"),
+            interval=float(opts.get("sleep") or 0.0),
+            timeout=float(opts.get("timeout") or 15.0),
+            retries=int(opts.get("retries") or 2),
+            headers=headers,
+            verify=not bool(opts.get("insecure")),
+            manifest=opts.get("manifest") or out_dir / ".manifest.jsonl",
+            accept="image/",
+            revalidate=bool(opts.get("revalidate")),
+        )
+
+        def target(url):
+            # имя файла: по хэшу URL, чтобы не дублировать
+            h = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+            if re.search(r"\.(jpe?g|png|webp)(?:\?.*)?$", url, flags=re.IGNORECASE):
+                return out_dir / sanitize_name(f"{opts.get('prefix')}{h}{guess_ext(url, None)}")
+            return lambda ctype: out_dir / sanitize_name(f"{opts.get('prefix')}{h}{guess_ext(url, ctype)}")
 
         saved = 0
         skipped = 0
         errors = 0
-
-        for idx, url in enumerate(urls, start=1):
-            ok = False
-            last_err = None
-            for attempt in range(retries + 1):
-                try:
-                    r = requests.get(url, headers=headers, timeout=timeout, stream=True, verify=verify)
-                    if r.status_code != 200:
-                        last_err = f"HTTP {r.status_code}"
-                        time.sleep(sleep_s)
-                        continue
-
-                    ctype = r.headers.get("Content-Type", "")
-                    if "image" not in ctype.lower():
-                        last_err = f"Not an image (Content-Type: {ctype})"
-                        time.sleep(sleep_s)
-                        continue
-
-                    ext = guess_ext(url, ctype)
-                    # имя файла: по хэшу URL, чтобы не дублировать
-                    h = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
-                    fname = sanitize_name(f"{opts.get('prefix')}{h}{ext}")
-                    fout = out_dir / fname
-                    if fout.exists():
-                        skipped += 1
-                        ok = True
-                        break
-
-                    with open(fout, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=64 * 1024):
-                            if chunk:
-                                f.write(chunk)
-
+        urls = list(dict.fromkeys(urls))
+        index = {url: idx for idx, url in enumerate(urls, start=1)}
+
+        with downloader:
+            for result in downloader.fetch_many((url, target(url)) for url in urls):
+                idx = index[result.url]
+                if not result.ok:
+                    errors += 1
+                    self.stderr.write(self.style.WARNING(f"Пропущен [{idx}] {result.url}: {result.error}"))
+                    continue
+                if result.status == DOWNLOADED:
                     saved += 1
-                    ok = True
-                    break
-                except Exception as e:
-                    last_err = str(e)
-                    time.sleep(sleep_s)
-
-            if not ok:
-                errors += 1
-                self.stderr.write(self.style.WARNING(f"Пропущен [{idx}] {url}: {last_err}"))
-            else:
-                self.stdout.write(self.style.SUCCESS(f"[{idx}] OK: {url}"))
+                else:
+                    skipped += 1
+                self.stdout.write(self.style.SUCCESS(f"[{idx}] OK: {result.url}"))
 
         self.stdout.write(self.style.SUCCESS(
             f"Готово. Сохранено: {saved}, пропущено (дубликаты): {skipped}, ошибок: {errors}. "
             f"Папка: {out_dir.resolve()}"
         ))
-
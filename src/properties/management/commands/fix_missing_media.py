@@ -12,6 +12,7 @@ except Exception:
     PIL_OK = False
 
 from src.properties.models import PropertyImage, Property
+from src.properties import thumbnails
 
 PLACEHOLDER_SIZE = (1280, 853)  # 3:2
 BG_COLORS = ["#e2e8f0", "#f1f5f9", "#e5e7eb", "#d1d5db", "#cbd5e1"]
@@ -79,6 +80,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--limit", type=int, default=None, help="Ограничить кол-во восстановлений")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         if not hasattr(settings, "MEDIA_ROOT"):
             self.stderr.write("MEDIA_ROOT не задан. Проверь settings.")
@@ -0,0 +1,36 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from src.properties import thumbnails
+from src.properties.models import PropertyImage
+
+
+class Command(BaseCommand):
+    help = "Generate WebP/JPEG thumbnails for PropertyImage rows (resumable: skips images already done)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch", type=int, default=200)
+        parser.add_argument("--force", action="store_true", help="Regenerate every image, overwriting files")
+
+    def handle(self, *args, **opts):
+        qs = PropertyImage.objects.exclude(image="").order_by("pk")
+        if not opts["force"]:
+            qs = qs.exclude(thumb_source=F("image"))
+        done = failed = 0
+        last_pk = 0
+        while True:
+            rows = list(qs.filter(pk__gt=last_pk).values_list("pk", "image", "property_id")[:opts["batch"]])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            images = {}
+            for pk, name, property_id in rows:
+                images.setdefault(name, []).append((pk, property_id))
+            batch_done, batch_failed = thumbnails.render_images(images, opts["workers"], opts["force"])
+            done += batch_done
+            failed += batch_failed
+            self.stdout.write(f"processed up to #{last_pk}: {done} done, {failed} failed")
+        self.stdout.write(f"Thumbnails generated: {done}, failed: {failed}")
@@ -1,12 +1,17 @@
 import os
+import time
+from datetime import timedelta
 from pathlib import Path
 from typing import Set
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
 
-from src.properties.models import PropertyImage
+from src.properties import mediascan
+from src.properties.models import MediaBlob, PropertyImage
 
 
 def iter_fs_files(root: Path) -> Set[str]:
@@ -41,6 +46,12 @@ class Command(BaseCommand):
         parser.add_argument("--orphaned", action="store_true")
         parser.add_argument("--dry-run", action="store_true")
         parser.add_argument("--yes", action="store_true")
+        parser.add_argument("--scan", action="store_true", help="--orphaned: сравнить диск с БД вместо счётчиков ссылок")
+        parser.add_argument("--grace", type=int, default=3600, help="Не трогать блобы и файлы моложе N секунд")
+        parser.add_argument("--workers", type=int, default=8, help="--scan: потоков для обхода каталогов")
+        parser.add_argument("--progress", type=float, default=5.0, help="--scan: интервал отчёта, сек")
+        parser.add_argument("--manifest", help="--scan: записать найденные файлы-сироты в этот файл")
+        parser.add_argument("--from-manifest", help="Удалить файлы из манифеста (повторно сверив с БД)")
 
     def handle(self, *args, **opts):
         do_all = bool(opts["all"])
@@ -51,26 +62,30 @@ class Command(BaseCommand):
         media_root = Path(settings.MEDIA_ROOT)
         props_dir = media_root / "properties"
 
+        if opts["from_manifest"]:
+            self.purge_manifest(opts["from_manifest"], props_dir, dry, yes)
+            return
+
         if not (do_all or orphaned):
             self.stdout.write("Укажи режим: --all или --orphaned")
             return
 
+        if orphaned and not do_all:
+            if opts["scan"]:
+                self.purge_scanned(props_dir, dry, yes, opts)
+            else:
+                self.purge_unreferenced_blobs(props_dir, dry, yes, opts["grace"])
+            return
+
         db_paths = set(p for p in PropertyImage.objects.values_list("image", flat=True) if p)
         fs_paths = iter_fs_files(props_dir)
 
-        to_delete_files = set()
-        to_delete_db_ids = set()
-
-        if do_all:
-            to_delete_files = fs_paths
-            to_delete_db_ids = set(PropertyImage.objects.values_list("id", flat=True))
-        elif orphaned:
-            to_delete_files = set(p for p in fs_paths if p not in db_paths)
+        to_delete_files = fs_paths
+        to_delete_db_ids = set(PropertyImage.objects.values_list("id", flat=True))
 
         self.stdout.write(f"В БД изображений: {len(db_paths)}")
         self.stdout.write(f"Файлов на диске: {len(fs_paths)}")
-        if do_all:
-            self.stdout.write(f"Будет удалено записей PropertyImage: {len(to_delete_db_ids)}")
+        self.stdout.write(f"Будет удалено записей PropertyImage: {len(to_delete_db_ids)}")
         self.stdout.write(f"Будет удалено файлов: {len(to_delete_files)}")
 
         if dry:
@@ -94,11 +109,137 @@ class Command(BaseCommand):
                 self.stderr.write(f"[ERR FILE] {rel}: {e}")
 
         deleted_db = 0
-        if do_all and to_delete_db_ids:
+        if to_delete_db_ids:
             qs = PropertyImage.objects.filter(id__in=to_delete_db_ids)
             deleted_db = qs.count()
             qs.delete()
+            MediaBlob.objects.all().delete()
 
         delete_empty_dirs(props_dir)
 
         self.stdout.write(f"Удалено файлов: {deleted_files}. Удалено записей: {deleted_db}.")
+
+    def purge_unreferenced_blobs(self, props_dir, dry, yes, grace):
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        blobs = (
+            MediaBlob.objects.filter(refcount__lte=0, updated_at__lt=cutoff)
+            .exclude(Exists(PropertyImage.objects.filter(image=OuterRef("name"))))
+        )
+        total = blobs.count()
+        size = blobs.aggregate(s=Sum("size"))["s"] or 0
+        self.stdout.write(f"Блобов без ссылок: {total} ({size / 1048576:.1f} MiB)")
+
+        if dry:
+            sample = list(blobs.values_list("name", flat=True)[:10])
+            if sample:
+                self.stdout.write("Примеры файлов на удаление:")
+                for s in sample:
+                    self.stdout.write(f" - {s}")
+            return
+
+        if not yes:
+            self.stdout.write("Добавь --yes для подтверждения удаления.")
+            return
+
+        deleted_files = 0
+        for pk, name in list(blobs.values_list("pk", "name")):
+            # a concurrent upload may have re-referenced the blob since the scan
+            if not MediaBlob.objects.filter(pk=pk, refcount__lte=0).delete()[0]:
+                continue
+            try:
+                default_storage.delete(name)
+                deleted_files += 1
+            except Exception as e:
+                self.stderr.write(f"[ERR FILE] {name}: {e}")
+
+        delete_empty_dirs(props_dir)
+        self.stdout.write(f"Удалено файлов: {deleted_files}.")
+
+    def purge_scanned(self, props_dir, dry, yes, opts):
+        delete = yes and not dry
+        cutoff = time.time() - opts["grace"]
+        stats = mediascan.ScanStats()
+        files = stats.count(mediascan.walk_sorted(props_dir, "properties/", opts["workers"]))
+        found = mediascan.orphans(files, mediascan.db_names("properties/"), stats)
+
+        manifest = open(opts["manifest"], "w", encoding="utf-8") if opts["manifest"] else None
+        orphans = young = deleted_files = 0
+        reported = time.monotonic()
+        try:
+            for name, mtime in found:
+                if mtime > cutoff:
+                    young += 1
+                    continue
+                orphans += 1
+                if manifest:
+                    manifest.write(name + "\n")
+                if delete:
+                    try:
+                        default_storage.delete(name)
+                        deleted_files += 1
+                    except Exception as e:
+                        self.stderr.write(f"[ERR FILE] {name}: {e}")
+                elif orphans <= 10:
+                    if orphans == 1:
+                        self.stdout.write("Примеры файлов на удаление:")
+                    self.stdout.write(f" - {name}")
+                if opts["progress"] and time.monotonic() - reported >= opts["progress"]:
+                    reported = time.monotonic()
+                    self.stdout.write(
+                        f"... просканировано {stats.files} файлов ({stats.rate:.0f}/с), сирот: {orphans}"
+                    )
+        finally:
+            if manifest:
+                manifest.close()
+
+        self.stdout.write(
+            f"Файлов на диске: {stats.files} за {stats.elapsed:.1f} с ({stats.rate:.0f}/с). "
+            f"Со ссылками: {stats.referenced}, сирот: {orphans}, моложе --grace: {young}, "
+            f"записей без файла: {stats.missing}"
+        )
+        if manifest:
+            self.stdout.write(f"Манифест: {opts['manifest']}")
+        if delete:
+            if deleted_files:
+                delete_empty_dirs(props_dir)
+            self.stdout.write(f"Удалено файлов: {deleted_files}.")
+        elif not dry:
+            self.stdout.write("Добавь --yes для подтверждения удаления.")
+
+    def purge_manifest(self, path, props_dir, dry, yes, batch=1000):
+        def delete_batch(names):
+            referenced = set(PropertyImage.objects.filter(image__in=names).values_list("image", flat=True))
+            referenced.update(MediaBlob.objects.filter(name__in=names).values_list("name", flat=True))
+            deleted = 0
+            for name in names:
+                if name in referenced:
+                    continue
+                try:
+                    default_storage.delete(name)
+                    deleted += 1
+                except Exception as e:
+                    self.stderr.write(f"[ERR FILE] {name}: {e}")
+            return deleted, len(referenced)
+
+        if dry or not yes:
+            with open(path, encoding="utf-8") as fh:
+                total = sum(1 for line in fh if line.strip())
+            self.stdout.write(f"В манифесте файлов: {total}")
+            if not dry:
+                self.stdout.write("Добавь --yes для подтверждения удаления.")
+            return
+
+        deleted_files = skipped = 0
+        names = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    names.append(line.strip())
+                if len(names) >= batch:
+                    d, s = delete_batch(names)
+                    deleted_files, skipped, names = deleted_files + d, skipped + s, []
+        if names:
+            d, s = delete_batch(names)
+            deleted_files, skipped = deleted_files + d, skipped + s
+        delete_empty_dirs(props_dir)
+        self.stdout.write(f"Удалено файлов: {deleted_files}. Пропущено (снова в БД): {skipped}.")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from src.properties import cache as catalog_cache, listing
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized catalog listing rows (rating, reviews, views)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated property ids")
+        parser.add_argument("--rolling-only", action="store_true", help="Only refresh the rolling 7-day view counters")
+        parser.add_argument("--batch", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        if opts["rolling_only"]:
+            changed = listing.refresh_rolling_views()
+            catalog_cache.invalidate_rolling_views(changed)
+            self.stdout.write(f"Rolling views refreshed: {len(changed)}")
+            return
+
+        ids = [int(x) for x in opts["ids"].split(",") if x.strip().isdigit()] or None
+        with transaction.atomic():
+            created, updated = listing.rebuild(property_ids=ids, batch_size=opts["batch"])
+        self.stdout.write(f"Listings created: {created}, updated: {updated}")
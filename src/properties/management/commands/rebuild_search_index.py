@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from src.properties import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the property full-text search index for the active backend"
+
+    def handle(self, *args, **opts):
+        backend = search.get_backend()
+        count = backend.rebuild()
+        self.stdout.write(f"Indexed properties: {count} (backend: {backend.name})")
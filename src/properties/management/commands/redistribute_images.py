@@ -3,6 +3,7 @@ from django.conf import settings
 from pathlib import Path
 import os
 from src.properties.models import Property, PropertyImage
+from src.properties import thumbnails
 
 def collect_images(media_root: Path, images_dir: str, images_list: str):
     exts = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
@@ -27,6 +28,7 @@ class Command(BaseCommand):
         parser.add_argument("--images-dir", type=str, default="")
         parser.add_argument("--images-list", type=str, default="")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         media_root = Path(getattr(settings, "MEDIA_ROOT", "media"))
         pool = collect_images(media_root, opts["images_dir"], opts["images_list"])
@@ -13,6 +13,7 @@ except Exception:
     Faker = None
 
 from src.properties.models import Property, PropertyImage
+from src.properties import thumbnails
 try:
     from src.shared.enums import PropertyType
     PTYPES = [c[0] for c in PropertyType.choices]
@@ -95,6 +96,7 @@ class Command(BaseCommand):
         parser.add_argument("--owner-id", type=int)
         parser.add_argument("--owner-email", type=str)
 
+    @thumbnails.deferred()
     @transaction.atomic
     def handle(self, *args, **opts):
         count = opts["count"]
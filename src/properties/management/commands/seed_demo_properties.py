@@ -9,6 +9,7 @@ from django.db import transaction
 from django.conf import settings
 from faker import Faker
 from PIL import Image, ImageDraw, ImageFont
+from src.properties import thumbnails
 
 User = get_user_model()
 
@@ -50,6 +51,7 @@ class Command(BaseCommand):
         p.add_argument("--count", type=int, default=20)
         p.add_argument("--owner", type=str, default=None)
 
+    @thumbnails.deferred()
     @transaction.atomic
     def handle(self, *a, **o):
         fake = Faker("de_DE")
@@ -4,6 +4,7 @@ from django.db import transaction
 from django.contrib.auth import get_user_model
 from decimal import Decimal
 import random
+from src.properties import thumbnails
 
 try:
     from faker import Faker
@@ -71,6 +72,7 @@ class Command(BaseCommand):
         parser.add_argument("--owner", type=str, default=None,
                             help="username владельца для присвоения объектам (если не указан — берётся первый активный пользователь, иначе создаётся demo_owner).")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         count = int(opts["count"])
         with_images = bool(opts["images"])
@@ -13,6 +13,7 @@ from django.db import transaction, models
 
 from faker import Faker
 from PIL import Image, ImageDraw, ImageFont
+from src.properties import thumbnails
 
 User = get_user_model()
 
@@ -76,6 +77,7 @@ class Command(BaseCommand):
         parser.add_argument("--count", type=int, default=20)
         parser.add_argument("--owner", type=str, default=None)
 
+    @thumbnails.deferred()
     @transaction.atomic
     def handle(self, *args, **options):
         fake = Faker("de_DE")
@@ -1,14 +1,12 @@
 from django.core.management.base import BaseCommand
 from django.apps import apps
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.conf import settings
 from django.db import transaction
-import os, random, time
+import hashlib, os, random
 
-try:
-    import requests
-except Exception:
-    requests = None
+from src.shared.downloader import Downloader, download_dir, requests
+from src.properties import thumbnails
 
 CATS = ["exterior", "living", "bedroom", "kitchen", "bathroom"]
 
@@ -29,13 +27,13 @@ def _fk_name(PropertyImage, Property):
             return f.name
     return "property"
 
-def pexels_search(q: str, per_page: int, page: int, api_key: str):
-    url = "https://api.pexels.com/v1/search"
+def cache_path(url: str):
+    return download_dir("pexels", hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+def pexels_search(downloader: Downloader, q: str, per_page: int, page: int, api_key: str):
     headers = {"Authorization": api_key}
     params = {"query": q, "per_page": per_page, "page": page, "orientation": "landscape"}
-    r = requests.get(url, headers=headers, params=params, timeout=15)
-    r.raise_for_status()
-    photos = r.json().get("photos", [])
+    photos = downloader.get_json(settings.PEXELS_API_URL, headers=headers, params=params).get("photos", [])
     out = []
     for ph in photos:
         src = ph.get("src", {})
@@ -55,8 +53,11 @@ class Command(BaseCommand):
         parser.add_argument("--make-primary", action="store_true", help="Первое фото пометить is_primary=True (если поле есть).")
         parser.add_argument("--city-in", type=str, default=None, help="Список городов через запятую (фильтр Property.city).")
         parser.add_argument("--limit", type=int, default=None, help="Ограничить число объектов.")
-        parser.add_argument("--sleep", type=float, default=0.1, help="Пауза между скачиваниями (по умолчанию 0.1).")
+        parser.add_argument("--sleep", type=float, default=0.1,
+                            help="Минимальная пауза между запросами к одному хосту (по умолчанию 0.1).")
+        parser.add_argument("--workers", type=int, default=None, help="Параллельных загрузок (DOWNLOAD_WORKERS).")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         if requests is None:
             self.stderr.write(self.style.ERROR("Нужен пакет 'requests' (pip install requests)"))
@@ -83,6 +84,9 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR("У модели PropertyImage нет поля 'image'."))
             return
 
+        downloader = Downloader(workers=opts["workers"], interval=sleep_s, timeout=20, accept="image/",
+                                manifest=download_dir("pexels", "manifest.jsonl"))
+
         # Собираем пул URL по категориям (по ~200 на категорию)
         self.stdout.write(self.style.HTTP_INFO("Собираю список URL с Pexels..."))
         pool = {c: [] for c in CATS}
@@ -94,7 +98,7 @@ class Command(BaseCommand):
             while need > 0 and qs:
                 q = random.choice(qs)
                 try:
-                    batch = pexels_search(q, per_page=min(80, need), page=page, api_key=api_key)
+                    batch = pexels_search(downloader, q, per_page=min(80, need), page=page, api_key=api_key)
                 except Exception as e:
                     self.stderr.write(self.style.WARNING(f"[{cat}] Пропуск запроса: {e}"))
                     batch = []
@@ -109,7 +113,6 @@ class Command(BaseCommand):
                         pool[cat].append(u)
                 need -= len(batch)
                 page += 1
-                time.sleep(sleep_s)
 
             if not pool[cat]:
                 self.stderr.write(self.style.ERROR(f"Не нашли фото для категории '{cat}'."))
@@ -124,7 +127,7 @@ class Command(BaseCommand):
             qs = qs[: int(limit)]
 
         total_added = 0
-        session = requests.Session()
+        plan = []
 
         for prop in qs:
             # Текущее
@@ -162,17 +165,24 @@ class Command(BaseCommand):
                 k = min(need - len(chosen), len(rest))
                 if k > 0:
                     chosen += random.sample(rest, k=k)
-
+            plan.append((prop, need, existing, chosen))
+
+        # Качаем всё параллельно до транзакций, в кэш
+        files = {}
+        with downloader:
+            urls = {url for *_, chosen in plan for url in chosen}
+            for result in downloader.fetch_many((url, cache_path(url)) for url in urls):
+                if result.ok:
+                    files[result.url] = result.path
+                else:
+                    self.stderr.write(self.style.WARNING(f"Не скачано {result.url}: {result.error}"))
+
+        for prop, need, existing, chosen in plan:
             added_here = 0
 
             with transaction.atomic():
                 for idx, url in enumerate(chosen, start=1):
-                    try:
-                        r = session.get(url, timeout=20)
-                        if r.status_code != 200:
-                            continue
-                        content = r.content
-                    except Exception:
+                    if url not in files:
                         continue
 
                     img = PropertyImage()
@@ -190,11 +200,11 @@ class Command(BaseCommand):
 
                     # сохраняем через storage
                     fname = f"pexels_{prop.pk}_{random.randint(100000,999999)}.jpg"
-                    img.image.save(fname, ContentFile(content), save=False)
+                    with open(files[url], "rb") as fh:
+                        img.image.save(fname, File(fh), save=False)
                     img.save()
                     added_here += 1
                     total_added += 1
-                    time.sleep(sleep_s)
 
             self.stdout.write(self.style.SUCCESS(f"Property #{prop.pk}: добавлено {added_here} фото (нужно было {need})."))
 
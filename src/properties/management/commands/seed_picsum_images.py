@@ -9,6 +9,7 @@ from django.core.files.base import ContentFile
 from django.db import transaction
 
 import requests
+from src.properties import thumbnails
 
 SIZE_W, SIZE_H = 1280, 853
 
@@ -47,6 +48,7 @@ class Command(BaseCommand):
         parser.add_argument("--make-primary", action="store_true", help="Если есть поле is_primary — пометить первое фото как главное.")
         parser.add_argument("--owner", type=str, default=None, help="Если у PropertyImage есть owner/created_by/user — проставить этого пользователя (username).")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         per = max(1, int(opts["per"]))
         only_empty = bool(opts["only_empty"])
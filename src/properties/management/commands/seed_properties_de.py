@@ -6,6 +6,7 @@ from django.conf import settings
 from pathlib import Path
 import random
 from src.properties.models import Property, PropertyImage
+from src.properties import thumbnails
 
 
 class Command(BaseCommand):
@@ -14,6 +15,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--count", type=int, default=40)
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         count = int(opts.get("count") or 40)
         User = get_user_model()
@@ -4,6 +4,7 @@ from django.apps import apps
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
 import random
+from src.properties import thumbnails
 
 def make_img(text: str) -> ContentFile:
     img = Image.new("RGB", (1280, 800), (230, 233, 239))
@@ -27,6 +28,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--per", type=int, default=3, help="Images per property")
 
+    @thumbnails.deferred()
     def handle(self, *args, **opts):
         Property = apps.get_model("properties", "Property")
         PropertyImage = apps.get_model("properties", "PropertyImage")
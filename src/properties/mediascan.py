@@ -0,0 +1,120 @@
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Collate
+
+
+class ScanStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.files = 0
+        self.referenced = 0
+        self.missing = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    def count(self, files):
+        for item in files:
+            self.files += 1
+            yield item
+
+
+def _listdir(path):
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append((entry.name, entry.stat(follow_symlinks=False).st_mtime))
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files, dirs
+
+
+def _walk(pool, listing, path, prefix):
+    files, dirs = listing.result()
+    pending = {d: pool.submit(_listdir, os.path.join(path, d)) for d in dirs}
+    # "name/" for directories makes per-directory order match the order of full paths
+    entries = sorted([(name, mtime) for name, mtime in files] + [(d + "/", None) for d in dirs])
+    for key, mtime in entries:
+        if key.endswith("/"):
+            yield from _walk(pool, pending.pop(key[:-1]), os.path.join(path, key[:-1]), prefix + key)
+        else:
+            yield prefix + key, mtime
+
+
+def walk_sorted(root, prefix="", workers=8):
+    """Yield (relative name, mtime) for every file under ``root``, ordered by
+    code point of the full name. Subdirectories are listed ahead in a pool."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        yield from _walk(pool, pool.submit(_listdir, str(root)), str(root), prefix)
+
+
+BINARY_COLLATIONS = {"postgresql": "C", "mysql": "utf8mb4_bin"}
+
+
+def _sorted_names(qs, field, chunk_size):
+    # byte order, the same as Python's str ordering for UTF-8; keyset chunks keep
+    # memory flat on backends whose cursors buffer the whole result
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    key = Collate(F(field), collation) if collation else F(field)
+    qs = qs.annotate(sort_key=key).order_by("sort_key")
+    last = None
+    while True:
+        chunk = qs if last is None else qs.filter(sort_key__gt=last)
+        names = list(chunk.values_list(field, flat=True)[:chunk_size])
+        yield from names
+        if len(names) < chunk_size:
+            return
+        last = names[-1]
+
+
+def db_names(prefix, chunk_size=2000):
+    """Stored media names under ``prefix`` (image rows and content blobs) in sorted order."""
+    from .models import MediaBlob, PropertyImage
+
+    return heapq.merge(
+        _sorted_names(PropertyImage.objects.filter(image__startswith=prefix), "image", chunk_size),
+        _sorted_names(MediaBlob.objects.filter(name__startswith=prefix), "name", chunk_size),
+    )
+
+
+def _unique(names):
+    last = None
+    for name in names:
+        if last is not None and name < last:
+            raise RuntimeError(f"Database order differs from filesystem order at {name!r}")
+        if name != last:
+            yield name
+            last = name
+
+
+def orphans(files, names, stats):
+    """Merge the sorted file and name streams, yielding (name, mtime) of files
+    nothing in the database refers to."""
+    names = _unique(names)
+    current = next(names, None)
+    for name, mtime in files:
+        while current is not None and current < name:
+            stats.missing += 1
+            current = next(names, None)
+        if current == name:
+            stats.referenced += 1
+            current = next(names, None)
+            continue
+        yield name, mtime
+    while current is not None:
+        stats.missing += 1
+        current = next(names, None)
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:25
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+
+def backfill_listings(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    PropertyListing = apps.get_model('properties', 'PropertyListing')
+    Review = apps.get_model('reviews', 'Review')
+    ViewEvent = apps.get_model('analytics', 'ViewEvent')
+
+    week_ago = timezone.now() - timedelta(days=7)
+    rating = {r['property_id']: r for r in Review.objects.values('property_id').annotate(avg=Avg('rating'), total=Count('id'))}
+    views_total = dict(ViewEvent.objects.values('property_id').annotate(c=Count('id')).values_list('property_id', 'c'))
+    views_7d = dict(
+        ViewEvent.objects.filter(created_at__gte=week_ago)
+        .values('property_id').annotate(c=Count('id')).values_list('property_id', 'c')
+    )
+    covers = {}
+    for property_id, name in PropertyImage.objects.order_by('-id').values_list('property_id', 'image'):
+        covers[property_id] = name
+
+    rows = []
+    for pk in Property.objects.values_list('pk', flat=True):
+        r = rating.get(pk) or {}
+        rows.append(PropertyListing(
+            property_id=pk,
+            rating_avg=r.get('avg'),
+            reviews_total=r.get('total') or 0,
+            views_total=views_total.get(pk, 0),
+            views_7d=views_7d.get(pk, 0),
+            cover_path=covers.get(pk) or '',
+        ))
+    PropertyListing.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0007_add_address_fields'),
+        ('reviews', '0004_review_unique_review_per_user_per_property'),
+        ('analytics', '0004_merge_20250821_XXXX'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyListing',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='properties.property')),
+                ('rating_avg', models.FloatField(blank=True, null=True)),
+                ('reviews_total', models.PositiveIntegerField(default=0)),
+                ('views_total', models.PositiveIntegerField(default=0)),
+                ('views_7d', models.PositiveIntegerField(default=0)),
+                ('cover_path', models.CharField(blank=True, default='', max_length=255)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['reviews_total', 'rating_avg'], name='properties__reviews_152d80_idx'), models.Index(fields=['views_total'], name='properties__views_t_f2902c_idx'), models.Index(fields=['views_7d'], name='properties__views_7_29da87_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_listings, migrations.RunPython.noop),
+    ]
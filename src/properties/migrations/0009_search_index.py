@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'properties_search_fts'
+
+
+def create_fulltext(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE properties_propertysearchdocument '
+            'ADD FULLTEXT INDEX properties_search_document_ft (document)'
+        )
+    elif conn.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "title, place, body, parts, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+            )
+        except Exception:
+            return
+
+
+def drop_fulltext(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE properties_propertysearchdocument DROP INDEX properties_search_document_ft')
+    elif conn.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def populate(apps, schema_editor):
+    from src.properties.search import fts_row, fulltext_document
+    conn = schema_editor.connection
+    Property = apps.get_model('properties', 'Property')
+    PropertySearchDocument = apps.get_model('properties', 'PropertySearchDocument')
+    if conn.vendor == 'mysql':
+        PropertySearchDocument.objects.bulk_create(
+            [PropertySearchDocument(property_id=p.pk, document=fulltext_document(p)) for p in Property.objects.iterator()],
+            batch_size=500,
+        )
+    elif conn.vendor == 'sqlite' and FTS_TABLE in conn.introspection.table_names():
+        with conn.cursor() as cur:
+            for p in Property.objects.iterator():
+                cur.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, place, body, parts) VALUES (%s, %s, %s, %s, %s)',
+                    [p.pk, *fts_row(p)],
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0008_propertylisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertySearchDocument',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='properties.property')),
+                ('document', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(create_fulltext, drop_fulltext),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
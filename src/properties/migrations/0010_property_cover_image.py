@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def backfill_covers(apps, schema_editor):
+    Property = apps.get_model('properties', 'Property')
+    PropertyImage = apps.get_model('properties', 'PropertyImage')
+    covers = dict(PropertyImage.objects.values('property_id').annotate(first=Min('id')).values_list('property_id', 'first'))
+    rows = []
+    for prop in Property.objects.only('id'):
+        if prop.pk in covers:
+            prop.cover_image_id = covers[prop.pk]
+            rows.append(prop)
+    Property.objects.bulk_update(rows, ['cover_image'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='propertylisting',
+            name='cover_path',
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='cover_image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='properties.propertyimage'),
+        ),
+        migrations.RunPython(backfill_covers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0010_property_cover_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='thumb_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='thumb_source',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='propertyimage',
+            name='thumb_widths',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
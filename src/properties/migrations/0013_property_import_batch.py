@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='import_batch',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=32),
+        ),
+    ]
@@ -1,7 +1,11 @@
+import builtins
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.templatetags.static import static
+from django.utils import timezone
 from src.shared.enums import PropertyType
+from .storage import image_storage
 
 
 class Property(models.Model):
@@ -24,6 +28,16 @@ class Property(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.PositiveIntegerField(default=0)
     reviews_count = models.PositiveIntegerField(default=0)
+    cover_image = models.ForeignKey(
+        'PropertyImage',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='+'
+    )
+    # set by the CSV importer so a chunk's rows can be found again after a
+    # bulk INSERT that does not return ids
+    import_batch = models.CharField(max_length=32, blank=True, default='', db_index=True, editable=False)
 
     class Meta:
         indexes = [
@@ -40,7 +54,7 @@ class Property(models.Model):
 
     @property
     def cover(self):
-        return self.images.order_by('id').first()
+        return self.cover_image if self.cover_image_id else None
 
     @property
     def cover_url(self):
@@ -59,10 +73,93 @@ class PropertyImage(models.Model):
         on_delete=models.CASCADE,
         related_name='images'
     )
-    image = models.ImageField(upload_to='properties/%Y/%m/%d/')
+    image = models.ImageField(upload_to='properties/%Y/%m/%d/', storage=image_storage)
     alt = models.CharField(max_length=200, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     address_line = models.CharField(max_length=255, blank=True, default='')
+    thumb_source = models.CharField(max_length=255, blank=True, default='')
+    thumb_hash = models.CharField(max_length=32, blank=True, default='')
+    thumb_widths = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return self.alt or f"Image #{self.pk} for {self.property_id}"
+
+    @builtins.property
+    def has_thumbs(self):
+        return bool(self.thumb_hash and self.thumb_widths and self.image and self.thumb_source == self.image.name)
+
+    def thumb_url(self, width, ext='jpg'):
+        from .thumbnails import thumb_name
+        return default_storage.url(thumb_name(self.thumb_hash, width, ext))
+
+    def srcset(self, ext='jpg'):
+        if not self.has_thumbs:
+            return ''
+        return ', '.join(f"{self.thumb_url(w, ext)} {w}w" for w in self.thumb_widths)
+
+    @builtins.property
+    def srcset_webp(self):
+        return self.srcset('webp')
+
+    @builtins.property
+    def srcset_jpg(self):
+        return self.srcset('jpg')
+
+    @builtins.property
+    def display_url(self):
+        if self.has_thumbs:
+            return self.thumb_url(self.thumb_widths[0])
+        return self.image.url if self.image else ''
+
+
+class PropertyListing(models.Model):
+    property = models.OneToOneField(
+        Property,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='listing'
+    )
+    rating_avg = models.FloatField(null=True, blank=True)
+    reviews_total = models.PositiveIntegerField(default=0)
+    views_total = models.PositiveIntegerField(default=0)
+    views_7d = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reviews_total', 'rating_avg']),
+            models.Index(fields=['views_total']),
+            models.Index(fields=['views_7d']),
+        ]
+
+    def __str__(self):
+        return f"Listing of {self.property_id}"
+
+
+class PropertySearchDocument(models.Model):
+    property = models.OneToOneField(
+        Property,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    document = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"Search document of {self.property_id}"
+
+
+class MediaBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
@@ -0,0 +1,388 @@
+import bisect
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Property, PropertySearchDocument
+
+FTS_TABLE = "properties_search_fts"
+MIN_PART = 4
+
+_FIELDS = (
+    ("title", 3.0),
+    ("city", 2.0),
+    ("district", 2.0),
+    ("postal_code", 2.0),
+    ("address_line", 1.5),
+    ("description", 1.0),
+)
+_FOLD = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss", "ẞ": "ss"})
+_word_re = re.compile(r"[0-9a-z]+")
+
+
+def normalize(text):
+    text = (text or "").lower().translate(_FOLD)
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return _word_re.findall(normalize(text))
+
+
+def compound_parts(token):
+    # "gartenhaus" -> "haus", "enhaus", ... so a search for the tail of a
+    # German compound still hits; the head is covered by prefix matching.
+    if len(token) < MIN_PART * 2:
+        return []
+    return [token[i:] for i in range(MIN_PART - 1, len(token) - MIN_PART + 1)]
+
+
+def query_terms(query):
+    return [t for t in dict.fromkeys(tokenize(query)) if len(t) >= 2 or t.isdigit()]
+
+
+def document_fields(prop):
+    out = {}
+    for name, _ in _FIELDS:
+        tokens = tokenize(getattr(prop, name, "") or "")
+        parts = [p for t in tokens for p in compound_parts(t)]
+        out[name] = (tokens, parts)
+    return out
+
+
+def fts_row(prop):
+    fields = document_fields(prop)
+    title = " ".join(fields["title"][0])
+    place = " ".join(t for name in ("city", "district", "postal_code", "address_line") for t in fields[name][0])
+    body = " ".join(fields["description"][0])
+    parts = " ".join(p for _, ps in fields.values() for p in ps)
+    return title, place, body, parts
+
+
+def fulltext_document(prop):
+    fields = document_fields(prop)
+    chunks = []
+    for name, weight in _FIELDS:
+        tokens, parts = fields[name]
+        chunks.extend(tokens * max(int(weight), 1))
+        chunks.extend(parts)
+    return " ".join(chunks)
+
+
+class SearchScore(Func):
+    """Relevance of the outer row as a correlated subquery; ``sql`` is a
+    format string with ``{query}`` and ``{pk}`` placeholders, in that order."""
+
+    output_field = FloatField()
+
+    def __init__(self, sql, query):
+        super().__init__(Value(query), F("pk"))
+        self.sql = sql
+
+    def as_sql(self, compiler, connection, **extra_context):
+        query_sql, query_params = compiler.compile(self.source_expressions[0])
+        pk_sql, pk_params = compiler.compile(self.source_expressions[1])
+        return self.sql.format(query=query_sql, pk=pk_sql), [*query_params, *pk_params]
+
+
+class BaseSearchBackend:
+    name = ""
+
+    def search(self, query, limit=None):
+        """[(pk, score), ...] best first."""
+        raise NotImplementedError
+
+    def filter(self, qs, query, order=True):
+        """``qs`` narrowed to the matches of ``query``, best first when ``order``."""
+        ranked = self.search(query)
+        ids = [pk for pk, _ in ranked]
+        qs = qs.filter(pk__in=ids)
+        if order and ids:
+            # only the in-process index lands here; its scores never reach SQL
+            rank = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+            qs = qs.annotate(search_rank=rank).order_by("search_rank")
+        return qs
+
+    def index(self, prop):
+        raise NotImplementedError
+
+    def index_many(self, props):
+        for prop in props:
+            self.index(prop)
+
+    def remove(self, pk):
+        raise NotImplementedError
+
+    def rebuild(self):
+        count = 0
+        for prop in Property.objects.only(*[n for n, _ in _FIELDS]).iterator():
+            self.index(prop)
+            count += 1
+        return count
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    name = "memory"
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, "PROPERTY_SEARCH_INDEX_TTL", 300)
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)
+        self._docs = {}
+        self._terms = []
+        self._dirty = False
+        self._loaded_at = None
+
+    def _add(self, pk, fields):
+        weights = defaultdict(float)
+        for name, weight in _FIELDS:
+            tokens, parts = fields[name]
+            for t in tokens:
+                weights[t] += weight
+            for p in parts:
+                weights[p] += weight * 0.5
+        for term, w in weights.items():
+            self._postings[term][pk] = w
+        self._docs[pk] = set(weights)
+        self._dirty = True
+
+    def _drop(self, pk):
+        for term in self._docs.pop(pk, ()):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(pk, None)
+                if not posting:
+                    del self._postings[term]
+        self._dirty = True
+
+    def _ensure_loaded(self):
+        expired = self.ttl and self._loaded_at and time.monotonic() - self._loaded_at > self.ttl
+        if self._loaded_at is None or expired:
+            self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._docs = {}
+            count = 0
+            for prop in Property.objects.only(*[n for n, _ in _FIELDS]).iterator():
+                self._add(prop.pk, document_fields(prop))
+                count += 1
+            self._loaded_at = time.monotonic()
+            return count
+
+    def index(self, prop):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._drop(prop.pk)
+            self._add(prop.pk, document_fields(prop))
+
+    def index_many(self, props):
+        with self._lock:
+            for prop in props:
+                self.index(prop)
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._drop(pk)
+
+    def _expand(self, term):
+        lo = bisect.bisect_left(self._terms, term)
+        hi = bisect.bisect_left(self._terms, term + "\uffff")
+        return self._terms[lo:hi]
+
+    def search(self, query, limit=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            if self._dirty:
+                self._terms = sorted(self._postings)
+                self._dirty = False
+            total = max(len(self._docs), 1)
+            scores = None
+            for term in terms:
+                found = defaultdict(float)
+                for token in self._expand(term):
+                    posting = self._postings[token]
+                    idf = math.log(1 + total / len(posting))
+                    exact = 1.0 if token == term else 0.7
+                    for pk, w in posting.items():
+                        found[pk] = max(found[pk], w * idf * exact)
+                if scores is None:
+                    scores = dict(found)
+                else:
+                    scores = {pk: s + found[pk] for pk, s in scores.items() if pk in found}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], -kv[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    name = "sqlite"
+
+    @classmethod
+    def available(cls):
+        if connection.vendor != "sqlite":
+            return False
+        return FTS_TABLE in connection.introspection.table_names()
+
+    def index(self, prop):
+        with connection.cursor() as cur:
+            cur.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [prop.pk])
+            cur.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, place, body, parts) VALUES (%s, %s, %s, %s, %s)",
+                [prop.pk, *fts_row(prop)],
+            )
+
+    def index_many(self, props):
+        rows = [(prop.pk, *fts_row(prop)) for prop in props]
+        with connection.cursor() as cur:
+            cur.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cur.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, place, body, parts) VALUES (%s, %s, %s, %s, %s)", rows
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cur:
+            cur.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+    def rebuild(self):
+        with connection.cursor() as cur:
+            cur.execute(f"DELETE FROM {FTS_TABLE}")
+        return super().rebuild()
+
+    @staticmethod
+    def _match(query):
+        terms = query_terms(query)
+        return " AND ".join(f'"{t}"*' for t in terms) if terms else None
+
+    def search(self, query, limit=None):
+        match = self._match(query)
+        if not match:
+            return []
+        with connection.cursor() as cur:
+            cur.execute(
+                f"SELECT rowid, bm25({FTS_TABLE}, 3.0, 2.0, 1.0, 0.5) AS score FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s ORDER BY score LIMIT %s",
+                [match, limit or -1],
+            )
+            return [(pk, -score) for pk, score in cur.fetchall()]
+
+    def filter(self, qs, query, order=True):
+        match = self._match(query)
+        if not match:
+            return qs.none()
+        qs = qs.filter(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+        if order:
+            score = SearchScore(
+                f"(SELECT -bm25({FTS_TABLE}, 3.0, 2.0, 1.0, 0.5) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH {{query}} AND rowid = {{pk}})",
+                match,
+            )
+            qs = qs.annotate(search_score=score).order_by("-search_score", "-pk")
+        return qs
+
+
+class MySQLFulltextBackend(BaseSearchBackend):
+    name = "mysql"
+
+    @classmethod
+    def available(cls):
+        return connection.vendor == "mysql"
+
+    def index(self, prop):
+        PropertySearchDocument.objects.update_or_create(
+            property_id=prop.pk, defaults={"document": fulltext_document(prop)}
+        )
+
+    def index_many(self, props):
+        PropertySearchDocument.objects.bulk_create(
+            [PropertySearchDocument(property_id=prop.pk, document=fulltext_document(prop)) for prop in props],
+            update_conflicts=True,
+            update_fields=["document"],
+        )
+
+    def remove(self, pk):
+        PropertySearchDocument.objects.filter(property_id=pk).delete()
+
+    def rebuild(self):
+        PropertySearchDocument.objects.all().delete()
+        return super().rebuild()
+
+    def search(self, query, limit=None):
+        terms = query_terms(query)
+        if not terms:
+            return []
+        table = PropertySearchDocument._meta.db_table
+        with connection.cursor() as cur:
+            cur.execute(
+                f"SELECT property_id, MATCH(document) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+                f"FROM {table} WHERE MATCH(document) AGAINST (%s IN BOOLEAN MODE) "
+                f"ORDER BY score DESC" + (" LIMIT %s" if limit else ""),
+                [" ".join(terms), " ".join(f"+{t}*" for t in terms), *([limit] if limit else [])],
+            )
+            return list(cur.fetchall())
+
+    def filter(self, qs, query, order=True):
+        terms = query_terms(query)
+        if not terms:
+            return qs.none()
+        table = PropertySearchDocument._meta.db_table
+        qs = qs.filter(pk__in=RawSQL(
+            f"SELECT property_id FROM {table} WHERE MATCH(document) AGAINST (%s IN BOOLEAN MODE)",
+            [" ".join(f"+{t}*" for t in terms)],
+        ))
+        if order:
+            score = SearchScore(
+                f"(SELECT MATCH(document) AGAINST ({{query}} IN NATURAL LANGUAGE MODE) "
+                f"FROM {table} WHERE property_id = {{pk}})",
+                " ".join(terms),
+            )
+            qs = qs.annotate(search_score=score).order_by("-search_score", "-pk")
+        return qs
+
+
+_BACKENDS = {
+    "mysql": MySQLFulltextBackend,
+    "sqlite": SQLiteFTSBackend,
+    "memory": InMemorySearchBackend,
+}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, "PROPERTY_SEARCH_BACKEND", "") or ""
+                if name in _BACKENDS:
+                    _backend = _BACKENDS[name]()
+                elif MySQLFulltextBackend.available():
+                    _backend = MySQLFulltextBackend()
+                elif SQLiteFTSBackend.available():
+                    _backend = SQLiteFTSBackend()
+                else:
+                    _backend = InMemorySearchBackend()
+    return _backend
+
+
+def apply_search(qs, query, order=True):
+    """Every row of ``qs`` matching ``query``; the match runs in the same SQL
+    statement as the other filters, so nothing is cut off before them."""
+    return get_backend().filter(qs, query, order=order)
@@ -1,7 +1,20 @@
 from rest_framework import serializers
+from src.shared.serializers import SparseFieldsMixin
 from .models import Property
 
-class PropertySerializer(serializers.ModelSerializer):
+
+def _absolute(serializer, url):
+    request = serializer.context.get("request")
+    return request.build_absolute_uri(url) if request and url else url
+
+
+class PropertySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    cover = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
+
+    # what each non-column field needs loaded (see PropertyViewSet.get_queryset)
+    query_requirements = {"cover": ("cover_image",), "cover_srcset": ("cover_image",)}
+
     class Meta:
         model = Property
         fields = (
@@ -21,6 +34,8 @@ class PropertySerializer(serializers.ModelSerializer):
             'reviews_count',
             'created_at',
             'updated_at',
+            'cover',
+            'cover_srcset',
         )
         read_only_fields = (
             'owner',
@@ -29,3 +44,40 @@ class PropertySerializer(serializers.ModelSerializer):
             'created_at',
             'updated_at',
         )
+
+    def get_cover(self, obj):
+        image = obj.cover_image if obj.cover_image_id else None
+        if not image or not image.image:
+            return None
+        return _absolute(self, image.image.url)
+
+    def get_cover_srcset(self, obj):
+        image = obj.cover_image if obj.cover_image_id else None
+        if not image or not image.has_thumbs:
+            return None
+        request = self.context.get("request")
+        absolute = request.build_absolute_uri if request else (lambda url: url)
+        return {
+            ext: ", ".join(f"{absolute(image.thumb_url(w, ext))} {w}w" for w in image.thumb_widths)
+            for ext in ("webp", "jpg")
+        }
+
+
+class PropertyListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Card-sized listing entry for list views (``?compact=1``)."""
+
+    thumbnail = serializers.SerializerMethodField()
+    rating = serializers.FloatField(source="rating_avg", read_only=True, allow_null=True)
+
+    query_requirements = {"thumbnail": ("cover_image",), "rating": ("rating_avg",)}
+
+    class Meta:
+        model = Property
+        fields = ("id", "title", "city", "price", "rooms", "thumbnail", "rating")
+        read_only_fields = fields
+
+    def get_thumbnail(self, obj):
+        image = obj.cover_image if obj.cover_image_id else None
+        if not image or not image.image:
+            return None
+        return _absolute(self, image.display_url)
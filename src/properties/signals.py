@@ -0,0 +1,133 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from src.analytics.models import ViewEvent
+from src.analytics.signals import events_flushed
+from .models import Property, PropertyImage
+from . import cache as catalog_cache
+from . import listing, search, thumbnails
+from .storage import adjust_refcount
+
+logger = logging.getLogger(__name__)
+
+
+def _city_of(property_id):
+    return Property.objects.filter(pk=property_id).values_list("city", flat=True).first() or ""
+
+
+@receiver(pre_save, sender=Property)
+def remember_city(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_city = _city_of(instance.pk)
+
+
+@receiver(post_save, sender=Property)
+def create_listing(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        listing.ensure_listing(instance.pk)
+
+
+@receiver(post_save, sender=Property)
+def index_property(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.get_backend().index(instance)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_catalog(sender, instance, **kwargs):
+    cities = {instance.city, getattr(instance, "_previous_city", "")}
+    catalog_cache.invalidate_property(instance.pk, cities)
+
+
+@receiver(post_delete, sender=Property)
+def unindex_property(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def image_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        listing.refresh_cover(instance.property_id)
+        catalog_cache.invalidate_media(instance.property_id)
+
+
+@receiver(pre_save, sender=PropertyImage)
+@receiver(pre_delete, sender=PropertyImage)
+def remember_image(sender, instance, raw=False, **kwargs):
+    # image.delete(save=False) clears the name before the row goes, so read the stored one
+    if instance.pk and not raw:
+        instance._previous_image = (
+            PropertyImage.objects.filter(pk=instance.pk).values_list("image", flat=True).first() or ""
+        )
+
+
+@receiver(post_save, sender=PropertyImage)
+def count_blob_refs(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = "" if created else getattr(instance, "_previous_image", "")
+    current = instance.image.name or ""
+    if previous != current:
+        adjust_refcount(current, 1)
+        adjust_refcount(previous, -1)
+    instance._previous_image = current
+
+
+@receiver(post_delete, sender=PropertyImage)
+def release_blob(sender, instance, **kwargs):
+    adjust_refcount(getattr(instance, "_previous_image", None) or instance.image.name or "", -1)
+
+
+@receiver(post_save, sender=PropertyImage)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(settings, "THUMBNAIL_ON_UPLOAD", True):
+        return
+    if instance.image and instance.image.name != instance.thumb_source and not thumbnails.defer(instance):
+        pk = instance.pk
+        transaction.on_commit(lambda: thumbnails.enqueue(pk))
+
+
+@receiver(post_save, sender="reviews.Review")
+@receiver(post_delete, sender="reviews.Review")
+def review_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        listing.refresh_reviews(instance.property_id)
+        catalog_cache.invalidate_property(instance.property_id, [_city_of(instance.property_id)])
+
+
+def _roll_views():
+    # the analytics receivers are connected on import above, so the daily
+    # buckets already hold these events and the recount includes them
+    changed = listing.roll_views()
+    if changed:
+        catalog_cache.invalidate_rolling_views(changed)
+
+
+@receiver(post_save, sender=ViewEvent)
+def view_recorded(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        listing.record_views({instance.property_id: 1})
+        _roll_views()
+        catalog_cache.invalidate_views(instance.property_id)
+
+
+@receiver(events_flushed, sender=ViewEvent)
+def views_flushed(sender, rows, **kwargs):
+    counts = Counter(row["property_id"] for row in rows)
+    listing.record_views(counts)
+    _roll_views()
+    for property_id in counts:
+        catalog_cache.invalidate_views(property_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def admin_contact_changed(sender, instance, **kwargs):
+    catalog_cache.invalidate_admin_contact()
@@ -0,0 +1,121 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+BLOB_PREFIX = "properties/blobs/"
+
+
+def blob_name(digest, ext):
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}{ext}"
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def file_digest(fh):
+    h = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fh.read(1 << 20), b""):
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _extension(name):
+    ext = os.path.splitext(name or "")[1].lower()
+    return ext if len(ext) <= 8 else ""
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores each distinct file once under ``properties/blobs/<hh>/<sha256><ext>``.
+
+    Saving bytes that already exist returns the existing name. Deleting a blob
+    is a no-op: blobs are shared, ``MediaBlob.refcount`` tracks how many images
+    point at one and ``purge_property_media --orphaned`` removes unreferenced ones.
+    """
+
+    def save(self, name, content, max_length=None):
+        from .models import MediaBlob
+
+        if name is None:
+            name = content.name
+        if hasattr(content, "seek"):
+            content.seek(0)
+        digest, size = file_digest(content)
+        content.seek(0)
+
+        blob = MediaBlob.objects.filter(sha256=digest).first()
+        if blob is not None and self.exists(blob.name):
+            return blob.name
+        target = blob_name(digest, _extension(name))
+        if not self.exists(target):
+            try:
+                target = super().save(target, content, max_length)
+            except FileExistsError:
+                pass
+        register_blob(digest, target, size)
+        return target
+
+    def get_available_name(self, name, max_length=None):
+        # identical names mean identical bytes, a concurrent writer already won
+        if is_blob(name) and self.exists(name):
+            raise FileExistsError(name)
+        return super().get_available_name(name, max_length)
+
+    def delete(self, name):
+        if is_blob(name):
+            return
+        super().delete(name)
+
+
+def register_blob(digest, name, size):
+    from .models import MediaBlob
+
+    try:
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.get_or_create(sha256=digest, defaults={"name": name, "size": size})
+    except IntegrityError:
+        blob = MediaBlob.objects.get(sha256=digest)
+    if blob.name != name:
+        MediaBlob.objects.filter(pk=blob.pk).update(name=name, size=size)
+    return blob
+
+
+def adjust_refcount(name, delta):
+    from .models import MediaBlob
+
+    if is_blob(name):
+        MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + delta, updated_at=timezone.now())
+
+
+def recount_blobs(batch_size=500):
+    """Recompute MediaBlob.refcount from PropertyImage rows; returns
+    (blobs changed, referenced names without a blob row)."""
+    from .models import MediaBlob, PropertyImage
+
+    counts = dict(
+        PropertyImage.objects.filter(image__startswith=BLOB_PREFIX)
+        .values("image").annotate(n=Count("id")).order_by().values_list("image", "n")
+    )
+    now = timezone.now()
+    changed = []
+    for blob in MediaBlob.objects.only("id", "name", "refcount").iterator():
+        n = counts.pop(blob.name, 0)
+        if blob.refcount != n:
+            blob.refcount = n
+            blob.updated_at = now
+            changed.append(blob)
+    MediaBlob.objects.bulk_update(changed, ["refcount", "updated_at"], batch_size=batch_size)
+    return len(changed), sorted(counts)
+
+
+def image_storage():
+    if getattr(settings, "PROPERTY_IMAGE_DEDUP", True):
+        return ContentAddressedStorage()
+    return default_storage
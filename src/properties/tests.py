@@ -0,0 +1,428 @@
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from src.analytics.models import PropertyViewDaily, ViewEvent
+from src.bookings.models import Booking
+from src.reviews.models import Review
+from src.shared.enums import BookingStatus
+from . import importer, listing, mediascan, storage, thumbnails
+from .models import MediaBlob, Property, PropertyImage, PropertyListing
+from .search import InMemorySearchBackend, SQLiteFTSBackend, apply_search
+
+
+def make_property(owner, **kwargs):
+    data = {
+        "title": "Wohnung", "description": "", "city": "Berlin", "price": 100, "rooms": 2,
+        "property_type": "APARTMENT",
+    }
+    data.update(kwargs)
+    return Property.objects.create(owner=owner, **data)
+
+
+class ListingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner = User.objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.tenant = User.objects.create_user(email="tenant@example.com", username="tenant", password="x")
+        cls.prop = make_property(cls.owner)
+        today = timezone.localdate()
+        Booking.objects.bulk_create([Booking(
+            property=cls.prop, tenant=cls.tenant, status=BookingStatus.COMPLETED,
+            start_date=today - timedelta(days=10), end_date=today - timedelta(days=5),
+        )])
+
+    def row(self):
+        return PropertyListing.objects.get(property=self.prop)
+
+    def test_listing_follows_reviews(self):
+        self.assertEqual((self.row().reviews_total, self.row().rating_avg), (0, None))
+        review = Review.objects.create(property=self.prop, author=self.tenant, rating=4, text="Gut")
+        self.assertEqual((self.row().reviews_total, self.row().rating_avg), (1, 4.0))
+        review.delete()
+        self.assertEqual(self.row().reviews_total, 0)
+
+    def test_views_increment_both_counters(self):
+        ViewEvent.objects.create(property=self.prop, session_key="s1")
+        ViewEvent.objects.create(property=self.prop, session_key="s2")
+        self.assertEqual((self.row().views_total, self.row().views_7d), (2, 2))
+
+    def test_rebuild_recomputes_drifted_rows(self):
+        Review.objects.create(property=self.prop, author=self.tenant, rating=5, text="")
+        ViewEvent.objects.create(property=self.prop, session_key="s1")
+        PropertyViewDaily.objects.create(
+            property=self.prop, day=timezone.localdate() - timedelta(days=30), views=3, unique_sessions=2,
+        )
+        PropertyListing.objects.filter(property=self.prop).delete()
+        other = make_property(self.owner, title="Studio")
+        PropertyListing.objects.filter(property=other).update(reviews_total=7)
+
+        self.assertEqual(listing.rebuild(), (1, 1))
+        row = self.row()
+        self.assertEqual((row.reviews_total, row.rating_avg, row.views_total, row.views_7d), (1, 5.0, 4, 1))
+        self.assertEqual(PropertyListing.objects.get(property=other).reviews_total, 0)
+
+    def test_api_orders_by_the_listing_columns(self):
+        other = make_property(self.owner, title="Studio")
+        PropertyListing.objects.filter(property=self.prop).update(rating_avg=3.0)
+        PropertyListing.objects.filter(property=other).update(rating_avg=4.5)
+        response = self.client.get("/api/properties/", {"ordering": "-rating_avg"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        results = data["results"] if isinstance(data, dict) else data
+        self.assertEqual([r["id"] for r in results], [other.pk, self.prop.pk])
+
+
+
+class CoverImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.prop = make_property(cls.owner)
+
+    def cover(self):
+        return Property.objects.values_list("cover_image", flat=True).get(pk=self.prop.pk)
+
+    def test_cover_follows_the_first_image(self):
+        first = PropertyImage.objects.create(property=self.prop, image="properties/a.jpg")
+        second = PropertyImage.objects.create(property=self.prop, image="properties/b.jpg")
+        self.assertEqual(self.cover(), first.pk)
+        first.delete()
+        self.assertEqual(self.cover(), second.pk)
+        second.delete()
+        self.assertIsNone(self.cover())
+
+    def test_backfill_repairs_drift(self):
+        image = PropertyImage.objects.create(property=self.prop, image="properties/a.jpg")
+        Property.objects.filter(pk=self.prop.pk).update(cover_image=None)
+        self.assertEqual(listing.backfill_covers(), 1)
+        self.assertEqual(self.cover(), image.pk)
+        self.assertEqual(listing.backfill_covers(), 0)
+
+    def test_api_returns_the_cover_url(self):
+        PropertyImage.objects.create(property=self.prop, image="properties/a.jpg")
+        data = self.client.get(f"/api/properties/{self.prop.pk}/").json()
+        self.assertTrue(data["cover"].endswith("/properties/a.jpg"))
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.prop = make_property(cls.owner, title="Altbau am Park")
+        cls.other = make_property(cls.owner, title="Studio", city="Hamburg")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_is_served_from_cache_until_a_property_changes(self):
+        self.assertContains(self.client.get("/"), "Altbau am Park")
+        Property.objects.filter(pk=self.prop.pk).update(title="Neubau")
+        self.assertContains(self.client.get("/"), "Altbau am Park")
+        self.prop.title = "Neubau"
+        self.prop.save()
+        self.assertContains(self.client.get("/"), "Neubau")
+
+    def test_city_pages_are_invalidated_separately(self):
+        self.assertContains(self.client.get("/", {"city": "Hamburg"}), "Studio")
+        self.assertContains(self.client.get("/", {"city": "Berlin"}), "Altbau am Park")
+        Property.objects.filter(pk=self.prop.pk).update(title="Neubau")
+        self.other.title = "Loft"
+        self.other.save()
+        self.assertContains(self.client.get("/", {"city": "Hamburg"}), "Loft")
+        # the Berlin page does not show the Hamburg property and keeps its entry
+        self.assertContains(self.client.get("/", {"city": "Berlin"}), "Altbau am Park")
+
+
+def png(size=(400, 300)):
+    from PIL import Image
+    buf = BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buf, "PNG")
+    return ContentFile(buf.getvalue(), name="photo.png")
+
+
+class MediaBlobTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        self.prop = make_property(owner)
+
+    def blobs_on_disk(self):
+        root = os.path.join(self.media, storage.BLOB_PREFIX)
+        return sorted(f for _, _, files in os.walk(root) for f in files)
+
+    def refcount(self, name):
+        return MediaBlob.objects.get(name=name).refcount
+
+    def test_identical_uploads_share_one_blob(self):
+        first = PropertyImage.objects.create(property=self.prop, image=png())
+        second = PropertyImage.objects.create(property=self.prop, image=png())
+        self.assertTrue(storage.is_blob(first.image.name))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(self.blobs_on_disk()), 1)
+        self.assertEqual(self.refcount(first.image.name), 2)
+
+    def test_refcount_follows_deletes_and_replacements(self):
+        first = PropertyImage.objects.create(property=self.prop, image=png())
+        second = PropertyImage.objects.create(property=self.prop, image=png())
+        shared = first.image.name
+        first.delete()
+        self.assertEqual(self.refcount(shared), 1)
+        self.assertTrue(default_storage.exists(shared))
+
+        second.image = png((300, 300))
+        second.save()
+        self.assertNotEqual(second.image.name, shared)
+        self.assertEqual((self.refcount(shared), self.refcount(second.image.name)), (0, 1))
+
+        out = StringIO()
+        call_command("purge_property_media", "--orphaned", "--grace", "0", "--yes", stdout=out)
+        self.assertFalse(default_storage.exists(shared))
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.assertEqual(list(MediaBlob.objects.values_list("name", flat=True)), [second.image.name])
+
+    def test_recount_repairs_drift(self):
+        image = PropertyImage.objects.create(property=self.prop, image=png())
+        MediaBlob.objects.update(refcount=5)
+        self.assertEqual(storage.recount_blobs(), (1, []))
+        self.assertEqual(self.refcount(image.image.name), 1)
+
+    def test_dedupe_moves_legacy_files_onto_blobs(self):
+        data = png().read()
+        names = [default_storage.save(f"properties/2024/01/0{i}/photo.png", ContentFile(data)) for i in (1, 2)]
+        PropertyImage.objects.bulk_create([PropertyImage(property=self.prop, image=name) for name in names])
+        call_command("dedupe_property_media", "--workers", "2", stdout=StringIO())
+        [name] = set(PropertyImage.objects.values_list("image", flat=True))
+        self.assertTrue(storage.is_blob(name))
+        self.assertEqual(self.refcount(name), 2)
+        self.assertFalse(any(default_storage.exists(n) for n in names))
+
+
+class MediaScanTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def touch(self, *names):
+        for name in names:
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+
+    def test_walk_matches_sorted_full_names(self):
+        names = ["a.jpg", "a/b.jpg", "a-b.jpg", "a0/c.jpg", "b/c/d.jpg", "ä.jpg", "Z.jpg"]
+        self.touch(*names)
+        walked = [name for name, _ in mediascan.walk_sorted(self.root, "properties/", workers=3)]
+        self.assertEqual(walked, sorted("properties/" + n for n in names))
+
+    def test_orphans_merge(self):
+        stats = mediascan.ScanStats()
+        files = [("a", 1), ("b", 2), ("c", 3), ("e", 4)]
+        found = list(mediascan.orphans(iter(files), iter(["b", "b", "d", "e", "f"]), stats))
+        self.assertEqual(found, [("a", 1), ("c", 3)])
+        self.assertEqual((stats.referenced, stats.missing), (2, 2))
+
+    def test_unsorted_names_are_refused(self):
+        with self.assertRaises(RuntimeError):
+            list(mediascan.orphans(iter([("a", 1)]), iter(["b", "a"]), mediascan.ScanStats()))
+
+
+
+class MediaNameStreamTests(TestCase):
+    def test_names_come_in_sorted_keyset_chunks(self):
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        prop = make_property(owner)
+        names = ["properties/b.jpg", "properties/a.jpg", "properties/c.jpg", "properties/a.jpg", "properties/B.jpg"]
+        PropertyImage.objects.bulk_create([PropertyImage(property=prop, image=n) for n in names])
+        MediaBlob.objects.create(sha256="0" * 64, name="properties/blobs/00/x.jpg")
+        self.assertEqual(
+            list(dict.fromkeys(mediascan.db_names("properties/", chunk_size=2))),
+            sorted(set(names) | {"properties/blobs/00/x.jpg"}),
+        )
+
+
+class PurgeScanTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        self.prop = make_property(owner)
+        old = time.time() - 7200
+        for name in ("properties/2024/kept.jpg", "properties/2024/orphan.jpg", "properties/young.jpg"):
+            default_storage.save(name, ContentFile(b"x"))
+            if "young" not in name:
+                os.utime(default_storage.path(name), (old, old))
+        PropertyImage.objects.bulk_create([PropertyImage(property=self.prop, image="properties/2024/kept.jpg")])
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command("purge_property_media", *args, "--progress", "0", stdout=out)
+        return out.getvalue()
+
+    def test_scan_deletes_old_unreferenced_files(self):
+        self.purge("--orphaned", "--scan", "--yes")
+        self.assertTrue(default_storage.exists("properties/2024/kept.jpg"))
+        self.assertFalse(default_storage.exists("properties/2024/orphan.jpg"))
+        self.assertTrue(default_storage.exists("properties/young.jpg"))
+
+    def test_manifest_is_rechecked_before_deleting(self):
+        manifest = os.path.join(self.media, "orphans.txt")
+        self.purge("--orphaned", "--scan", "--manifest", manifest)
+        with open(manifest, encoding="utf-8") as fh:
+            self.assertEqual(fh.read().split(), ["properties/2024/orphan.jpg"])
+        self.assertTrue(default_storage.exists("properties/2024/orphan.jpg"))
+        # referenced again between the scan and the purge
+        PropertyImage.objects.bulk_create([PropertyImage(property=self.prop, image="properties/2024/orphan.jpg")])
+        self.assertIn("Пропущено (снова в БД): 1", self.purge("--from-manifest", manifest, "--yes"))
+        self.assertTrue(default_storage.exists("properties/2024/orphan.jpg"))
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        # a common term whose best matches all sit outside the filtered city
+        for i in range(30):
+            make_property(cls.owner, title=f"Wohnung Wohnung {i}", city="Hamburg")
+        cls.berlin = make_property(cls.owner, title="Kleine Wohnung", description="Altbau", city="Berlin")
+        cls.other = make_property(cls.owner, title="Studio", city="Berlin")
+
+    def test_filters_apply_to_every_match(self):
+        qs = apply_search(Property.objects.filter(city="Berlin"), "wohnung")
+        self.assertEqual(list(qs.values_list("pk", flat=True)), [self.berlin.pk])
+
+    def test_orders_by_score(self):
+        best = make_property(self.owner, title="Altbau Altbau", description="Altbau")
+        ids = list(apply_search(Property.objects.all(), "altbau").values_list("pk", flat=True))
+        self.assertEqual(ids, [best.pk, self.berlin.pk])
+
+    def test_no_terms_matches_nothing(self):
+        self.assertFalse(apply_search(Property.objects.all(), "!!").exists())
+
+    def test_memory_backend_is_not_truncated(self):
+        qs = InMemorySearchBackend().filter(Property.objects.filter(city="Hamburg"), "wohnung")
+        self.assertEqual(qs.count(), 30)
+
+    def test_fts_count_ignores_ordering(self):
+        if not SQLiteFTSBackend.available():
+            self.skipTest("FTS5 table not available")
+        qs = SQLiteFTSBackend().filter(Property.objects.all(), "wohnung")
+        self.assertEqual(qs.count(), 31)
+
+
+class RollingViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        self.prop = make_property(owner)
+        PropertyViewDaily.objects.create(
+            property=self.prop, day=timezone.localdate() - timedelta(days=10), views=5, unique_sessions=5,
+        )
+        PropertyListing.objects.filter(property=self.prop).update(views_total=5, views_7d=5)
+
+    def test_days_outside_the_window_drop_out(self):
+        ViewEvent.objects.create(property=self.prop, session_key="s1")
+        row = PropertyListing.objects.get(property=self.prop)
+        self.assertEqual((row.views_total, row.views_7d), (6, 1))
+
+    def test_window_is_recounted_once_a_day(self):
+        ViewEvent.objects.create(property=self.prop, session_key="s1")
+        ViewEvent.objects.create(property=self.prop, session_key="s2")
+        self.assertEqual(PropertyListing.objects.get(property=self.prop).views_7d, 2)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, THUMBNAIL_WIDTHS=(100, 200), THUMBNAIL_ASYNC=False)
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+        self.prop = make_property(owner)
+
+    def test_upload_renders_after_commit_off_the_save(self):
+        with mock.patch.object(thumbnails, "enqueue", wraps=thumbnails.enqueue) as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                image = PropertyImage.objects.create(property=self.prop, image=png())
+            enqueue.assert_called_once_with(image.pk)
+        image.refresh_from_db()
+        self.assertTrue(image.has_thumbs)
+        self.assertEqual(image.thumb_widths, [100, 200])
+
+    def test_deferred_block_renders_once_at_the_end(self):
+        with mock.patch.object(thumbnails, "enqueue") as enqueue:
+            with thumbnails.deferred(workers=1):
+                with self.captureOnCommitCallbacks(execute=True):
+                    first = PropertyImage.objects.create(property=self.prop, image=png())
+                    second = PropertyImage.objects.create(property=self.prop, image=png((300, 300)))
+                first.refresh_from_db()
+                self.assertFalse(first.has_thumbs)
+            enqueue.assert_not_called()
+        for image in (first, second):
+            image.refresh_from_db()
+            self.assertTrue(image.has_thumbs)
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user(
+            email="owner@example.com", username="owner", password="x", is_superuser=True,
+        )
+
+    def rows(self, *rows):
+        header = {"title": "", "city": "", "price": "", "rooms": "", "owner_username": ""}
+        return [(line, {**header, **row}) for line, row in enumerate(rows, start=2)]
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        report = importer.ImportReport()
+        importer.import_rows(self.rows(
+            {"title": "A", "city": "Berlin", "price": "100", "rooms": "2"},
+            {"title": "B", "city": "Berlin", "price": "abc", "rooms": "2"},
+            {"title": "C", "city": "Köln", "price": "90,5", "rooms": "1"},
+        ), report, chunk_size=2)
+        self.assertEqual((report.rows, report.created, report.failed), (3, 2, 1))
+        self.assertEqual(report.errors[0][0], 3)
+        self.assertEqual(
+            sorted(Property.objects.values_list("title", flat=True)), ["A", "C"],
+        )
+        self.assertEqual(PropertyListing.objects.count(), 2)
+
+    def test_ids_without_returning_insert_ignore_concurrent_rows(self):
+        real_bulk_create = Property.objects.bulk_create
+
+        def with_concurrent_insert(objs, *args, **kwargs):
+            make_property(self.owner, title="Same", city="Berlin")
+            return real_bulk_create(objs, *args, **kwargs)
+
+        objs = [Property(owner=self.owner, title="Same", city="Berlin", description=str(i), price=1, rooms=1,
+                         property_type="APARTMENT") for i in range(3)]
+        features = type(connection.features)
+        with mock.patch.object(features, "can_return_rows_from_bulk_insert", new_callable=mock.PropertyMock,
+                               return_value=False), \
+                mock.patch.object(Property.objects, "bulk_create", side_effect=with_concurrent_insert):
+            importer._insert(objs)
+        for obj in objs:
+            self.assertEqual(Property.objects.get(pk=obj.pk).description, obj.description)
@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_queue = None
+_queue_lock = threading.Lock()
+
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+
+
+def widths():
+    return tuple(sorted(getattr(settings, "THUMBNAIL_WIDTHS", (320, 640, 1280))))
+
+
+def thumb_name(digest, width, ext):
+    return f"thumbs/{digest[:2]}/{digest}/{width}.{ext}"
+
+
+def content_hash(name):
+    h = hashlib.sha256()
+    with default_storage.open(name, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:32]
+
+
+def _encode(img, ext):
+    fmt, options = FORMATS[ext]
+    if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+        from PIL import Image
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img.convert("RGBA"), mask=img.convert("RGBA").getchannel("A"))
+        img = background
+    buf = BytesIO()
+    img.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def generate(name, force=False):
+    """Write WebP/JPEG derivatives of the stored image ``name`` under a path
+    derived from its content hash; existing files are reused."""
+    from PIL import Image, ImageOps
+
+    digest = content_hash(name)
+    with default_storage.open(name, "rb") as fh:
+        img = Image.open(fh)
+        img.load()
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    sizes = [w for w in widths() if w < img.width] or [img.width]
+    for width in sizes:
+        resized = None
+        for ext in FORMATS:
+            target = thumb_name(digest, width, ext)
+            if not force and default_storage.exists(target):
+                continue
+            if resized is None:
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+            if force and default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(_encode(resized, ext)))
+    return {"thumb_source": name, "thumb_hash": digest, "thumb_widths": sizes}
+
+
+def _generate_safe(args):
+    name, force = args
+    try:
+        return name, generate(name, force), None
+    except Exception as exc:
+        return name, None, f"{type(exc).__name__}: {exc}"
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def generate_many(names, workers=None, force=False):
+    """Yield (name, fields, error) for each image, rendering in a process pool."""
+    jobs = [(name, force) for name in names]
+    if not workers or workers <= 1 or len(jobs) <= 1:
+        yield from map(_generate_safe, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(_generate_safe, jobs, chunksize=4)
+
+
+def refresh(image):
+    from .models import PropertyImage
+    if not image.image:
+        return
+    fields = generate(image.image.name)
+    PropertyImage.objects.filter(pk=image.pk, image=image.image.name).update(**fields)
+    for key, value in fields.items():
+        setattr(image, key, value)
+
+
+def render_images(images, workers=None, force=False):
+    """Render ``{name: [(image pk, property id), ...]}`` in one generate_many
+    pass and store the results; returns (done, failed)."""
+    from . import cache as catalog_cache
+    from .models import PropertyImage
+
+    done = failed = 0
+    if not images:
+        return done, failed
+    if not any(conn.in_atomic_block for conn in connections.all()):
+        # the pool forks; children must not share the parent's sockets
+        connections.close_all()
+    for name, fields, error in generate_many(list(images), workers, force):
+        if error:
+            failed += 1
+            logger.warning("Thumbnail generation failed for %s: %s", name, error)
+            continue
+        done += PropertyImage.objects.filter(pk__in=[pk for pk, _ in images[name]], image=name).update(**fields)
+        for property_id in {property_id for _, property_id in images[name]}:
+            catalog_cache.invalidate_media(property_id)
+    return done, failed
+
+
+def defer(image):
+    """Collect ``image`` for the enclosing :func:`deferred` block; False outside one."""
+    pending = getattr(_state, "pending", None)
+    if pending is None:
+        return False
+    pending.setdefault(image.image.name, []).append((image.pk, image.property_id))
+    return True
+
+
+@contextmanager
+def deferred(workers=None):
+    """Skip per-save rendering on this thread while the block runs, then
+    render everything saved in it through the process pool. Bulk import and
+    seed commands wrap themselves in this."""
+    if getattr(_state, "pending", None) is not None:
+        yield
+        return
+    _state.pending = {}
+    try:
+        yield
+        pending = _state.pending
+    finally:
+        _state.pending = None
+    done, failed = render_images(pending, workers or os.cpu_count())
+    if pending:
+        logger.info("Deferred thumbnails: %s done, %s failed", done, failed)
+
+
+def _refresh_queued(pk):
+    from . import cache as catalog_cache
+    from .models import PropertyImage
+
+    close_old_connections()
+    try:
+        image = PropertyImage.objects.filter(pk=pk).first()
+        if image is not None and image.image and image.image.name != image.thumb_source:
+            refresh(image)
+            catalog_cache.invalidate_media(image.property_id)
+    except Exception:
+        logger.exception("Thumbnail generation failed for image %s", pk)
+    finally:
+        close_old_connections()
+
+
+def enqueue(pk):
+    """Render thumbnails of image ``pk`` off the request thread. Anything lost
+    with the process is picked up by ``generate_thumbnails``."""
+    global _queue
+    if not getattr(settings, "THUMBNAIL_ASYNC", True):
+        _refresh_queued(pk)
+        return
+    with _queue_lock:
+        if _queue is None:
+            _queue = ThreadPoolExecutor(
+                max_workers=getattr(settings, "THUMBNAIL_QUEUE_WORKERS", 2), thread_name_prefix="thumbnails",
+            )
+    _queue.submit(_refresh_queued, pk)
@@ -1,46 +1,63 @@
+import logging
 from datetime import timedelta
-import re
 
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Avg, Count, Prefetch, Q
+from django.contrib import messages
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import F, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils import translation
+from django.utils.dateparse import parse_date
 from django.views.generic import TemplateView, DetailView
 
 from django.contrib.auth import get_user_model
 
 from rest_framework import viewsets, permissions, status, serializers
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters as drf_filters
 
-from .models import Property
-from .serializers import PropertySerializer
+from .models import Property, PropertyImage
+from . import cache as catalog_cache
+from .serializers import PropertyListSerializer, PropertySerializer
 from .permissions import IsOwnerOrReadOnly
-from .filters import PropertyFilter
+from .filters import PropertyFilter, PropertySearchFilter
+from .listing import listing_annotations
+from .search import apply_search
+from src.bookings import availability
+from src.shared.cache import get_versions
+from src.shared.mail import queue_email, render_email
+from src.shared.conditional import ConditionalGetMixin, latest, make_etag, not_modified, set_validators
+from src.shared.counting import CountingPaginator, stripped
+from src.shared.pagination import KeysetPagination
+from src.shared import schema
 
 try:
-    from src.analytics.models import ViewEvent
+    from src.analytics.ingest import view_events
     HAS_ANALYTICS = True
 except Exception:
-    ViewEvent = None
+    view_events = None
     HAS_ANALYTICS = False
 
+logger = logging.getLogger(__name__)
 
-def _field_exists(model, name):
-    return any(f.name == name for f in model._meta.get_fields())
+CALENDAR_DEFAULT_DAYS = 90
+CALENDAR_MAX_BATCH = 100
+
+
+def _parse_day(value):
+    try:
+        return parse_date((value or "").strip())
+    except ValueError:
+        return None
 
 
 def _detect_type_field():
-    for n in ("property_type", "type", "kind", "category"):
-        if _field_exists(Property, n):
-            return n
-    return None
+    return schema.first_field(Property, "property_type", "type", "kind", "category")
 
 
 def _ensure_session_key(request):
@@ -49,71 +66,34 @@ def _ensure_session_key(request):
     return request.session.session_key
 
 
-def _mask_email_like(s):
-    if not s:
-        return ""
-    if "@" in s:
-        local = s.split("@", 1)[0]
-        if len(local) <= 2:
-            return (local[:1] + "*" * max(len(local) - 1, 0)) or "User"
-        return f"{local[0]}***{local[-1]}"
-    return s
-
-
-_email_re = re.compile(r"[\w\.\+\-]+@[\w\.-]+\.\w+", re.IGNORECASE)
-
-
-def _sanitize_text(s):
-    if not s:
-        return s
-    return _email_re.sub(lambda m: _mask_email_like(m.group(0)), s)
-
-
-def _display_name_safe(u):
-    if not u:
-        return "User"
-    try:
-        dn = u.get_full_name()
-        if dn:
-            return _mask_email_like(dn)
-    except Exception:
-        pass
-    first = (getattr(u, "first_name", "") or "").strip()
-    last = (getattr(u, "last_name", "") or "").strip()
-    if first or last:
-        return _mask_email_like((first + " " + last).strip())
-    username = (getattr(u, "username", "") or "").strip()
-    if username:
-        return _mask_email_like(username)
-    email = (getattr(u, "email", "") or "").strip()
-    if email:
-        return _mask_email_like(email)
-    return "User"
-
-
-def user_has_booking_for_property(user, prop):
+def active_booking_for_property(user, prop):
+    """The user's latest booking of ``prop`` that is not cancelled or completed, or None."""
     if not getattr(user, "is_authenticated", False):
-        return False
+        return None
     try:
         from src.bookings.models import Booking
     except Exception:
-        return False
-    field_names = {f.name for f in Booking._meta.get_fields()}
+        return None
+    field_names = schema.field_names(Booking)
     qs = Booking.objects.all()
     if "property" in field_names:
         qs = qs.filter(property=prop)
     elif "property_id" in field_names:
         qs = qs.filter(property_id=prop.pk)
-    user_field = None
-    for f in ("user", "author", "client", "customer", "tenant", "renter", "guest", "booked_by", "created_by"):
-        if f in field_names:
-            user_field = f
-            break
+    user_field = schema.first_field(
+        Booking, "user", "author", "client", "customer", "tenant", "renter", "guest", "booked_by", "created_by"
+    )
     if user_field:
         qs = qs.filter(**{user_field: user})
     if "status" in field_names:
         qs = qs.exclude(status__in=["CANCELLED", "COMPLETED", "CANCELED"])
-    return qs.exists()
+    if "created_at" in field_names:
+        qs = qs.order_by("-created_at")
+    return qs.first()
+
+
+def user_has_booking_for_property(user, prop):
+    return active_booking_for_property(user, prop) is not None
 
 
 def _get_admin_contact():
@@ -141,57 +121,24 @@ class PublicCatalogView(TemplateView):
         sort = (self.request.GET.get("sort") or "").strip()
         postal = (self.request.GET.get("postal") or "").strip()
         address = (self.request.GET.get("address") or "").strip()
+        check_in = _parse_day(self.request.GET.get("check_in"))
+        check_out = _parse_day(self.request.GET.get("check_out"))
+        if not check_in or not check_out or check_out <= check_in:
+            check_in = check_out = None
         type_field = _detect_type_field()
+        params = {
+            "q": q, "city": city, "ptype": ptype, "sort": sort,
+            "postal": postal, "address": address, "page": str(self.request.GET.get("page") or 1),
+            "check_in": check_in.isoformat() if check_in else "",
+            "check_out": check_out.isoformat() if check_out else "",
+        }
 
-        qs = Property.objects.all().annotate(
-            rating_avg=Avg("reviews__rating"),
-            reviews_total=Count("reviews", distinct=True),
-        ).select_related("owner").prefetch_related(Prefetch("images"))
-
-        if HAS_ANALYTICS:
-            week_ago = timezone.now() - timedelta(days=7)
-            qs = qs.annotate(
-                views_total=Count("view_events", distinct=True),
-                views_7d=Count("view_events", filter=Q(view_events__created_at__gte=week_ago), distinct=True),
-            )
-
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q)
-                | Q(description__icontains=q)
-                | Q(city__icontains=q)
-                | Q(district__icontains=q)
-                | Q(address_line__icontains=q)
-                | Q(postal_code__icontains=q)
+        page_obj = catalog_cache.cached_page(params, lambda: self._build_page(params, type_field))
+        cities = catalog_cache.cached_cities(
+            lambda: list(
+                Property.objects.exclude(city__isnull=True, city__exact="")
+                .values_list("city", flat=True).distinct().order_by("city")
             )
-        if address:
-            qs = qs.filter(address_line__icontains=address)
-        if postal:
-            qs = qs.filter(postal_code__iexact=postal)
-        if city:
-            qs = qs.filter(city__iexact=city)
-        if ptype and type_field:
-            qs = qs.filter(**{f"{type_field}__iexact": ptype})
-
-        if sort == "views7" and HAS_ANALYTICS:
-            qs = qs.order_by("-views_7d", "-id")
-        elif sort == "views" and HAS_ANALYTICS:
-            qs = qs.order_by("-views_total", "-id")
-        else:
-            qs = qs.order_by("-reviews_total", "-rating_avg", "-id")
-
-        paginator = Paginator(qs, 12)
-        page = self.request.GET.get("page") or 1
-        try:
-            page_obj = paginator.page(page)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
-
-        cities = list(
-            Property.objects.exclude(city__isnull=True, city__exact="")
-            .values_list("city", flat=True).distinct().order_by("city")
         )
 
         ptypes = []
@@ -211,11 +158,47 @@ class PublicCatalogView(TemplateView):
             "properties": list(page_obj.object_list),
             "q": q, "city": city, "ptype": ptype, "sort": sort,
             "postal": postal, "address": address,
+            "check_in": params["check_in"], "check_out": params["check_out"],
             "cities": cities, "ptypes": ptypes, "type_field": type_field,
-            "admin_contact": _get_admin_contact(),
+            "admin_contact": catalog_cache.cached_admin_contact(_get_admin_contact),
         })
         return ctx
 
+    def _build_page(self, params, type_field):
+        q, city, ptype, sort = params["q"], params["city"], params["ptype"], params["sort"]
+        postal, address = params["postal"], params["address"]
+
+        qs = Property.objects.all().annotate(**listing_annotations()).select_related("owner", "cover_image")
+
+        if q:
+            qs = apply_search(qs, q, order=not sort)
+        if address:
+            qs = qs.filter(address_line__icontains=address)
+        if postal:
+            qs = qs.filter(postal_code__iexact=postal)
+        if city:
+            qs = qs.filter(city__iexact=city)
+        if ptype and type_field:
+            qs = qs.filter(**{f"{type_field}__iexact": ptype})
+        if params["check_in"]:
+            qs = availability.available(qs, _parse_day(params["check_in"]), _parse_day(params["check_out"]))
+
+        if sort == "views7" and HAS_ANALYTICS:
+            qs = qs.order_by("-views_7d", "-id")
+        elif sort == "views" and HAS_ANALYTICS:
+            qs = qs.order_by("-views_total", "-id")
+        elif not q:
+            qs = qs.order_by("-reviews_total", "-rating_avg", "-id")
+
+        scopes = catalog_cache.list_scopes(city, sort, stay=bool(params["check_in"]))
+        paginator = CountingPaginator(qs, 12, count_scopes=scopes)
+        try:
+            return paginator.page(params["page"])
+        except PageNotAnInteger:
+            return paginator.page(1)
+        except EmptyPage:
+            return paginator.page(paginator.num_pages)
+
 
 class PublicPropertyDetailView(DetailView):
     model = Property
@@ -225,83 +208,150 @@ class PublicPropertyDetailView(DetailView):
     def get_queryset(self):
         return (
             Property.objects.all()
-            .annotate(rating_avg=Avg("reviews__rating"), reviews_total=Count("reviews", distinct=True))
-            .select_related("owner")
-            .prefetch_related(Prefetch("images"), Prefetch("reviews"))
+            .annotate(**listing_annotations())
+            .select_related("owner", "cover_image")
+            .prefetch_related(Prefetch("images"))
+        )
+
+    def get(self, request, *args, **kwargs):
+        pk = kwargs[self.pk_url_kwarg]
+        last_modified = _last_change(Property.objects.filter(pk=pk))
+        if last_modified is None:
+            return super().get(request, *args, **kwargs)
+        # a revalidated page is still a view
+        self._record_view(pk)
+        versions = get_versions([catalog_cache.property_scope(pk), availability._scope(pk)])
+        etag = make_etag(
+            request.get_full_path(), translation.get_language(), request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME), last_modified, versions,
+        )
+        if not len(messages.get_messages(request)):
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+        return set_validators(super().get(request, *args, **kwargs), etag, last_modified, private=True)
+
+    def _record_view(self, pk):
+        if not HAS_ANALYTICS:
+            return
+        try:
+            session_key = _ensure_session_key(self.request)
+            view_events.record(
+                property_id=int(pk),
+                user_id=self.request.user.pk if getattr(self.request.user, "is_authenticated", False) else None,
+                session_key=session_key or "",
+                ip=self.request.META.get("REMOTE_ADDR") or None,
+                user_agent=self.request.META.get("HTTP_USER_AGENT", "")[:500],
+                referer=self.request.META.get("HTTP_REFERER", "")[:1000],
+            )
+        except Exception:
+            logger.exception("Could not record view of property %s", pk)
+
+    def _reviews_page(self):
+        from src.reviews.models import Review
+
+        size = getattr(settings, "PROPERTY_REVIEWS_PAGE_SIZE", 10)
+        try:
+            page = max(1, int(self.request.GET.get("reviews_page") or 1))
+        except ValueError:
+            page = 1
+        start = (page - 1) * size
+        rows = list(
+            Review.objects.filter(property_id=self.object.pk)
+            .order_by("-created_at", "-id")
+            .values("id", "rating", "text_display", "author_display", "created_at")[start:start + size + 1]
         )
+        reviews = [
+            {
+                "id": r["id"],
+                "rating": r["rating"],
+                "text": r["text_display"],
+                "created_at": r["created_at"],
+                "display_user": r["author_display"] or "User",
+            }
+            for r in rows[:size]
+        ]
+        return {
+            "reviews": reviews,
+            "reviews_page": page,
+            "reviews_has_next": len(rows) > size,
+            "reviews_has_previous": page > 1,
+        }
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        if HAS_ANALYTICS and ViewEvent:
-            try:
-                session_key = _ensure_session_key(self.request)
-                ip = self.request.META.get("REMOTE_ADDR", "")[:64]
-                ua = self.request.META.get("HTTP_USER_AGENT", "")[:500]
-                ref = self.request.META.get("HTTP_REFERER", "")[:1000]
-                ViewEvent.objects.create(
-                    property=self.object,
-                    user=self.request.user if getattr(self.request.user, "is_authenticated", False) else None,
-                    session_key=session_key,
-                    ip=ip,
-                    user_agent=ua,
-                    referer=ref,
-                )
-                week_ago = timezone.now() - timedelta(days=7)
-                ctx["views_count"] = ViewEvent.objects.filter(property=self.object, created_at__gte=week_ago).count()
-                ctx["views_total"] = ViewEvent.objects.filter(property=self.object).count()
-            except Exception:
-                ctx["views_count"] = 0
-                ctx["views_total"] = 0
-        else:
-            ctx["views_count"] = 0
-            ctx["views_total"] = 0
-
-        raw_reviews = list(getattr(self.object, "reviews").all().select_related("author"))
-        safe_reviews = []
-        for r in raw_reviews:
-            author = getattr(r, "author", None)
-            safe_reviews.append(
-                {
-                    "id": r.id,
-                    "rating": r.rating,
-                    "text": _sanitize_text(getattr(r, "text", "")),
-                    "created_at": r.created_at,
-                    "display_user": _display_name_safe(author),
-                }
-            )
-        ctx["reviews"] = safe_reviews
-        ctx["user_can_review"] = user_has_booking_for_property(self.request.user, self.object)
-
-        user_booking = None
-        if getattr(self.request.user, "is_authenticated", False):
-            try:
-                from src.bookings.models import Booking
-                user_booking = (
-                    Booking.objects.filter(property=self.object)
-                    .filter(Q(tenant=self.request.user) | Q(user=self.request.user) | Q(client=self.request.user))
-                    .exclude(status__in=["CANCELLED", "COMPLETED", "CANCELED"])
-                    .order_by("-created_at")
-                    .first()
-                )
-            except Exception:
-                user_booking = None
+        ctx["views_count"] = self.object.views_7d or 0
+        ctx["views_total"] = self.object.views_total or 0
+
+        ctx.update(self._reviews_page())
+        # one lookup serves both the review form and the "active booking" box
+        user_booking = active_booking_for_property(self.request.user, self.object)
+        ctx["user_can_review"] = user_booking is not None
         ctx["user_booking"] = user_booking
-        ctx["admin_contact"] = _get_admin_contact()
+        ctx["admin_contact"] = catalog_cache.cached_admin_contact(_get_admin_contact)
         return ctx
 
 
-class PropertyViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Property.objects.all()
-        .annotate(rating_avg=Avg("reviews__rating"), reviews_total=Count("reviews", distinct=True))
-        .order_by("-id")
-    )
+def _last_change(queryset):
+    """Latest change to the property in ``queryset``, its images or its reviews,
+    read from the timestamps alone."""
+    from src.reviews.models import Review
+
+    row = stripped(queryset).annotate(
+        image_last=Subquery(
+            PropertyImage.objects.filter(property=OuterRef("pk")).order_by("-uploaded_at").values("uploaded_at")[:1]
+        ),
+        review_last=Subquery(
+            Review.objects.filter(property=OuterRef("pk")).order_by("-updated_at").values("updated_at")[:1]
+        ),
+    ).values_list("updated_at", "image_last", "review_last").first()
+    return latest(*row) if row else None
+
+
+class PropertyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    read_annotations = {"rating_avg": F("listing__rating_avg"), "reviews_total": F("listing__reviews_total")}
+    queryset = Property.objects.all().annotate(**read_annotations).select_related("cover_image").order_by("-id")
     serializer_class = PropertySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    filter_backends = (DjangoFilterBackend, drf_filters.SearchFilter, drf_filters.OrderingFilter)
+    filter_backends = (DjangoFilterBackend, PropertySearchFilter, drf_filters.OrderingFilter)
     filterset_class = PropertyFilter
-    search_fields = ["title", "description", "city", "district", "address_line", "postal_code"]
     ordering_fields = ["price", "created_at", "rating_avg", "reviews_total", "id"]
+    pagination_class = KeysetPagination
+    count_scopes = ("catalog:all", "catalog:availability")
+    etag_scopes = ("catalog:all", "catalog:views", "catalog:media", "catalog:availability")
+
+    def get_object_watermark(self, queryset):
+        return _last_change(queryset), None
+
+    def get_etag_scopes(self, pk=None):
+        if pk is None:
+            return self.etag_scopes
+        return (catalog_cache.property_scope(pk),)
+
+    def get_serializer_class(self):
+        if self.action == "list" and self.request.query_params.get("compact") in ("1", "true", "yes"):
+            return PropertyListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        if self.action not in ("list", "retrieve"):
+            return super().get_queryset()
+        # load only the columns, joins and annotations the response and the ordering use
+        serializer = self.get_serializer()
+        requirements = getattr(serializer, "query_requirements", {})
+        needed = {"id"}
+        for name, field in serializer.fields.items():
+            needed.update(requirements.get(name, (field.source,)))
+        ordering = drf_filters.OrderingFilter().get_ordering(self.request, self.queryset, self) or ()
+        needed.update(term.lstrip("-") for term in ordering)
+
+        columns = {f.name for f in Property._meta.concrete_fields}
+        qs = Property.objects.annotate(
+            **{name: expr for name, expr in self.read_annotations.items() if name in needed}
+        )
+        if "cover_image" in needed:
+            qs = qs.select_related("cover_image")
+        return qs.only(*sorted(needed & columns)).order_by("-id")
 
     def perform_create(self, serializer):
         try:
@@ -309,6 +359,46 @@ class PropertyViewSet(viewsets.ModelViewSet):
         except TypeError:
             serializer.save()
 
+    def _calendar_params(self, request):
+        params = request.query_params
+        start = _parse_day(params.get("from")) if params.get("from") else timezone.localdate()
+        if not start:
+            raise serializers.ValidationError({"from": "Expected YYYY-MM-DD."})
+        end = _parse_day(params.get("to")) if params.get("to") else start + timedelta(days=CALENDAR_DEFAULT_DAYS)
+        if not end or end <= start:
+            raise serializers.ValidationError({"to": "Expected YYYY-MM-DD after 'from'."})
+        if (end - start).days > availability.CALENDAR_MAX_DAYS:
+            raise serializers.ValidationError({"to": "Range is limited to 18 months."})
+        encoding = params.get("encoding") or "bitset"
+        if encoding not in availability.CALENDAR_ENCODINGS:
+            raise serializers.ValidationError({"encoding": f"One of: {', '.join(availability.CALENDAR_ENCODINGS)}."})
+        return start, end, encoding
+
+    @action(detail=True, methods=["get"], url_path="calendar")
+    def calendar(self, request, pk=None):
+        start, end, encoding = self._calendar_params(request)
+        prop = get_object_or_404(Property.objects.only("pk"), pk=pk)
+        data = availability.encode_calendar(availability.occupancy(prop.pk), start, end, encoding)
+        return Response({"property": prop.pk, **data})
+
+    @action(detail=False, methods=["get"], url_path="calendar")
+    def calendar_batch(self, request):
+        start, end, encoding = self._calendar_params(request)
+        try:
+            ids = [int(x) for x in (request.query_params.get("ids") or "").split(",") if x.strip()]
+        except ValueError:
+            raise serializers.ValidationError({"ids": "Comma-separated property ids."})
+        if not ids or len(ids) > CALENDAR_MAX_BATCH:
+            raise serializers.ValidationError({"ids": f"Between 1 and {CALENDAR_MAX_BATCH} property ids."})
+        existing = set(Property.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        ids = [pid for pid in dict.fromkeys(ids) if pid in existing]
+        out = {"from": start.isoformat(), "to": end.isoformat(), "nights": (end - start).days, "encoding": encoding}
+        out["properties"] = {
+            str(pid): availability.encode_calendar(occ, start, end, encoding)["data"]
+            for pid, occ in availability.occupancies(ids).items()
+        }
+        return Response(out)
+
 
 class ContactPropertySerializer(serializers.Serializer):
     name = serializers.CharField(max_length=150)
@@ -337,10 +427,7 @@ class ContactPropertyView(APIView):
             "message": data["message"],
         }
         subject = f"Inquiry: {prop.title} (#{prop.pk})"
-        html = render_to_string("emails/inquiry.html", ctx)
+        html = render_email("inquiry.html", ctx)
         text = f"Property: {prop.title} (#{prop.pk})\nName: {ctx['name']}\nEmail: {ctx['email']}\nPhone: {ctx['phone']}\n\nMessage:\n{ctx['message']}"
-        msg = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [to_email])
-        msg.attach_alternative(html, "text/html")
-        msg.reply_to = [ctx["email"]]
-        msg.send()
+        queue_email(subject, text, [to_email], html=html, reply_to=[ctx["email"]])
         return Response({"detail": "Message sent."})
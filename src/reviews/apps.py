@@ -2,4 +2,7 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.reviews"
-    label = "reviews"
\ No newline at end of file
+    label = "reviews"
+
+    def ready(self):
+        from . import signals  # noqa: F401
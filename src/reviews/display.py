@@ -0,0 +1,43 @@
+import re
+
+
+def mask_email_like(s):
+    if not s:
+        return ""
+    if "@" in s:
+        local = s.split("@", 1)[0]
+        if len(local) <= 2:
+            return (local[:1] + "*" * max(len(local) - 1, 0)) or "User"
+        return f"{local[0]}***{local[-1]}"
+    return s
+
+
+_email_re = re.compile(r"[\w\.\+\-]+@[\w\.-]+\.\w+", re.IGNORECASE)
+
+
+def sanitize_text(s):
+    if not s:
+        return s
+    return _email_re.sub(lambda m: mask_email_like(m.group(0)), s)
+
+
+def display_name(u):
+    if not u:
+        return "User"
+    try:
+        dn = u.get_full_name()
+        if dn:
+            return mask_email_like(dn)
+    except Exception:
+        pass
+    first = (getattr(u, "first_name", "") or "").strip()
+    last = (getattr(u, "last_name", "") or "").strip()
+    if first or last:
+        return mask_email_like((first + " " + last).strip())
+    username = (getattr(u, "username", "") or "").strip()
+    if username:
+        return mask_email_like(username)
+    email = (getattr(u, "email", "") or "").strip()
+    if email:
+        return mask_email_like(email)
+    return "User"
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+from src.reviews.display import display_name, sanitize_text
+
+
+def backfill_display(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    batch = []
+    for review in Review.objects.select_related('author').iterator(chunk_size=500):
+        review.author_display = display_name(review.author)[:150]
+        review.text_display = sanitize_text(review.text) or ''
+        batch.append(review)
+        if len(batch) >= 500:
+            Review.objects.bulk_update(batch, ['author_display', 'text_display'])
+            batch = []
+    Review.objects.bulk_update(batch, ['author_display', 'text_display'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0012_media_blobs'),
+        ('reviews', '0004_review_unique_review_per_user_per_property'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='author_display',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='text_display',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['property', '-created_at'], name='reviews_rev_propert_cab8b3_idx'),
+        ),
+        migrations.RunPython(backfill_display, migrations.RunPython.noop),
+    ]
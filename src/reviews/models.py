@@ -6,6 +6,7 @@ from django.utils.translation import gettext_lazy as _
 from django.apps import apps
 from src.properties.models import Property
 from src.shared.enums import BookingStatus
+from .display import display_name, sanitize_text
 
 
 class Review(models.Model):
@@ -15,9 +16,15 @@ class Review(models.Model):
     text = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # what the public pages show, masked once here instead of on every render
+    author_display = models.CharField(max_length=150, blank=True, default="")
+    text_display = models.TextField(blank=True, default="")
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["property", "-created_at"]),
+        ]
         constraints = [
             models.UniqueConstraint(fields=["property", "author"], name="unique_review_per_user_per_property"),
         ]
@@ -47,4 +54,9 @@ class Review(models.Model):
 
     def save(self, *args, **kwargs):
         self.full_clean()
+        self.author_display = display_name(self.author)[:150]
+        self.text_display = sanitize_text(self.text) or ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "author_display", "text_display"}
         return super().save(*args, **kwargs)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from src.properties import cache as catalog_cache
+
+from .display import display_name
+from .models import Review
+
+NAME_FIELDS = {"first_name", "last_name", "username", "email"}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_author_display(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    name = display_name(instance)[:150]
+    stale = Review.objects.filter(author=instance).exclude(author_display=name)
+    property_ids = set(stale.values_list("property_id", flat=True))
+    if property_ids:
+        stale.update(author_display=name)
+        for property_id in property_ids:
+            catalog_cache.invalidate_property(property_id)
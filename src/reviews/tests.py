@@ -0,0 +1,66 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from src.bookings.models import Booking
+from src.properties.models import Property
+from src.shared.enums import BookingStatus
+from .display import mask_email_like, sanitize_text
+from .models import Review
+
+
+class MaskingTests(SimpleTestCase):
+    def test_mask_email_like(self):
+        self.assertEqual(mask_email_like("anna.schmidt@example.com"), "a***t")
+        self.assertEqual(mask_email_like("ab@example.com"), "a*")
+        self.assertEqual(mask_email_like("Anna Schmidt"), "Anna Schmidt")
+
+    def test_sanitize_text(self):
+        self.assertEqual(sanitize_text("Schreib an max.mustermann@web.de!"), "Schreib an m***n!")
+
+
+class ReviewDisplayTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        owner = User.objects.create_user(email="owner@example.com", username="owner", password="x")
+        cls.author = User.objects.create_user(
+            email="anna.schmidt@example.com", username="anna.schmidt@example.com", password="x",
+        )
+        cls.prop = Property.objects.create(
+            owner=owner, title="Wohnung", description="", city="Berlin", price=100, rooms=2,
+            property_type="APARTMENT",
+        )
+        today = timezone.localdate()
+        Booking.objects.bulk_create([Booking(
+            property=cls.prop, tenant=cls.author, status=BookingStatus.COMPLETED,
+            start_date=today - timedelta(days=10), end_date=today - timedelta(days=5),
+        )])
+
+    def setUp(self):
+        cache.clear()
+        self.review = Review.objects.create(
+            property=self.prop, author=self.author, rating=5, text="Toll! Mail: anna.schmidt@example.com",
+        )
+
+    def test_display_fields_are_masked_on_save(self):
+        self.assertEqual(self.review.author_display, "a***t")
+        self.assertEqual(self.review.text_display, "Toll! Mail: a***t")
+
+    def test_renaming_the_author_refreshes_reviews(self):
+        self.author.first_name, self.author.last_name = "Anna", "Schmidt"
+        self.author.save()
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.author_display, "Anna Schmidt")
+
+    @mock.patch("src.properties.views.view_events")
+    def test_detail_page_never_shows_the_address(self, view_events):
+        response = self.client.get(f"/properties/{self.prop.pk}/")
+        view_events.record.assert_called_once()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "anna.schmidt@example.com")
+        self.assertContains(response, "Toll! Mail: a***t")
@@ -6,6 +6,8 @@ from django.urls import reverse
 from django.http import JsonResponse
 from django.utils.translation import gettext as _
 from rest_framework import viewsets, permissions
+from src.shared.conditional import ConditionalGetMixin
+from src.shared.pagination import KeysetPagination
 from .models import Review
 from .serializers import ReviewSerializer, ReviewCreateSerializer
 
@@ -35,9 +37,15 @@ def submit_review(request, pk: int):
     return redirect(back_url)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Review.objects.select_related("author", "property").all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    filterset_fields = ["property"]
+    ordering_fields = ["created_at", "rating", "id"]
+    ordering = ["-created_at"]
+    # every review save or delete bumps it, see properties.signals.review_changed
+    etag_scopes = ("catalog:all",)
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 class SharedConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "src.shared"
-    label = "shared"
\ No newline at end of file
+    label = "shared"
+
+    def ready(self):
+        from .schema import registry
+
+        registry.build()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_TTL = 30
+LOCK_WAIT = 5.0
+POLL_INTERVAL = 0.05
+LOCK_STRIPES = 64
+
+# keys carry query hashes and versions, so a lock per key would grow forever
+_local_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def _local_lock(key):
+    return _local_locks[hash(key) % LOCK_STRIPES]
+
+
+def _stale_ttl(ttl):
+    return ttl + getattr(settings, "CACHE_STALE_GRACE", 60)
+
+
+def _seed():
+    # A version key that was evicted or never existed must not start over at
+    # a number an earlier generation already used, or keys cached under that
+    # generation would be served again. Wall-clock nanoseconds never repeat.
+    return time.time_ns()
+
+
+def _usable(value, is_valid):
+    return value is not None and (is_valid is None or is_valid(value))
+
+
+def get_version(scope):
+    key = f"v:{scope}"
+    version = cache.get(key)
+    if version is None:
+        seed = _seed()
+        cache.add(key, seed, None)
+        version = cache.get(key) or seed
+    return version
+
+
+def get_versions(scopes):
+    keys = {f"v:{s}": s for s in scopes}
+    found = cache.get_many(list(keys))
+    out = {}
+    for key, scope in keys.items():
+        out[scope] = found[key] if key in found else get_version(scope)
+    return out
+
+
+def bump_version(scope):
+    key = f"v:{scope}"
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _seed()
+        cache.set(key, version, None)
+        return version
+
+
+def single_flight(key, compute, ttl, is_valid=None, stale_key=None):
+    """Return the cached value for ``key`` or compute it exactly once.
+
+    Only one caller (the one whose ``cache.add`` of the lock key wins)
+    recomputes an expired entry; the others wait for it to appear or are
+    served the last good value stored under ``stale_key``, which outlives
+    ``key`` by CACHE_STALE_GRACE seconds. ``is_valid`` applies to both.
+    The local lock only covers the check-and-claim, so threads waiting on
+    one key never hold up other keys that share its stripe.
+    """
+    value = cache.get(key)
+    if _usable(value, is_valid):
+        return value
+    lock_key = f"{key}:lock"
+    with _local_lock(key):
+        value = cache.get(key)
+        if _usable(value, is_valid):
+            return value
+        owner = cache.add(lock_key, 1, LOCK_TTL)
+    if owner:
+        try:
+            value = compute()
+            cache.set(key, value, ttl)
+            if stale_key:
+                cache.set(stale_key, value, _stale_ttl(ttl))
+        finally:
+            cache.delete(lock_key)
+        return value
+    if stale_key:
+        stale = cache.get(stale_key)
+        if _usable(stale, is_valid):
+            return stale
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key)
+        if _usable(value, is_valid):
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return compute()
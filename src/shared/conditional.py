@@ -0,0 +1,111 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .cache import get_versions
+from .counting import memo_key, stripped
+
+
+def make_etag(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return quote_etag(hashlib.md5(payload.encode("utf-8")).hexdigest())
+
+
+def latest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 (or 412) response when the request's validators still match, else None."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None and response.status_code == 304:
+        response["ETag"] = etag
+    return response
+
+
+def set_validators(response, etag, last_modified=None, private=False):
+    if response.status_code != 200:
+        return response
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # keep clients revalidating instead of reusing the body on heuristics
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified for ``list`` and ``retrieve`` computed from an
+    aggregate over the filtered rows (see ``get_watermark``) and the versions
+    of ``etag_scopes``, so an unchanged resource is answered with a 304
+    before anything is serialized. The aggregate is memoized per query and
+    scope versions for COUNT_CACHE_TTL seconds, like paginator counts."""
+
+    last_modified_field = "updated_at"
+    etag_scopes = ()
+
+    def get_watermark(self, queryset):
+        """(last modified, anything else that changes with the rows)."""
+        queryset = stripped(queryset)
+        scopes = self.get_etag_scopes()
+        key = memo_key("watermark", queryset, scopes) if scopes else None
+        watermark = cache.get(key) if key else None
+        if watermark is None:
+            row = queryset.aggregate(last=Max(self.last_modified_field), n=Count("pk"))
+            watermark = (row["last"], row["n"])
+            if key:
+                cache.set(key, watermark, getattr(settings, "COUNT_CACHE_TTL", 30))
+        return watermark
+
+    def get_object_watermark(self, queryset):
+        return self.get_watermark(queryset)
+
+    def get_etag_scopes(self, pk=None):
+        return self.etag_scopes
+
+    def _validators(self, request, watermark, scopes):
+        last_modified, extra = watermark
+        versions = get_versions(scopes) if scopes else {}
+        etag = make_etag(
+            request.get_full_path(), request.accepted_renderer.format, translation.get_language(),
+            last_modified, extra, versions,
+        )
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self._validators(request, self.get_watermark(queryset), self.get_etag_scopes())
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        rows = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: pk})
+        watermark = self.get_object_watermark(rows)
+        if watermark[0] is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = self._validators(request, watermark, self.get_etag_scopes(pk))
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
@@ -0,0 +1,188 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models.expressions import Col, Ref
+from django.db.models.sql.datastructures import Join
+from django.utils.functional import cached_property
+
+from .cache import get_versions
+
+logger = logging.getLogger(__name__)
+
+EXACT = "exact"
+ESTIMATE = "estimate"
+
+
+def _ttl():
+    return getattr(settings, "COUNT_CACHE_TTL", 30)
+
+
+def _threshold():
+    return getattr(settings, "COUNT_ESTIMATE_THRESHOLD", 10000)
+
+
+def _flatten(node):
+    if hasattr(node, "children"):
+        for child in node.children:
+            yield from _flatten(child)
+    elif hasattr(node, "flatten"):
+        yield from node.flatten()
+
+
+def _columns(expression):
+    return [e for e in _flatten(expression) if isinstance(e, Col)]
+
+
+def stripped(queryset):
+    """The rows of ``queryset`` without what a COUNT does not need: ordering,
+    select_related, and annotations nothing filters on together with the
+    joins they pulled in."""
+    qs = queryset.order_by()
+    query = qs.query
+    query.select_related = False
+    if isinstance(query.group_by, tuple) or query.distinct or query.combinator:
+        return qs
+    filtered = {col.alias for col in _columns(query.where)}
+    referenced = {e.refs for e in _flatten(query.where) if isinstance(e, Ref)}
+    removed = set()
+    for name, annotation in list(query.annotations.items()):
+        columns = _columns(annotation)
+        if name in referenced or any(col.alias in filtered for col in columns):
+            continue
+        for col in columns:
+            alias = col.alias
+            while isinstance(query.alias_map.get(alias), Join):
+                query.unref_alias(alias)
+                alias = query.alias_map[alias].parent_alias
+        del query.annotations[name]
+        removed.add(name)
+    if query.annotation_select_mask is not None:
+        query.set_annotation_mask(set(query.annotation_select_mask) - removed)
+    if query.group_by is True and not any(
+        getattr(a, "contains_aggregate", False) for a in query.annotations.values()
+    ):
+        query.group_by = None
+    return qs
+
+
+def signature(queryset):
+    sql, params = queryset.query.sql_with_params()
+    return hashlib.md5(f"{queryset.db}|{sql}|{params!r}".encode("utf-8")).hexdigest()
+
+
+def table_rows(model, using="default"):
+    """Row count of the model's table from the database statistics, or None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "mysql":
+                cursor.execute(
+                    "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    [table],
+                )
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        logger.debug("No table statistics for %s", table, exc_info=True)
+        return None
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+def planned_rows(queryset):
+    """Row estimate of the query planner for ``queryset``, or None."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0]
+                return int(plan[0]["Plan"]["Plan Rows"])
+            if connection.vendor == "mysql":
+                cursor.execute("EXPLAIN " + sql, params)
+                columns = [c[0].lower() for c in cursor.description]
+                estimate = None
+                for row in cursor.fetchall():
+                    row = dict(zip(columns, row))
+                    if row.get("select_type") not in ("SIMPLE", "PRIMARY") or row.get("rows") is None:
+                        continue
+                    rows = float(row["rows"]) * float(row.get("filtered") or 100) / 100
+                    estimate = rows if estimate is None else estimate * rows
+                return int(estimate) if estimate is not None else None
+    except (DatabaseError, LookupError, TypeError, ValueError):
+        logger.debug("No plan estimate for %s", sql, exc_info=True)
+    return None
+
+
+def memo_key(prefix, queryset, scopes=()):
+    """Cache key for a value derived from ``queryset`` that changes with the
+    versions of ``scopes``."""
+    versions = get_versions(scopes) if scopes else {}
+    return f"{prefix}:" + signature(queryset) + "".join(f":{versions[s]}" for s in scopes)
+
+
+def estimate(queryset):
+    qs = stripped(queryset)
+    if not qs.query.where:
+        return table_rows(qs.model, qs.db)
+    return planned_rows(qs)
+
+
+def count(queryset, mode=EXACT, scopes=()):
+    """Return (count, is_estimate) for ``queryset``.
+
+    Exact counts run on the stripped queryset and are memoized for
+    COUNT_CACHE_TTL seconds per query signature and the versions of
+    ``scopes``. In ``estimate`` mode a planner or table-statistics estimate
+    above COUNT_ESTIMATE_THRESHOLD is returned instead.
+    """
+    qs = stripped(queryset)
+    if mode == ESTIMATE:
+        guess = estimate(qs)
+        if guess is not None and guess >= _threshold():
+            return guess, True
+    key = memo_key("count", qs, scopes)
+    value = cache.get(key)
+    if value is None:
+        value = qs.count()
+        cache.set(key, value, _ttl())
+    return value, False
+
+
+class CountingPaginator(Paginator):
+    """Paginator whose ``count`` is the exact, memoized :func:`count`.
+
+    ``count`` bounds the pages and is never an estimate. With
+    ``count_mode="estimate"`` a large result may instead be *shown* as
+    ``display_count``, flagged by ``count_is_estimate``.
+    """
+
+    def __init__(self, object_list, per_page, *args, count_mode=None, count_scopes=(), **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.count_mode = count_mode or getattr(settings, "PAGINATION_COUNT_MODE", EXACT)
+        self.count_scopes = tuple(count_scopes)
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, "query"):
+            return super().count
+        return count(self.object_list, EXACT, self.count_scopes)[0]
+
+    @cached_property
+    def display_count(self):
+        if self.count_mode == ESTIMATE and hasattr(self.object_list, "query"):
+            guess = estimate(self.object_list)
+            if guess is not None and guess >= _threshold():
+                self.count_is_estimate = True
+                return guess
+        return self.count
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+logger = logging.getLogger(__name__)
+
+DOWNLOADED = "downloaded"
+NOT_MODIFIED = "not_modified"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def download_dir(*parts):
+    return Path(_setting("DOWNLOAD_DIR", Path(settings.BASE_DIR) / "var" / "downloads"), *parts)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Download:
+    FIELDS = ("url", "path", "status", "sha256", "size", "content_type", "etag", "last_modified", "error")
+
+    def __init__(self, url, path=None, status=FAILED, **fields):
+        self.url = url
+        self.path = Path(path) if path else None
+        self.status = status
+        for name in self.FIELDS[3:]:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def restore(cls, row, status):
+        return cls(row["url"], row.get("path"), status, **{name: row.get(name) for name in cls.FIELDS[3:]})
+
+    @property
+    def ok(self):
+        return self.status != FAILED
+
+    def as_dict(self):
+        row = {name: getattr(self, name) for name in self.FIELDS if name != "error"}
+        row["path"] = str(self.path) if self.path else None
+        return row
+
+
+class HostLimiter:
+    """Spaces request starts to the same host at least ``interval`` seconds apart."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, url, seconds):
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._next[host] = max(self._next.get(host, 0.0), time.monotonic() + seconds)
+
+
+class Manifest:
+    """Finished downloads as JSON lines keyed by URL. Rows are appended as they
+    complete, so an interrupted run picks up where it stopped."""
+
+    def __init__(self, path):
+        self.path = Path(path) if path else None
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._fh = None
+        if self.path and self.path.exists():
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[row["url"]] = row
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def record(self, result):
+        if not result.ok:
+            return
+        row = result.as_dict()
+        with self._lock:
+            self.entries[result.url] = row
+            if self.path is None:
+                return
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+class Downloader:
+    """Bounded thread pool over keep-alive sessions with per-host pacing.
+
+    ``fetch(url, dest)`` streams the body to ``dest`` (a path, or a callable
+    taking the response Content-Type and returning one) through a ``.part``
+    file. Files already in the manifest are skipped, or revalidated with
+    If-None-Match / If-Modified-Since when ``revalidate`` is set; a body whose
+    hash equals the file on disk leaves the file untouched.
+    """
+
+    def __init__(self, workers=None, interval=None, timeout=30, retries=2, headers=None,
+                 verify=True, manifest=None, accept=None, revalidate=False, chunk_size=64 * 1024):
+        if requests is None:
+            raise RuntimeError("The 'requests' package is required for downloads (pip install requests)")
+        self.workers = max(1, workers or _setting("DOWNLOAD_WORKERS", 8))
+        self.limiter = HostLimiter(_setting("DOWNLOAD_HOST_INTERVAL", 0.2) if interval is None else interval)
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = dict(headers or {})
+        self.verify = verify
+        self.manifest = manifest if isinstance(manifest, Manifest) else Manifest(manifest)
+        self.accept = accept
+        self.revalidate = revalidate
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.manifest.close()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def request(self, url, headers=None, stream=False, **kwargs):
+        attempt = 0
+        while True:
+            self.limiter.wait(url)
+            try:
+                response = self.session.get(
+                    url, headers=headers, stream=stream, timeout=self.timeout, verify=self.verify, **kwargs
+                )
+            except requests.RequestException:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                response.close()
+                if retry_after.isdigit():
+                    self.limiter.defer(url, int(retry_after))
+            attempt += 1
+            time.sleep(min(30, 0.5 * 2 ** attempt))
+
+    def get_json(self, url, **kwargs):
+        response = self.request(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch(self, url, dest):
+        entry = self.manifest.get(url)
+        known = Path(entry["path"]) if entry and entry.get("path") else None
+        if known is not None and not known.exists():
+            entry = known = None
+        if known is None and not callable(dest) and Path(dest).exists():
+            known = Path(dest)
+        if known is not None and not (self.revalidate and entry):
+            if entry:
+                return Download.restore(entry, SKIPPED)
+            result = Download(url, known, SKIPPED, size=known.stat().st_size, sha256=file_sha256(known))
+            self.manifest.record(result)
+            return result
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        with self.request(url, headers=headers, stream=True) as response:
+            if response.status_code == 304 and known is not None:
+                return Download.restore(entry, NOT_MODIFIED)
+            if response.status_code != 200:
+                return Download(url, status=FAILED, error=f"HTTP {response.status_code}")
+            content_type = response.headers.get("Content-Type", "")
+            if self.accept and not content_type.lower().startswith(self.accept):
+                return Download(url, status=FAILED, error=f"Unexpected Content-Type: {content_type}")
+
+            path = known or Path(dest(content_type) if callable(dest) else dest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            part = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.part")
+            digest, size = hashlib.sha256(), 0
+            try:
+                with open(part, "wb") as fh:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        fh.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                result = Download(
+                    url, path, DOWNLOADED, sha256=digest.hexdigest(), size=size, content_type=content_type,
+                    etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"),
+                )
+                previous = (entry or {}).get("sha256") or (file_sha256(path) if path.exists() else None)
+                if previous == result.sha256 and path.exists():
+                    result.status = NOT_MODIFIED
+                else:
+                    os.replace(part, path)
+            finally:
+                if part.exists():
+                    part.unlink()
+        self.manifest.record(result)
+        return result
+
+    def _fetch_safe(self, url, dest):
+        try:
+            return self.fetch(url, dest)
+        except Exception as exc:
+            logger.debug("Download of %s failed", url, exc_info=True)
+            return Download(url, status=FAILED, error=f"{type(exc).__name__}: {exc}")
+
+    def fetch_many(self, jobs):
+        """Yield a Download per (url, dest) job as each completes, keeping at
+        most twice the worker count in flight."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for url, dest in jobs:
+                pending.add(pool.submit(self._fetch_safe, url, dest))
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
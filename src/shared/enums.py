@@ -28,3 +28,10 @@ class PropertyType(TextChoices):
     STUDIO = "STUDIO", "Studio"
     VILLA = "VILLA", "Villa"
     ROOM = "ROOM", "Room"
+
+
+class EmailStatus(TextChoices):
+    PENDING = "PENDING", "Pending"
+    SENDING = "SENDING", "Sending"
+    SENT = "SENT", "Sent"
+    FAILED = "FAILED", "Failed"
@@ -0,0 +1,195 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils import timezone, translation
+
+from .enums import EmailStatus
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def email_language(lang=None):
+    codes = [code for code, _ in settings.LANGUAGES]
+    lang = (lang or translation.get_language() or settings.LANGUAGE_CODE).split("-")[0].lower()
+    return lang if lang in codes else settings.LANGUAGE_CODE
+
+
+def _compiled(path):
+    if path not in _templates:
+        try:
+            template = get_template(path)
+        except TemplateDoesNotExist:
+            template = None
+        with _templates_lock:
+            _templates[path] = template
+    return _templates[path]
+
+
+def email_template(name, lang=None):
+    """Compiled ``emails/<lang>/<name>``, else ``emails/<name>``; None when
+    neither exists. Templates are cached by path, so one shared by every
+    language is compiled once."""
+    return _compiled(f"emails/{email_language(lang)}/{name}") or _compiled(f"emails/{name}")
+
+
+def render_batch(name, contexts, lang=None):
+    lang = email_language(lang)
+    template = email_template(name, lang)
+    if template is None:
+        return [None] * len(contexts)
+    with translation.override(lang):
+        return [template.render(ctx) for ctx in contexts]
+
+
+def render_email(name, context, lang=None):
+    return render_batch(name, [context], lang)[0]
+
+
+def precompile():
+    paths = set()
+    for directory in settings.TEMPLATES[0].get("DIRS", []):
+        root = Path(directory)
+        folder = root / "emails"
+        if folder.is_dir():
+            paths.update(p.relative_to(root).as_posix() for p in folder.rglob("*") if p.suffix in (".html", ".txt"))
+    for path in paths:
+        _compiled(path)
+    return len(paths)
+
+
+def queue_email(subject, text, to, html=None, reply_to=None, from_email=None):
+    """Store a message in the outbox; ``send_queued_emails`` delivers it."""
+    recipients = [e for e in dict.fromkeys(to or []) if e]
+    if not recipients:
+        return None
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=text or "",
+        html=html or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=recipients,
+        reply_to=list(reply_to or []),
+    )
+
+
+def claim(limit):
+    """Lease up to ``limit`` due messages to this worker.
+
+    A SENDING row whose lease ran out belongs to a worker that died mid-send.
+    Re-claiming it counts as a failed attempt, so a message that keeps killing
+    its worker ends up FAILED instead of being retried forever.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=_setting("EMAIL_OUTBOX_LEASE", 300))
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+    due = Q(status=EmailStatus.PENDING) | Q(status=EmailStatus.SENDING)
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects.select_for_update(skip_locked=skip_locked)
+            .filter(due, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        expired = [r for r in rows if r.status == EmailStatus.SENDING]
+        if expired:
+            dead = {r.pk for r in expired if r.attempts + 1 >= max_attempts}
+            OutboundEmail.objects.filter(pk__in=[r.pk for r in expired]).update(attempts=F("attempts") + 1)
+            OutboundEmail.objects.filter(pk__in=dead).update(
+                status=EmailStatus.FAILED, last_error="Lease expired while sending",
+            )
+            for r in expired:
+                r.attempts += 1
+                logger.warning("Email %s lease expired while sending (attempt %s)", r.pk, r.attempts)
+            rows = [r for r in rows if r.pk not in dead]
+        OutboundEmail.objects.filter(pk__in=[r.pk for r in rows]).update(
+            status=EmailStatus.SENDING, next_attempt_at=lease,
+        )
+    return rows
+
+
+def _message(row, conn):
+    msg = EmailMultiAlternatives(
+        row.subject, row.body, row.from_email, row.to, reply_to=row.reply_to or None, connection=conn,
+    )
+    if row.html:
+        msg.attach_alternative(row.html, "text/html")
+    return msg
+
+
+def _deliver(rows):
+    results = {}
+    try:
+        conn = get_connection()
+        conn.open()
+    except Exception as exc:
+        return {row.pk: exc for row in rows}
+    try:
+        for row in rows:
+            try:
+                conn.send_messages([_message(row, conn)])
+                results[row.pk] = None
+            except Exception as exc:
+                results[row.pk] = exc
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    return results
+
+
+def _record(rows, results):
+    now = timezone.now()
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+    base = _setting("EMAIL_OUTBOX_RETRY_BASE", 60)
+    sent = [pk for pk, exc in results.items() if exc is None]
+    OutboundEmail.objects.filter(pk__in=sent).update(status=EmailStatus.SENT, sent_at=now, last_error="")
+    failed = 0
+    for row in rows:
+        exc = results.get(row.pk)
+        if row.pk not in results or exc is None:
+            continue
+        failed += 1
+        attempts = row.attempts + 1
+        logger.warning("Sending email %s failed (attempt %s): %s", row.pk, attempts, exc)
+        done = attempts >= max_attempts
+        OutboundEmail.objects.filter(pk=row.pk).update(
+            status=EmailStatus.FAILED if done else EmailStatus.PENDING,
+            attempts=attempts,
+            next_attempt_at=now + timedelta(seconds=base * 2 ** (attempts - 1)),
+            last_error=f"{type(exc).__name__}: {exc}"[:2000],
+        )
+    return len(sent), failed
+
+
+def send_queued(batch_size=None, workers=None):
+    """Send one batch of due messages; each worker thread reuses a single
+    SMTP connection for its share. Returns (sent, failed)."""
+    batch_size = batch_size or _setting("EMAIL_OUTBOX_BATCH", 50)
+    workers = max(1, workers or _setting("EMAIL_OUTBOX_WORKERS", 4))
+    rows = claim(batch_size)
+    if not rows:
+        return 0, 0
+    chunks = [rows[i::workers] for i in range(min(workers, len(rows)))]
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix="outbox") as pool:
+        for part in pool.map(_deliver, chunks):
+            results.update(part)
+    return _record(rows, results)
@@ -0,0 +1,48 @@
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import translation
+
+from src.shared import mail
+
+
+class Command(BaseCommand):
+    help = "Compare per-message render_to_string with the cached email render service"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=500)
+        parser.add_argument("--template", default="overdue_booking.html")
+        parser.add_argument("--lang", default="de")
+
+    def handle(self, *args, **opts):
+        name, count, lang = opts["template"], opts["count"], opts["lang"]
+        contexts = []
+        for i in range(count):
+            prop = SimpleNamespace(title=f"Wohnung {i}", owner=SimpleNamespace(email=f"owner{i}@example.com"))
+            booking = SimpleNamespace(
+                id=i, property=prop, tenant=SimpleNamespace(email=f"tenant{i}@example.com"),
+                start_date=date.today(), end_date=date.today() + timedelta(days=3),
+            )
+            contexts.append({"booking": booking, "property": prop, "tenant": booking.tenant,
+                             "start_date": booking.start_date, "end_date": booking.end_date})
+
+        def naive():
+            with translation.override(lang):
+                return [render_to_string(f"emails/{name}", ctx) for ctx in contexts]
+
+        def service():
+            return mail.render_batch(name, contexts, lang)
+
+        started = time.perf_counter()
+        compiled = mail.precompile()
+        self.stdout.write(f"precompile {compiled} templates: {(time.perf_counter() - started) * 1000:.1f} ms")
+        for label, fn in (("render_to_string", naive), ("render_batch", service)):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label}: {elapsed * 1000:.1f} ms total, {elapsed / count * 1e6:.0f} µs/message")
+        if naive() != service():
+            self.stderr.write("outputs differ")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from src.shared import mail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound emails with a pool of SMTP workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watch", action="store_true", help="Keep polling the outbox every --interval seconds")
+        parser.add_argument("--interval", type=float, default=5.0)
+        parser.add_argument("--batch", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **opts):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = mail.send_queued(opts["batch"], opts["workers"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not opts["watch"]:
+                self.stdout.write(f"sent: {total_sent}, failed: {total_failed}")
+                return
+            time.sleep(opts["interval"])
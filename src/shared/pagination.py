@@ -1,5 +1,178 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from functools import partial
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from . import counting
+
+COUNT_MODES = ("none", counting.EXACT, counting.ESTIMATE)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts microseconds to milliseconds, a seek needs them all
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
 
 class DefaultPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # views list the cache version scopes their counts depend on
+        self.count_scopes = tuple(getattr(view, "count_scopes", ()))
+        self.django_paginator_class = partial(counting.CountingPaginator, count_scopes=self.count_scopes)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        body = {"count": getattr(paginator, "display_count", paginator.count)}
+        if getattr(paginator, "count_is_estimate", False):
+            body["count_is_approximate"] = True
+        body.update(next=self.get_next_link(), previous=self.get_previous_link(), results=data)
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response["properties"]["count_is_approximate"] = {"type": "boolean"}
+        return response
+
+
+class KeysetPagination(DefaultPagination):
+    """Page-number pagination with an opt-in keyset mode.
+
+    Requests carrying ``?cursor=`` (empty for the first page) get forward-only
+    pages seeked by ``WHERE (key, id) > (last key, last id)`` instead of an
+    OFFSET. The key is the first term of ``?ordering=`` (checked against the
+    view's ``ordering_fields``) or the default ordering; ``id`` breaks ties and
+    NULL keys sort last. Search relevance ordering is not kept in this mode.
+
+    ``?count=none|exact|estimate`` controls the total: none by default, or
+    one from :func:`src.shared.counting.count`.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    count_mode = "none"
+    invalid_cursor_message = "Invalid cursor"
+
+    def use_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.count_scopes = tuple(getattr(view, "count_scopes", ()))
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.key, self.descending = self.get_ordering(request, queryset, view)
+        self.total, self.total_is_approximate = self.get_count(queryset, request)
+
+        position = self.decode_cursor(request)
+        queryset = self.order(queryset)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.seek(queryset, *position))
+            except (ValidationError, FieldDoesNotExist, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_ordering(self, request, queryset, view):
+        terms = OrderingFilter().get_ordering(request, queryset, view) or queryset.query.order_by
+        term = next(iter(terms or queryset.model._meta.ordering or ()), "-pk")
+        if not isinstance(term, str) or term.lstrip("-") in ("?", ""):
+            term = "-pk"
+        key = term.lstrip("-")
+        if key == queryset.model._meta.pk.name:
+            key = "pk"
+        return key, term.startswith("-")
+
+    def order(self, queryset):
+        pk = "-pk" if self.descending else "pk"
+        if self.key == "pk":
+            return queryset.order_by(pk)
+        key = F(self.key).desc(nulls_last=True) if self.descending else F(self.key).asc(nulls_last=True)
+        return queryset.order_by(key, pk)
+
+    def seek(self, queryset, value, pk):
+        after = "lt" if self.descending else "gt"
+        past_pk = Q(**{f"pk__{after}": pk})
+        if self.key == "pk":
+            return past_pk
+        if value is None:
+            return Q(**{f"{self.key}__isnull": True}) & past_pk
+        value = self.key_field(queryset).to_python(value)
+        return (
+            Q(**{f"{self.key}__{after}": value})
+            | (Q(**{self.key: value}) & past_pk)
+            | Q(**{f"{self.key}__isnull": True})
+        )
+
+    def key_field(self, queryset):
+        if self.key in queryset.query.annotations:
+            return queryset.query.annotations[self.key].output_field
+        return queryset.model._meta.get_field(self.key)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param) or self.count_mode
+        if mode not in COUNT_MODES or mode == "none":
+            return None, False
+        return counting.count(queryset, mode, self.count_scopes)
+
+    def encode_cursor(self, obj):
+        value = obj.pk if self.key == "pk" else getattr(obj, self.key)
+        ordering = f"-{self.key}" if self.descending else self.key
+        payload = json.dumps({"o": ordering, "v": value, "pk": obj.pk}, cls=CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param) or ""
+        if not raw:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+            ordering, value, pk = data["o"], data["v"], int(data["pk"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        # a cursor only continues the ordering it was issued for
+        if ordering != (f"-{self.key}" if self.descending else self.key):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or self.last is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        body = {"next": self.get_next_link()}
+        if self.total is not None:
+            body["count"] = self.total
+            body["count_is_approximate"] = self.total_is_approximate
+        body["results"] = data
+        return Response(body)
@@ -0,0 +1,124 @@
+import contextvars
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+_probes = contextvars.ContextVar("schema_probes", default=None)
+
+# The two per-request probes the registry replaced: walking _meta.get_fields()
+# for names (views), and _meta.get_field() lookups (analytics _has_field).
+WALK = "walk"
+GET_FIELD = "get_field"
+
+
+class SchemaRegistry:
+    """Field names of every installed model, collected once when the apps are
+    ready. Views and middleware ask it which optional fields a model has
+    instead of walking ``_meta.get_fields()`` on every request."""
+
+    def __init__(self):
+        self._fields = {}
+        self._lock = threading.Lock()
+        self.ready = False
+        # seconds per probe, old way by kind vs a lookup here; only measured
+        # when SCHEMA_PROBE_TIMING is on
+        self.probe_cost = {WALK: 0.0, GET_FIELD: 0.0}
+        self.lookup_cost = 0.0
+
+    @staticmethod
+    def _collect(model):
+        names = {f.name for f in model._meta.get_fields()}
+        names.update(f.attname for f in model._meta.concrete_fields)
+        return frozenset(names)
+
+    def build(self):
+        started = time.perf_counter()
+        fields = {model: self._collect(model) for model in apps.get_models()}
+        with self._lock:
+            self._fields = fields
+            self.ready = True
+        logger.debug("Schema registry: %s models in %.1f ms", len(fields), (time.perf_counter() - started) * 1000)
+        if getattr(settings, "SCHEMA_PROBE_TIMING", False):
+            self._measure()
+
+    def _measure(self, rounds=200):
+        models = list(self._fields)[:20]
+        if not models:
+            return
+
+        def timed(probe):
+            started = time.perf_counter()
+            for _ in range(rounds):
+                for model in models:
+                    probe(model)
+            return (time.perf_counter() - started) / (rounds * len(models))
+
+        def get_field(model):
+            try:
+                model._meta.get_field("id")
+            except FieldDoesNotExist:
+                pass
+
+        self.probe_cost = {
+            WALK: timed(lambda model: any(f.name == "id" for f in model._meta.get_fields())),
+            GET_FIELD: timed(get_field),
+        }
+        self.lookup_cost = timed(lambda model: "id" in self._fields[model])
+        logger.debug(
+            "Schema probes: walk %.2f us, get_field %.2f us -> %.2f us",
+            self.probe_cost[WALK] * 1e6, self.probe_cost[GET_FIELD] * 1e6, self.lookup_cost * 1e6,
+        )
+
+    def field_names(self, model):
+        self._count(WALK)
+        return self._names(model)
+
+    def _count(self, kind):
+        counter = _probes.get()
+        if counter is not None:
+            counter[kind] += 1
+
+    def _names(self, model):
+        if model is None:
+            return frozenset()
+        names = self._fields.get(model)
+        if names is None:
+            # models built after ready(), e.g. historical models in migrations
+            names = self._collect(model)
+            with self._lock:
+                self._fields[model] = names
+        return names
+
+    def has_field(self, model, name):
+        self._count(GET_FIELD)
+        return name in self._names(model)
+
+    def first_field(self, model, *names):
+        present = self.field_names(model)
+        return next((n for n in names if n in present), None)
+
+    def saved_seconds(self, probes):
+        """Time the probes counted by end_request() would have cost the old way."""
+        return sum(max(0.0, self.probe_cost[kind] - self.lookup_cost) * n for kind, n in probes.items())
+
+    def start_request(self):
+        return _probes.set({WALK: 0, GET_FIELD: 0})
+
+    def end_request(self, token):
+        """Stop counting; returns the probes made since start_request() by kind."""
+        counter = _probes.get()
+        _probes.reset(token)
+        return dict(counter) if counter else {}
+
+
+registry = SchemaRegistry()
+field_names = registry.field_names
+has_field = registry.has_field
+first_field = registry.first_field
+
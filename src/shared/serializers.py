@@ -0,0 +1,41 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(value):
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+class SparseFieldsMixin:
+    """Lets a read request pick the fields of the top-level serializer with
+    ``?fields=a,b`` or drop some with ``?omit=c``. Names in ``always_fields``
+    are kept regardless; writes always see every field."""
+
+    fields_query_param = "fields"
+    omit_query_param = "omit"
+    always_fields = ("id",)
+
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+        wanted = _names(request.query_params.get(self.fields_query_param))
+        omitted = _names(request.query_params.get(self.omit_query_param))
+        unknown = [name for name in wanted + omitted if name not in fields]
+        if unknown:
+            raise serializers.ValidationError({
+                self.fields_query_param if set(unknown) & set(wanted) else self.omit_query_param:
+                    f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(fields)}."
+            })
+        keep = set(wanted or fields) - set(omitted) | set(self.always_fields)
+        for name in list(fields):
+            if name not in keep:
+                fields.pop(name)
+        return fields
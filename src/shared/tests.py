@@ -0,0 +1,502 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail as django_mail
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from src.properties.models import Property, PropertyListing
+from . import cache as shared_cache, counting, downloader, mail, schema
+from .enums import EmailStatus
+from .middleware import SchemaProbeTimingMiddleware
+from .models import OutboundEmail
+
+
+def make_properties(n, **kwargs):
+    owner = get_user_model().objects.create_user(email="owner@example.com", username="owner", password="x")
+    return [
+        Property.objects.create(
+            owner=owner, title=f"Wohnung {i}", description="", city="Berlin", price=100 + i, rooms=1 + i % 4,
+            property_type="APARTMENT", **kwargs,
+        )
+        for i in range(n)
+    ]
+
+
+class VersionedCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_versions_start_and_bump(self):
+        first = shared_cache.get_version("t:a")
+        self.assertEqual(shared_cache.get_version("t:a"), first)
+        self.assertEqual(shared_cache.bump_version("t:a"), first + 1)
+        b = shared_cache.bump_version("t:b")
+        versions = shared_cache.get_versions(["t:a", "t:b", "t:c"])
+        self.assertEqual((versions["t:a"], versions["t:b"]), (first + 1, b))
+        self.assertEqual(shared_cache.get_version("t:c"), versions["t:c"])
+
+    def test_evicted_version_does_not_restart(self):
+        shared_cache.get_version("t:a")
+        seen = shared_cache.bump_version("t:a")
+        cache.delete("v:t:a")
+        self.assertGreater(shared_cache.get_version("t:a"), seen)
+        seen = shared_cache.bump_version("t:a")
+        cache.delete("v:t:a")
+        self.assertGreater(shared_cache.bump_version("t:a"), seen)
+
+    def test_single_flight_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return "page"
+
+        threads = [
+            threading.Thread(target=shared_cache.single_flight, args=("t:key", compute, 60)) for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(shared_cache.single_flight("t:key", compute, 60), "page")
+        self.assertEqual(len(calls), 1)
+
+    def test_invalid_entry_is_recomputed(self):
+        cache.set("t:key", "old", 60)
+        value = shared_cache.single_flight("t:key", lambda: "new", 60, is_valid=lambda v: v != "old")
+        self.assertEqual(value, "new")
+        self.assertEqual(cache.get("t:key"), "new")
+
+    def test_stale_value_while_another_process_rebuilds(self):
+        cache.set("t:stale", "last good", 60)
+        cache.add("t:key:lock", 1, 60)
+        compute = mock.Mock(return_value="new")
+        self.assertEqual(shared_cache.single_flight("t:key", compute, 60, stale_key="t:stale"), "last good")
+        compute.assert_not_called()
+
+    def test_invalid_stale_value_is_not_served(self):
+        cache.set("t:stale", "old", 60)
+        cache.add("t:key:lock", 1, 60)
+        with mock.patch.object(shared_cache, "LOCK_WAIT", 0):
+            value = shared_cache.single_flight(
+                "t:key", lambda: "new", 60, is_valid=lambda v: v != "old", stale_key="t:stale",
+            )
+        self.assertEqual(value, "new")
+
+    def test_other_keys_on_the_stripe_are_not_held_up(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        with mock.patch.object(shared_cache, "_local_lock", return_value=threading.Lock()):
+            slow_worker = threading.Thread(target=shared_cache.single_flight, args=("t:slow", slow, 60))
+            slow_worker.start()
+            started.wait(5)
+            fast_worker = threading.Thread(target=shared_cache.single_flight, args=("t:fast", lambda: "fast", 60))
+            fast_worker.start()
+            fast_worker.join(1)
+            finished = not fast_worker.is_alive()
+            release.set()
+            slow_worker.join()
+            fast_worker.join()
+        self.assertTrue(finished)
+        self.assertEqual(cache.get("t:fast"), "fast")
+
+
+@override_settings(EMAIL_OUTBOX_WORKERS=2, EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BASE=60)
+class OutboxTests(TestCase):
+    def queue(self, n=1):
+        return [mail.queue_email(f"Hallo {i}", "Text", ["a@example.com", "", "a@example.com"], html="<p>Hi</p>")
+                for i in range(n)]
+
+    def test_queued_messages_are_sent_once(self):
+        rows = self.queue(3)
+        self.assertEqual(rows[0].to, ["a@example.com"])
+        self.assertIsNone(mail.queue_email("Nobody", "Text", [""]))
+        self.assertEqual(mail.send_queued(), (3, 0))
+        self.assertEqual(mail.send_queued(), (0, 0))
+        self.assertEqual(len(django_mail.outbox), 3)
+        self.assertEqual(django_mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertEqual(set(OutboundEmail.objects.values_list("status", flat=True)), {EmailStatus.SENT})
+
+    def test_rolled_back_changes_queue_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.queue()
+            raise RuntimeError
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_failures_back_off_and_give_up(self):
+        [row] = self.queue()
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            self.assertEqual(mail.send_queued(), (0, 1))
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts, row.last_error), (EmailStatus.PENDING, 1, "OSError: down"))
+            self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(mail.send_queued(), (0, 0))
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(mail.send_queued(), (0, 1))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (EmailStatus.FAILED, 2))
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(mail.send_queued(), (0, 0))
+
+    def test_claimed_rows_are_leased(self):
+        self.queue()
+        self.assertEqual(len(mail.claim(10)), 1)
+        self.assertEqual(mail.claim(10), [])
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs("src.shared.mail", "WARNING"):
+            [row] = mail.claim(10)
+        self.assertEqual(row.attempts, 1)
+        self.assertEqual(OutboundEmail.objects.get().attempts, 1)
+
+    def test_expired_leases_count_towards_the_limit(self):
+        self.queue()
+        mail.claim(10)
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs("src.shared.mail", "WARNING"):
+            mail.claim(10)
+        OutboundEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs("src.shared.mail", "WARNING"):
+            self.assertEqual(mail.claim(10), [])
+        row = OutboundEmail.objects.get()
+        self.assertEqual((row.status, row.attempts), (EmailStatus.FAILED, 2))
+        self.assertEqual(mail.send_queued(), (0, 0))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves ``server.routes[path]``: a list of (status, headers, body) replies
+    consumed one per request, the last one repeating."""
+
+    def do_GET(self):
+        self.server.hits.append((self.path, dict(self.headers)))
+        replies = self.server.routes.get(self.path) or [(404, {}, b"")]
+        status, headers, body = replies.pop(0) if len(replies) > 1 else replies[0]
+        if status == 200 and headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if "Content-Length" not in headers:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloaderTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.server.routes, self.server.hits = {}, []
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        sleep = mock.patch("src.shared.downloader.time.sleep")
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+        self.manifest = self.dir / "manifest.jsonl"
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def route(self, path, *replies):
+        self.server.routes[path] = list(replies)
+
+    def downloader(self, **kwargs):
+        return downloader.Downloader(workers=2, interval=0, retries=2, manifest=self.manifest, **kwargs)
+
+    def test_retries_5xx_and_honours_retry_after(self):
+        self.route("/a.jpg", (503, {"Retry-After": "3"}, b""), (200, {"Content-Type": "image/jpeg"}, b"jpeg"))
+        with self.downloader() as d:
+            result = d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        self.assertEqual((result.status, result.size), (downloader.DOWNLOADED, 4))
+        self.assertEqual((self.dir / "a.jpg").read_bytes(), b"jpeg")
+        self.assertEqual(len(self.server.hits), 2)
+        self.assertGreater(max(c.args[0] for c in self.sleep.call_args_list), 2)
+
+    def test_gives_up_after_the_retries(self):
+        self.route("/a.jpg", (502, {}, b""))
+        with self.downloader() as d:
+            result = d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        self.assertEqual((result.status, result.error), (downloader.FAILED, "HTTP 502"))
+        self.assertEqual(len(self.server.hits), 3)
+
+    def test_revalidation_with_etag(self):
+        self.route("/a.jpg", (200, {"ETag": '"v1"', "Content-Type": "image/jpeg"}, b"jpeg"))
+        with self.downloader() as d:
+            d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        with self.downloader(revalidate=True) as d:
+            result = d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        self.assertEqual(result.status, downloader.NOT_MODIFIED)
+        self.assertEqual(self.server.hits[-1][1].get("If-None-Match"), '"v1"')
+
+    def test_unchanged_body_leaves_the_file_alone(self):
+        self.route("/a.jpg", (200, {"Content-Type": "image/jpeg"}, b"jpeg"))
+        with self.downloader() as d:
+            d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        os.utime(self.dir / "a.jpg", (1, 1))
+        with self.downloader(revalidate=True) as d:
+            result = d.fetch(self.url("/a.jpg"), self.dir / "a.jpg")
+        self.assertEqual(result.status, downloader.NOT_MODIFIED)
+        self.assertEqual((self.dir / "a.jpg").stat().st_mtime, 1)
+        self.assertEqual(list(self.dir.glob("*.part")), [])
+
+    def test_second_run_resumes_from_the_manifest(self):
+        for name in ("a", "b"):
+            self.route(f"/{name}.jpg", (200, {"Content-Type": "image/jpeg"}, name.encode()))
+        jobs = [(self.url(f"/{name}.jpg"), self.dir / f"{name}.jpg") for name in ("a", "b")]
+        with self.downloader() as d:
+            self.assertEqual({r.status for r in d.fetch_many(jobs)}, {downloader.DOWNLOADED})
+        hits = len(self.server.hits)
+        with self.downloader() as d:
+            results = list(d.fetch_many(jobs))
+        self.assertEqual({r.status for r in results}, {downloader.SKIPPED})
+        self.assertEqual({r.sha256 for r in results}, {downloader.file_sha256(p) for _, p in jobs})
+        self.assertEqual(len(self.server.hits), hits)
+
+    def test_broken_body_leaves_no_part_file(self):
+        self.route("/a.jpg", (200, {"Content-Type": "image/jpeg", "Content-Length": "1000"}, b"short"))
+        with self.downloader() as d:
+            [result] = d.fetch_many([(self.url("/a.jpg"), self.dir / "a.jpg")])
+        self.assertEqual(result.status, downloader.FAILED)
+        self.assertFalse((self.dir / "a.jpg").exists())
+        self.assertEqual(list(self.dir.glob("*.part")), [])
+        self.assertFalse(self.manifest.exists())
+
+    def test_unexpected_content_type(self):
+        self.route("/a.jpg", (200, {"Content-Type": "text/html"}, b"<html>"))
+        with self.downloader(accept="image/") as d:
+            result = d.fetch(self.url("/a.jpg"), lambda content_type: self.dir / "a.jpg")
+        self.assertEqual(result.status, downloader.FAILED)
+        self.assertFalse((self.dir / "a.jpg").exists())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.props = make_properties(9)
+        # duplicate keys and NULLs must neither repeat nor skip rows
+        Property.objects.filter(pk__in=[p.pk for p in cls.props[:4]]).update(price=150)
+        PropertyListing.objects.filter(property_id__in=[p.pk for p in cls.props[3:6]]).update(rating_avg=4.5)
+        PropertyListing.objects.filter(property_id=cls.props[7].pk).update(rating_avg=3)
+
+    def walk(self, params):
+        client, seen, url = APIClient(), [], "/api/properties/"
+        params = {"cursor": "", "page_size": 2, **params}
+        while url:
+            body = client.get(url, params).json()
+            seen.extend(row["id"] for row in body["results"])
+            url, params = body["next"], None
+        return seen
+
+    def test_pages_follow_the_ordering(self):
+        for ordering in ("price", "-price", "rating_avg", "-rating_avg", "-id", "created_at"):
+            with self.subTest(ordering=ordering):
+                descending, key = ordering.startswith("-"), ordering.lstrip("-")
+                term = F(f"listing__{key}" if key == "rating_avg" else key)
+                expected = Property.objects.order_by(
+                    term.desc(nulls_last=True) if descending else term.asc(nulls_last=True),
+                    "-pk" if descending else "pk",
+                )
+                self.assertEqual(self.walk({"ordering": ordering}), list(expected.values_list("pk", flat=True)))
+
+    def test_bad_cursor_is_not_found(self):
+        self.assertEqual(APIClient().get("/api/properties/", {"cursor": "garbage"}).status_code, 404)
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        body = APIClient().get("/api/properties/", {"cursor": "", "page_size": 2, "ordering": "price"}).json()
+        cursor = body["next"].split("cursor=")[1].split("&")[0]
+        response = APIClient().get("/api/properties/", {"cursor": cursor, "ordering": "-price"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_count_is_opt_in(self):
+        body = APIClient().get("/api/properties/", {"cursor": ""}).json()
+        self.assertNotIn("count", body)
+        body = APIClient().get("/api/properties/", {"cursor": "", "count": "exact"}).json()
+        self.assertEqual((body["count"], body["count_is_approximate"]), (9, False))
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.props = make_properties(2)
+
+    def test_fields_and_omit(self):
+        row = APIClient().get("/api/properties/", {"fields": "title,city"}).json()["results"][0]
+        self.assertEqual(set(row), {"id", "title", "city"})
+        row = APIClient().get(f"/api/properties/{self.props[0].pk}/", {"omit": "description"}).json()
+        self.assertNotIn("description", row)
+        self.assertIn("title", row)
+
+    def test_unknown_field_is_rejected(self):
+        self.assertEqual(APIClient().get("/api/properties/", {"fields": "nope"}).status_code, 400)
+
+    def test_writes_see_every_field(self):
+        client = APIClient()
+        client.force_authenticate(self.props[0].owner)
+        response = client.patch(f"/api/properties/{self.props[0].pk}/?fields=id", {"title": "Neu"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.props[0].refresh_from_db()
+        self.assertEqual(self.props[0].title, "Neu")
+
+
+class SchemaRegistryTests(SimpleTestCase):
+    def test_lookups(self):
+        self.assertIn("owner_id", schema.field_names(Property))
+        self.assertTrue(schema.has_field(Property, "city"))
+        self.assertFalse(schema.has_field(Property, "nope"))
+        self.assertEqual(schema.first_field(Property, "kind", "property_type", "type"), "property_type")
+        self.assertEqual(schema.field_names(None), frozenset())
+
+    def test_requests_count_their_probes(self):
+        token = schema.registry.start_request()
+        schema.has_field(Property, "city")
+        schema.first_field(Property, "kind")
+        schema.field_names(Property)
+        self.assertEqual(schema.registry.end_request(token), {schema.WALK: 2, schema.GET_FIELD: 1})
+        schema.has_field(Property, "city")
+
+    def test_probes_are_only_timed_when_enabled(self):
+        registry = schema.SchemaRegistry()
+        with override_settings(SCHEMA_PROBE_TIMING=False), mock.patch.object(registry, "_measure") as measure:
+            registry.build()
+        measure.assert_not_called()
+        with override_settings(SCHEMA_PROBE_TIMING=True):
+            registry.build()
+        self.assertGreater(registry.probe_cost[schema.GET_FIELD], 0)
+        self.assertGreater(registry.probe_cost[schema.WALK], 0)
+        self.assertEqual(
+            registry.saved_seconds({schema.WALK: 1, schema.GET_FIELD: 0}),
+            max(0.0, registry.probe_cost[schema.WALK] - registry.lookup_cost),
+        )
+
+    def test_middleware_reports_server_timing(self):
+        def view(request):
+            schema.has_field(Property, "city")
+            return HttpResponse()
+
+        def timed_view(request):
+            response = view(request)
+            response["Server-Timing"] = "db;dur=1.5"
+            return response
+
+        response = SchemaProbeTimingMiddleware(view)(RequestFactory().get("/"))
+        self.assertTrue(response["Server-Timing"].startswith('schema;desc="1 cached field probes";dur='))
+        response = SchemaProbeTimingMiddleware(timed_view)(RequestFactory().get("/"))
+        self.assertTrue(response["Server-Timing"].startswith('db;dur=1.5, schema;desc="1 cached field probes"'))
+        response = SchemaProbeTimingMiddleware(lambda request: HttpResponse())(RequestFactory().get("/"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+class EmailTemplateTests(SimpleTestCase):
+    def setUp(self):
+        mail._templates.clear()
+
+    def test_shared_template_is_compiled_once(self):
+        self.assertGreater(mail.precompile(), 0)
+        compiled = len(mail._templates)
+        self.assertIs(mail.email_template("new_booking.html", "de"), mail.email_template("new_booking.html", "ru"))
+        self.assertEqual(len([k for k, v in mail._templates.items() if v is not None]), compiled)
+
+    def test_missing_template(self):
+        self.assertIsNone(mail.email_template("does_not_exist.html", "en"))
+
+
+class PaginationBoundsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.props = make_properties(25)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_estimate_never_bounds_pages(self):
+        for guess in (1, 10 ** 6):
+            with self.subTest(guess=guess), mock.patch.object(counting, "estimate", return_value=guess), \
+                    override_settings(COUNT_ESTIMATE_THRESHOLD=0):
+                paginator = counting.CountingPaginator(Property.objects.order_by("pk"), 10, count_mode="estimate")
+                self.assertEqual(paginator.num_pages, 3)
+                self.assertEqual(len(paginator.page(3).object_list), 5)
+                self.assertEqual(paginator.display_count, guess)
+                self.assertTrue(paginator.count_is_estimate)
+
+    def test_api_last_page_with_low_estimate(self):
+        with mock.patch.object(counting, "estimate", return_value=3), \
+                override_settings(PAGINATION_COUNT_MODE="estimate", COUNT_ESTIMATE_THRESHOLD=0):
+            response = APIClient().get("/api/properties/", {"page": 3, "page_size": 10})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["results"]), 5)
+        self.assertIsNone(body["next"])
+        self.assertEqual((body["count"], body["count_is_approximate"]), (3, True))
+
+    def test_exact_by_default(self):
+        response = APIClient().get("/api/properties/", {"page_size": 10})
+        body = response.json()
+        self.assertEqual(body["count"], 25)
+        self.assertNotIn("count_is_approximate", body)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.props = make_properties(3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_list_not_modified_until_a_property_changes(self):
+        first = self.get("/api/properties/")
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get("/api/properties/", etag).status_code, 304)
+        # the watermark aggregate is memoized under the scope versions
+        self.assertFalse([q for q in queries.captured_queries if "MAX(" in q["sql"].upper()])
+
+        prop = self.props[0]
+        prop.price = 999
+        prop.save()
+        changed = self.get("/api/properties/", etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_filters_are_part_of_the_validator(self):
+        etag = self.get("/api/properties/")["ETag"]
+        self.assertEqual(self.get("/api/properties/?city=Hamburg", etag).status_code, 200)
+
+    def test_retrieve(self):
+        url = f"/api/properties/{self.props[1].pk}/"
+        etag = self.get(url)["ETag"]
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        self.props[1].images.create(image="properties/x.jpg")
+        self.assertEqual(self.get(url, etag).status_code, 200)